@@ -0,0 +1,181 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+'''
+Benchmarks q IPC decompression.
+
+Compares the pure Python and Cython decompressors against the previous
+(index array based) implementation on the messages stored in
+``tests/QCompressedExpressions3.out`` and on synthetic payloads (1 MB by 
+default). The legacy and pure Python implementations take seconds per 
+megabyte, so for payloads larger than 8 MB only the Cython one is measured,
+unless ``--slow`` is given, e.g.::
+
+    python benchmarks/uncompress_benchmark.py --size 1G
+'''
+
+import argparse
+import binascii
+import os
+import struct
+import timeit
+
+import numpy
+
+from qpython import utils
+
+try:
+    from qpython import fastutils
+except ImportError:
+    fastutils = None
+
+compress = fastutils.compress if fastutils else utils.compress
+
+# size of the synthetic payload above which slow implementations are skipped
+SLOW_LIMIT = 8 << 20
+
+
+
+def legacy_uncompress(data, uncompressed_size):
+    # decompressor shipped with qPython 2.0
+    data = numpy.frombuffer(data, dtype = numpy.uint8)
+
+    _0 = numpy.intc(0)
+    _1 = numpy.intc(1)
+    _2 = numpy.intc(2)
+    _128 = numpy.intc(128)
+    _255 = numpy.intc(255)
+
+    n, r, s, p = _0, _0, _0, _0
+    i, d = _1, _1
+    f = _255 & data[_0]
+
+    ptrs = numpy.zeros(256, dtype = numpy.intc)
+    uncompressed = numpy.zeros(uncompressed_size, dtype = numpy.uint8)
+    idx = numpy.arange(uncompressed_size, dtype = numpy.intc)
+
+    while s < uncompressed_size:
+        pp = p + _1
+
+        if f & i:
+            r = ptrs[data[d]]
+            n = _2 + data[d + _1]
+            uncompressed[idx[s:s + n]] = uncompressed[r:r + n]
+
+            ptrs[(uncompressed[p]) ^ (uncompressed[pp])] = p
+            if s == pp:
+                ptrs[(uncompressed[pp]) ^ (uncompressed[pp + _1])] = pp
+
+            d += _2
+            r += _2
+            s = s + n
+            p = s
+
+        else:
+            uncompressed[s] = data[d]
+
+            if pp == s:
+                ptrs[(uncompressed[p]) ^ (uncompressed[pp])] = p
+                p = pp
+
+            s += _1
+            d += _1
+
+        if i == _128:
+            if s < uncompressed_size:
+                f = _255 & data[d]
+                d += _1
+                i = _1
+        else:
+            i += i
+
+    return uncompressed
+
+
+
+def synthetic_payload(size, seed = 42):
+    # table-like payload: repeating symbols, slowly changing prices and sizes
+    random = numpy.random.RandomState(seed)
+    block = numpy.empty(1 << 16, dtype = [('sym', 'S4'), ('price', '<f8'), ('size', '<i8'), ('time', '<i4')])
+    block['sym'] = random.choice([b'AAPL', b'MSFT', b'IBM\0', b'GOOG'], len(block))
+    block['price'] = numpy.round(100 + numpy.cumsum(random.randint(-1, 2, len(block))) * 0.01, 2)
+    block['size'] = random.randint(1, 10, len(block)) * 100
+    block['time'] = numpy.arange(len(block), dtype = numpy.int32) * 10
+    block = block.tostring()
+
+    return (block * (size // len(block) + 1))[:size]
+
+
+
+def parse_size(size):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    size = size.upper()
+    return int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+
+
+
+def run(label, implementations, compressed, uncompressed_size, repeat):
+    print('%s (%d -> %d bytes)' % (label, len(compressed), uncompressed_size))
+    for name, uncompress in implementations:
+        elapsed = min(timeit.repeat(lambda: uncompress(compressed, uncompressed_size), number = 1, repeat = repeat))
+        print('  %-10s %10.3f ms %10.1f MB/s' % (name, elapsed * 1000, uncompressed_size / elapsed / (1 << 20)))
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmarks q IPC decompression')
+    parser.add_argument('--size', default = '1M', help = 'size of the synthetic payload, e.g. 1G (default: 1M)')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'number of repetitions (default: 3)')
+    parser.add_argument('--no-legacy', action = 'store_true', help = 'skip the legacy implementation')
+    parser.add_argument('--no-python', action = 'store_true', help = 'skip the pure Python implementation for synthetic payload')
+    parser.add_argument('--slow', action = 'store_true', help = 'run legacy and pure Python implementations on synthetic payloads larger than 8M')
+    args = parser.parse_args()
+
+    implementations = []
+    if not args.no_legacy:
+        implementations.append(('legacy', legacy_uncompress))
+    implementations.append(('python', utils.uncompress))
+    if fastutils:
+        implementations.append(('cython', fastutils.uncompress))
+
+    messages = []
+    with open(os.path.join(os.path.dirname(__file__), '..', 'tests', 'QCompressedExpressions3.out'), 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            binary = binascii.unhexlify(binary)
+            messages.append((query, binary[4:], struct.unpack('i', binary[:4])[0] - 8))
+
+    for query, compressed, uncompressed_size in messages:
+        run(query.decode(), implementations, compressed, uncompressed_size, args.repeat)
+
+    size = parse_size(args.size)
+    payload = synthetic_payload(size)
+    compressed = compress(payload)
+    assert compressed is not None, 'synthetic payload is not compressible'
+    if args.no_python:
+        implementations = [x for x in implementations if x[0] != 'python']
+    if size > SLOW_LIMIT and not args.slow and fastutils:
+        implementations = [x for x in implementations if x[0] == 'cython']
+
+    for name, uncompress in implementations:
+        assert bytes(uncompress(compressed, size)) == payload, 'decompression failed: %s' % name
+
+    run('synthetic', implementations, compressed, size, args.repeat)
@@ -65,5 +65,14 @@ class MetaData(object):
 CONVERSION_OPTIONS = MetaData(raw = False,
                               numpy_temporals = False,
                               pandas = False,
-                              single_char_strings = False
+                              single_char_strings = False,
+                              lazy_tables = False,
+                              columns = None,
+                              compact_symbols = False,
+                              categorical_symbols = False,
+                              nullable_dtypes = False,
+                              string_dtype = None,
+                              compress = False,
+                              compress_threshold = 2000,
+                              scatter_gather = False
                              )
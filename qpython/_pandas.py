@@ -14,6 +14,7 @@
 #  limitations under the License.
 #
 
+import codecs
 import pandas
 import struct
 import sys
@@ -24,10 +25,94 @@ from collections import OrderedDict
 
 from qpython import MetaData
 from qpython.qreader import QReader, QReaderException
-from qpython.qcollection import QDictionary, qlist
+from qpython.qcollection import QDictionary, QCompactSymbolList, qlist, unique_symbols
 from qpython.qwriter import QWriter, QWriterException
 from qpython.qtype import *
 
+try:
+    from pandas.arrays import IntegerArray
+except ImportError:
+    # nullable integer arrays are available since pandas 0.24
+    IntegerArray = None
+
+
+
+_NULLABLE_DTYPES = {QBYTE: 'Int8', QSHORT: 'Int16', QINT: 'Int32', QLONG: 'Int64'}
+
+
+
+def _to_series(qlist, qtype, nullable_dtypes = False):
+    # nulls are located in a single vectorized pass, float and temporal vectors
+    # are wrapped without copying, boolean vectors have no nulls
+    qtype = -abs(qtype)
+    if qtype == QGUID:
+        mask = ~qlist.view(numpy.ndarray).view(numpy.uint8).reshape(-1, 16).any(axis = 1)
+        values = qlist.as_uuid()
+        values[mask] = numpy.nan
+        return pandas.Series(data = values)
+
+    if qtype not in _NULLABLE_DTYPES or not isinstance(qlist, numpy.ndarray):
+        return pandas.Series(data = qlist)
+
+    values = qlist.view(numpy.ndarray)
+    mask = values == QNULLMAP[qtype][1]
+
+    if nullable_dtypes:
+        if IntegerArray is None:
+            raise QReaderException('nullable_dtypes option requires pandas 0.24 or newer')
+        return pandas.Series(data = IntegerArray(values, mask))
+
+    if mask.any():
+        values = values.astype(numpy.float64)
+        values[mask] = numpy.nan
+    return pandas.Series(data = values)
+
+
+
+def _gather_strings(data, starts, lengths):
+    # copies strings scattered over the message into a fixed width array
+    count = len(lengths)
+    width = max(int(lengths.max()), 1) if count else 1
+    strings = numpy.zeros(count, dtype = 'S%d' % width)
+
+    total = int(lengths.sum()) if count else 0
+    if total:
+        offsets = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        within = numpy.arange(total, dtype = numpy.int64) - offsets
+        target = numpy.repeat(numpy.arange(count, dtype = numpy.int64) * width, lengths) + within
+        strings.view(numpy.uint8)[target] = data[numpy.repeat(starts, lengths) + within]
+
+    return strings
+
+
+def _decode_strings(strings, encoding):
+    if codecs.lookup(encoding).name == 'iso8859-1':
+        # latin-1 maps bytes directly to the code points
+        width = strings.dtype.itemsize
+        return strings.view(numpy.uint8).astype(numpy.uint32).view('U%d' % width)
+    return numpy.char.decode(strings, encoding)
+
+
+def _factorize_symbols(symbols):
+    # hash based factorization, symbols up to 8 bytes long are hashed as 
+    # 64-bit integers, longer compact symbols are hashed as bytes split from
+    # the symbols block (without padding them to the longest symbol)
+    if isinstance(symbols, QCompactSymbolList):
+        if len(symbols) and symbols.dtype.itemsize > 8:
+            codes, categories = pandas.factorize(symbols.to_object())
+            return codes, categories.astype(numpy.string_)
+        symbols = symbols.to_fixed()
+
+    symbols = numpy.asarray(symbols)
+    symbols = symbols.astype(numpy.string_) if symbols.dtype == numpy.object_ else symbols
+
+    if len(symbols) and symbols.dtype.itemsize <= 8:
+        codes, categories = pandas.factorize(symbols.astype('S8').view(numpy.uint64))
+        return codes, categories.view('S8').astype(symbols.dtype)
+
+    categories, codes = unique_symbols(symbols)
+    return codes, categories
+
 
 
 class PandasQReader(QReader):
@@ -38,7 +123,7 @@ class PandasQReader(QReader):
     @parse(QDICTIONARY)
     def _read_dictionary(self, qtype = QDICTIONARY):
         if self._options.pandas:
-            keys = self._read_object()
+            keys = self._read_keys()
             values = self._read_object()
 
             if isinstance(keys, pandas.DataFrame):
@@ -71,9 +156,7 @@ class PandasQReader(QReader):
             self._buffer.skip()  # ignore attributes
             self._buffer.skip()  # ignore dict type stamp
 
-            columns = self._read_object()
-            self._buffer.skip() # ignore generic list type indicator
-            data = QReader._read_general_list(self, qtype)
+            columns, data, _ = self._read_columns(self._read_object())
 
             odict = OrderedDict()
             meta = MetaData(qtype = QTABLE)
@@ -104,19 +187,79 @@ class PandasQReader(QReader):
             return QReader._read_table(self, qtype = qtype)
 
 
+    def _read_column(self):
+        if self._options.pandas:
+            position = self._buffer.tell()
+            qtype = self._buffer.get_byte()
+
+            if qtype == QSTRING:
+                self._buffer.skip()  # ignore attributes
+                chars = numpy.frombuffer(self._buffer.view(self._buffer.get_int()), dtype = 'S1')
+                return self._to_string_series(chars, chars == b' ', QSTRING)
+
+            if qtype == QGENERAL_LIST:
+                self._buffer.skip()  # ignore attributes
+                strings = self._buffer.get_strings(self._buffer.get_int())
+
+                if strings is not None:
+                    data, starts, lengths = strings
+                    nulls = (lengths == 1) & (data[numpy.minimum(starts, len(data) - 1)] == ord(' '))
+                    return self._to_string_series(_gather_strings(data, starts, lengths), nulls, QGENERAL_LIST, data, starts, lengths)
+
+            self._buffer.seek(position)
+
+        return QReader._read_column(self)
+
+
+    def _to_string_series(self, strings, nulls, qtype, data = None, starts = None, lengths = None):
+        if self._options.string_dtype is not None:
+            values = _decode_strings(strings, self._encoding).astype(numpy.object_)
+            values[nulls] = numpy.nan
+            ps = pandas.Series(data = values, dtype = self._options.string_dtype)
+        elif qtype == QSTRING:
+            # single chars are represented as Python strings
+            if sys.version > '3':
+                values = _decode_strings(strings, self._encoding).astype(numpy.object_)
+            else:
+                values = strings.astype(numpy.object_)
+                values[nulls] = numpy.nan
+            ps = pandas.Series(data = values)
+        else:
+            if (data[starts + lengths - 1][lengths > 0] == 0).any():
+                # fixed width strings drop trailing \x00 characters
+                values = numpy.empty(len(lengths), dtype = numpy.object_)
+                values[:] = [bytes(data[start : start + length]) for start, length in zip(starts, lengths)]
+            else:
+                values = strings.astype(numpy.object_)
+            values[nulls] = numpy.nan
+            ps = pandas.Series(data = values)
+
+        ps.meta = MetaData(qtype = qtype)
+        return ps
+
+
     def _read_list(self, qtype):
         if self._options.pandas:
             self._options.numpy_temporals = True
 
-        qlist = QReader._read_list(self, qtype = qtype)
+        if self._options.pandas and self._options.categorical_symbols and qtype == QSYMBOL_LIST:
+            # categories are computed directly from the symbols block
+            compact_symbols, self._options.compact_symbols = self._options.compact_symbols, True
+            try:
+                qlist = QReader._read_list(self, qtype = qtype)
+            finally:
+                self._options.compact_symbols = compact_symbols
+        else:
+            qlist = QReader._read_list(self, qtype = qtype)
 
         if self._options.pandas:
-            if -abs(qtype) not in [QMONTH, QDATE, QDATETIME, QMINUTE, QSECOND, QTIME, QTIMESTAMP, QTIMESPAN, QSYMBOL]:
-                null = QNULLMAP[-abs(qtype)][1]
-                ps = pandas.Series(data = qlist).replace(null, numpy.NaN)
-            else:
-                ps = pandas.Series(data = qlist)
+            if qtype == QSYMBOL_LIST and self._options.categorical_symbols:
+                codes, categories = _factorize_symbols(qlist)
+                qlist = pandas.Categorical.from_codes(codes, categories = categories)
+            elif isinstance(qlist, QCompactSymbolList):
+                qlist = qlist.to_fixed()
 
+            ps = _to_series(qlist, qtype, self._options.nullable_dtypes)
             ps.meta = MetaData(qtype = qtype)
             return ps
         else:
@@ -147,6 +290,12 @@ class PandasQWriter(QWriter):
         if qtype is None and hasattr(data, 'meta'):
             qtype = -abs(data.meta.qtype)
 
+        if pandas.api.types.is_categorical_dtype(data.dtype) and qtype in (None, QSYMBOL):
+            if data.cat.categories.dtype == numpy.object_:
+                self._write_categorical_symbols(data)
+                return
+            data = data.astype(data.cat.categories.dtype)
+
         if data.dtype == '|S1':
             qtype = QCHAR
 
@@ -167,15 +316,20 @@ class PandasQWriter(QWriter):
         if qtype is None:
             raise QWriterException('Unable to serialize pandas series %s' % data)
 
+        if qtype in (QGENERAL_LIST, QCHAR) and not isinstance(data.values, numpy.ndarray):
+            # extension arrays (e.g. pandas.StringDtype) represent nulls as pandas.NA
+            data = data.astype(numpy.object_).where(data.notnull(), numpy.nan)
+
         if qtype == QGENERAL_LIST:
             self._write_generic_list(data.values)
         elif qtype == QCHAR:
             self._write_string(data.replace(numpy.nan, ' ').values.astype(numpy.string_).tostring())
         elif data.dtype.type not in (numpy.datetime64, numpy.timedelta64):
-            data = data.fillna(QNULLMAP[-abs(qtype)][1])
+            if data.hasnans:
+                data = data.fillna(QNULLMAP[-abs(qtype)][1])
             data = data.values
 
-            if PY_TYPE[qtype] != data.dtype:
+            if PY_TYPE[qtype] != data.dtype and qtype != QSYMBOL:
                 data = data.astype(PY_TYPE[qtype])
 
             self._write_list(data, qtype = qtype)
@@ -185,6 +339,22 @@ class PandasQWriter(QWriter):
             self._write_list(data, qtype = qtype)
 
 
+    def _write_categorical_symbols(self, data):
+        # each category is encoded once, the encoded (NUL terminated) 
+        # categories are gathered by codes and joined into the symbols block
+        categories = numpy.empty(len(data.cat.categories) + 1, dtype = numpy.object_)
+        categories[:-1] = data.cat.categories.values
+        categories[-1] = b''
+        categories[:] = [symbol + b'\0' for symbol in self._encode_symbols(categories).split(b'\0')[:-1]]
+
+        # null symbols are represented by the additional empty category
+        codes = data.cat.codes.values
+        codes = numpy.where(codes < 0, len(categories) - 1, codes)
+
+        self._buffer.write(struct.pack('=bxi', QSYMBOL_LIST, len(codes)))
+        self._buffer.write(b''.join(categories[codes].tolist()))
+
+
     @serialize(pandas.DataFrame)
     def _write_pandas_data_frame(self, data, qtype = None):
         data_columns = data.columns.values
@@ -0,0 +1,403 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+'''Implementation of :mod:`qpython.qasync`, uses syntax of Python 3.5 and
+newer and must not be imported on older versions.'''
+
+import asyncio
+import functools
+import struct
+
+from qpython import MetaData, CONVERSION_OPTIONS
+from qpython.qtype import QException
+from qpython.qconnection import MessageType, QConnectionException, QAuthenticationException, _unix_socket_paths, _address
+from qpython.qreader import QReader, QReaderException
+from qpython.qwriter import QWriter, QWriterException
+
+
+
+class AsyncQConnection(object):
+    '''Connector class for interfacing with the q service from `asyncio`
+    event loop.
+
+    Provides the same API as :class:`.QConnection`, with I/O bound methods
+    implemented as coroutines. Messages are framed incrementally from the
+    stream, so a single event loop can serve many connections. Data is
+    serialized and parsed with the `writer_class` and `reader_class`.
+
+    The :class:`.AsyncQConnection` class provides an asynchronous context
+    manager API::
+
+        async with qasync.AsyncQConnection(host = 'localhost', port = 5000) as q:
+            print(await q('{`int$ til x}', 10))
+
+    Synchronous queries issued concurrently on one connection are executed
+    one after another.
+
+    :Parameters:
+     - `host` (`string`) - q service hostname or ``unix://`` to connect via
+       Unix domain socket (see :class:`.QConnection`)
+     - `port` (`integer`) - q service port
+     - `username` (`string` or `None`) - username for q authentication/authorization
+     - `password` (`string` or `None`) - password for q authentication/authorization
+     - `timeout` (`nonnegative float` or `None`) - timeout for establishing
+       the connection and waiting for the responses
+     - `encoding` (`string`) - string encoding for data deserialization
+     - `reader_class` (subclass of `QReader`) - data deserializer
+     - `writer_class` (subclass of `QWriter`) - data serializer
+     - `symbol_cache` (:class:`.QSymbolCache` or `None`) - if set, symbols in
+       received messages are interned in the cache
+     - `executor` (`concurrent.futures.Executor` or `None`) - executor used
+       for parsing large messages, if ``None`` the event loop default executor
+       is used
+     - `offload_threshold` (`integer` or `None`) - minimal size (in bytes) of
+       the message parsed in the `executor`, if ``None`` all messages are
+       parsed in the event loop thread
+    :Options:
+     - same as in :class:`.QConnection`
+    '''
+
+
+    def __init__(self, host, port, username = None, password = None, timeout = None, encoding = 'latin-1', reader_class = None, writer_class = None, symbol_cache = None, executor = None, offload_threshold = None, **options):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+
+        self._stream_reader = None
+        self._stream_writer = None
+        self._protocol_version = None
+
+        self.timeout = timeout
+        self.executor = executor
+        self.offload_threshold = offload_threshold
+
+        self._encoding = encoding
+        self._symbol_cache = symbol_cache
+
+        self._options = MetaData(**CONVERSION_OPTIONS.union_dict(**options))
+
+        try:
+            from qpython._pandas import PandasQReader, PandasQWriter
+            self._reader_class = PandasQReader
+            self._writer_class = PandasQWriter
+        except ImportError:
+            self._reader_class = QReader
+            self._writer_class = QWriter
+
+        if reader_class:
+            self._reader_class = reader_class
+
+        if writer_class:
+            self._writer_class = writer_class
+
+        self._read_lock = None
+        self._sync_lock = None
+
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+    @property
+    def protocol_version(self):
+        '''Retrieves established version of the IPC protocol.
+
+        :returns: `integer` -- version of the IPC protocol
+        '''
+        return self._protocol_version
+
+
+    async def open(self):
+        '''Initialises connection to q service.
+
+        If the connection hasn't been initialised yet, invoking the
+        :func:`.open` opens a new stream and performs a handshake with a q
+        service.
+
+        :raises: :class:`.QConnectionException`, :class:`.QAuthenticationException`
+        '''
+        if not self._stream_writer:
+            if not self.host:
+                raise QConnectionException('Host cannot be None')
+
+            await self._wait(self._initialize())
+
+            self._writer = self._writer_class(None, protocol_version = self._protocol_version, encoding = self._encoding)
+            self._reader = self._reader_class(None, encoding = self._encoding, symbol_cache = self._symbol_cache)
+            self._read_lock = asyncio.Lock()
+            self._sync_lock = asyncio.Lock()
+
+
+    async def _init_stream(self):
+        '''Opens the stream used for communicating with a q service.'''
+        paths = _unix_socket_paths(self.host, self.port)
+        if paths is not None:
+            for i, path in enumerate(paths):
+                try:
+                    self._stream_reader, self._stream_writer = await asyncio.open_unix_connection(path)
+                    break
+                except OSError:
+                    # falls back to the next path (e.g. the socket file)
+                    if i == len(paths) - 1:
+                        raise
+        else:
+            self._stream_reader, self._stream_writer = await asyncio.open_connection(self.host, self.port)
+
+
+    async def _initialize(self):
+        '''Performs a IPC protocol handshake.'''
+        credentials = (self.username if self.username else '') + ':' + (self.password if self.password else '')
+        credentials = credentials.encode(self._encoding)
+
+        await self._init_stream()
+        try:
+            self._stream_writer.write(credentials + b'\3\0')
+            response = await self._stream_reader.read(1)
+
+            if len(response) != 1:
+                self._abort()
+                await self._init_stream()
+
+                self._stream_writer.write(credentials + b'\0')
+                response = await self._stream_reader.read(1)
+                if len(response) != 1:
+                    raise QAuthenticationException('Connection denied.')
+        except:
+            self._abort()
+            raise
+
+        self._protocol_version = min(struct.unpack('B', response)[0], 3)
+
+
+    def _abort(self):
+        if self._stream_writer:
+            self._stream_writer.close()
+            self._stream_reader = None
+            self._stream_writer = None
+
+
+    async def close(self):
+        '''Closes connection with the q service.'''
+        if self._stream_writer:
+            writer = self._stream_writer
+            self._abort()
+            try:
+                await writer.wait_closed()
+            except (AttributeError, OSError):
+                pass
+
+
+    def is_connected(self):
+        '''Checks whether connection with a q service has been established.
+
+        Connection is considered inactive when:
+         - it has not been initialised,
+         - it has been closed.
+
+        :returns: `boolean` -- ``True`` if connection has been established,
+                  ``False`` otherwise
+        '''
+        return True if self._stream_writer else False
+
+
+    def __str__(self):
+        return '%s@:%s' % (self.username, _address(self.host, self.port)) if self.username else ':%s' % _address(self.host, self.port)
+
+
+    async def _wait(self, coroutine):
+        if self.timeout is None:
+            return await coroutine
+
+        return await asyncio.wait_for(coroutine, self.timeout)
+
+
+    def query(self, msg_type, query, *parameters, **options):
+        '''Serializes a query and passes it to the stream buffer.
+
+        Returns without waiting for the data to be flushed to the socket, see
+        :func:`.drain`.
+
+        :Parameters:
+         - `msg_type` (one of the constants defined in :class:`.MessageType`) -
+           type of the query to be executed
+         - `query` (`string`) - query to be executed
+         - `parameters` (`list` or `None`) - parameters for the query
+        :Options:
+         - `single_char_strings` (`boolean`) - if ``True`` single char Python
+           strings are encoded as q strings instead of chars,
+           **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than
+           `compress_threshold` are sent in compressed form,
+           **Default**: ``False``
+
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`
+        '''
+        if not self._stream_writer:
+            raise QConnectionException('Connection is not established.')
+
+        if parameters and len(parameters) > 8:
+            raise QWriterException('Too many parameters.')
+
+        options = self._options.union_dict(**options)
+        # message has to be serialized into single buffer to be passed to the transport
+        options['scatter_gather'] = False
+
+        if not parameters or len(parameters) == 0:
+            self._stream_writer.write(self._writer.write(query, msg_type, **options))
+        else:
+            self._stream_writer.write(self._writer.write([query] + list(parameters), msg_type, **options))
+
+
+    async def drain(self):
+        '''Waits until the stream buffer is flushed to the socket (down to the
+        transport's low-water mark).'''
+        if not self._stream_writer:
+            raise QConnectionException('Connection is not established.')
+
+        await self._stream_writer.drain()
+
+
+    async def sendSync(self, query, *parameters, **options):
+        '''Performs a synchronous query against a q service and returns parsed
+        data.
+
+            >>> print(await q.sendSync('{y + til x}', 10, 1))
+            [ 1  2  3  4  5  6  7  8  9 10]
+
+        The :func:`.sendSync` is called from the overloaded :func:`.__call__`
+        function:
+
+            >>> print(await q('{y + til x}', 10, 1))
+            [ 1  2  3  4  5  6  7  8  9 10]
+
+        :Parameters:
+         - `query` (`string`) - query to be executed
+         - `parameters` (`list` or `None`) - parameters for the query
+        :Options:
+         - same as in :func:`.QConnection.sendSync`
+
+        :returns: query result parsed to Python data structures
+
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`,
+                 :class:`.QReaderException`
+        '''
+        if not self._stream_writer:
+            raise QConnectionException('Connection is not established.')
+
+        async with self._sync_lock:
+            self.query(MessageType.SYNC, query, *parameters, **options)
+            await self.drain()
+            response = await self.receive(data_only = False, **options)
+
+        if response.type == MessageType.RESPONSE:
+            return response.data
+        else:
+            self._stream_writer.write(self._writer.write(QException('nyi: qPython expected response message'), MessageType.ASYNC if response.type == MessageType.ASYNC else MessageType.RESPONSE))
+            raise QReaderException('Received message of type: %s where response was expected' % response.type)
+
+
+    def sendAsync(self, query, *parameters, **options):
+        '''Performs an asynchronous query and returns **without** retrieving of
+        the response.
+
+            >>> q.sendAsync('{til x}', 10)
+
+        The query is passed to the stream buffer, use :func:`.drain` to wait
+        until it's flushed.
+
+        :Parameters:
+         - `query` (`string`) - query to be executed
+         - `parameters` (`list` or `None`) - parameters for the query
+        :Options:
+         - `single_char_strings` (`boolean`) - if ``True`` single char Python
+           strings are encoded as q strings instead of chars,
+           **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than
+           `compress_threshold` are sent in compressed form,
+           **Default**: ``False``
+
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`
+        '''
+        self.query(MessageType.ASYNC, query, *parameters, **options)
+
+
+    async def receive(self, data_only = True, **options):
+        '''Reads and (optionally) parses the next message from a q service.
+
+        Messages of at least `offload_threshold` bytes are parsed in the
+        `executor`.
+
+        :Parameters:
+         - `data_only` (`boolean`) - if ``True`` returns only data part of the
+           message, otherwise returns data and message meta-information
+           encapsulated in :class:`.QMessage` instance
+        :Options:
+         - same as in :func:`.QConnection.receive`
+
+        :returns: depending on parameter flags: :class:`.QMessage` instance,
+                  parsed message, raw data
+        :raises: :class:`.QConnectionException`, :class:`.QReaderException`
+        '''
+        if not self._stream_writer:
+            raise QConnectionException('Connection is not established.')
+
+        async with self._read_lock:
+            message = await self._wait(self._read_message())
+            options = self._options.union_dict(**options)
+
+            if self.offload_threshold is not None and len(message) >= self.offload_threshold:
+                loop = asyncio.get_event_loop()
+                result = await loop.run_in_executor(self.executor, functools.partial(self._reader.read, message, owned = True, **options))
+            else:
+                result = self._reader.read(message, owned = True, **options)
+
+        return result.data if data_only else result
+
+
+    async def _read_message(self):
+        try:
+            header = await self._stream_reader.readexactly(8)
+            size = self._reader.read_header(header).size
+
+            # chunks are copied into a buffer allocated with the message size,
+            # so the message is not assembled from intermediate copies
+            message = bytearray(size)
+            message[:8] = header
+            position = 8
+            while position < size:
+                chunk = await self._stream_reader.read(min(size - position, 1 << 20))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(bytes(message[:position]), size)
+                message[position : position + len(chunk)] = chunk
+                position += len(chunk)
+            return message
+        except asyncio.IncompleteReadError:
+            self._abort()
+            raise QReaderException('Error while reading data')
+        except asyncio.CancelledError:
+            # stream cannot be resynchronized after partial read
+            self._abort()
+            raise
+
+
+    def __call__(self, *parameters, **options):
+        return self.sendSync(parameters[0], *parameters[1:], **options)
@@ -14,45 +14,60 @@
 #  limitations under the License.
 #
 
-import numpy
-cimport numpy
+# cython: boundscheck=False, wraparound=False
 
-DTYPE = numpy.int
-ctypedef numpy.int_t DTYPE_t
-DTYPE8 = numpy.int
-ctypedef numpy.uint8_t DTYPE8_t
+from libc.string cimport memcpy
 
+import numpy
 
+cdef int _uncompress(const unsigned char* data, Py_ssize_t data_size,
+                     unsigned char* uncompressed, Py_ssize_t uncompressed_size) nogil:
+    cdef Py_ssize_t ptrs[256]
+    cdef Py_ssize_t n, r, s, p, pp, d, m
+    cdef unsigned int i, f
 
-def uncompress(numpy.ndarray[DTYPE8_t] data, DTYPE_t uncompressed_size):
-    cdef DTYPE_t n, r, i, d, s, p, pp, f
-    n, r, s, p, pp = 0, 0, 0, 0, 0
-    i, d = 1, 1
+    for m in range(256):
+        ptrs[m] = 0
 
-    cdef numpy.ndarray[DTYPE_t] ptrs = numpy.zeros(256, dtype = DTYPE)
-    cdef numpy.ndarray[DTYPE8_t] uncompressed = numpy.zeros(uncompressed_size, dtype = numpy.uint8)
-    cdef numpy.ndarray[DTYPE_t] idx = numpy.arange(uncompressed_size, dtype = DTYPE)
+    if data_size < 1:
+        return -1
 
-    f = 0xff & data[0]
+    s, p = 0, 0
+    i, d = 1, 1
+    f = data[0]
 
     while s < uncompressed_size:
         pp = p + 1
 
         if f & i:
+            if d + 1 >= data_size:
+                return -1
+
             r = ptrs[data[d]]
             n = 2 + data[d + 1]
-            uncompressed[idx[s:s + n]] = uncompressed[r:r + n]
+
+            if r >= s or s + n > uncompressed_size:
+                return -1
+
+            if r + n <= s:
+                memcpy(&uncompressed[s], &uncompressed[r], n)
+            else:
+                # back-references may overlap the output, copy forward byte by byte
+                for m in range(n):
+                    uncompressed[s + m] = uncompressed[r + m]
 
             ptrs[uncompressed[p] ^ uncompressed[pp]] = p
             if s == pp:
                 ptrs[uncompressed[pp] ^ uncompressed[pp + 1]] = pp
 
             d += 2
-            r += 2
-            s = s + n
+            s += n
             p = s
 
         else:
+            if d >= data_size:
+                return -1
+
             uncompressed[s] = data[d]
 
             if pp == s:
@@ -64,10 +79,238 @@ def uncompress(numpy.ndarray[DTYPE8_t] data, DTYPE_t uncompressed_size):
 
         if i == 128:
             if s < uncompressed_size:
-                f = 0xff & data[d]
+                if d >= data_size:
+                    return -1
+
+                f = data[d]
                 d += 1
                 i = 1
         else:
             i += i
 
-    return uncompressed
+    return 0
+
+
+
+def uncompress(const unsigned char[::1] data, Py_ssize_t uncompressed_size):
+    '''
+    Decompresses q IPC message payload.
+    
+    :Parameters:
+     - `data` (bytes-like) - compressed payload (without message header and 
+       uncompressed size)
+     - `uncompressed_size` (`integer`) - size of the decompressed payload
+    
+    :returns: `bytearray` with decompressed payload
+    :raises: `ValueError` if compressed payload is malformed
+    '''
+    cdef int status
+    cdef bytearray result = bytearray(uncompressed_size)
+    cdef unsigned char[::1] uncompressed = result
+
+    if uncompressed_size <= 0:
+        raise ValueError('Invalid uncompressed size: %s' % uncompressed_size)
+
+    if data.shape[0] == 0:
+        raise ValueError('Malformed compressed data')
+
+    with nogil:
+        status = _uncompress(&data[0], data.shape[0], &uncompressed[0], uncompressed_size)
+
+    if status != 0:
+        raise ValueError('Malformed compressed data')
+
+    return result
+
+
+
+cdef Py_ssize_t _compress(const unsigned char* data, Py_ssize_t data_size,
+                          unsigned char* compressed, Py_ssize_t compressed_size) nogil:
+    # positions are stored with an offset of 1, 0 denotes an empty slot
+    cdef Py_ssize_t ptrs[256]
+    cdef Py_ssize_t s, s0, c, d, p, r, q, m
+    cdef unsigned int i, f, h, h0
+    cdef bint literal
+
+    for m in range(256):
+        ptrs[m] = 0
+
+    s, s0, c, d = 0, 0, 0, 0
+    i, f, h, h0 = 0, 0, 0, 0
+
+    while s < data_size:
+        if i == 0:
+            if d > compressed_size - 17:
+                return -1
+
+            compressed[c] = f
+            c = d
+            d += 1
+            f = 0
+            i = 1
+
+        literal = s > data_size - 3
+        if not literal:
+            h = data[s] ^ data[s + 1]
+            p = ptrs[h] - 1
+            literal = p < 0 or data[s] != data[p]
+
+        if s0 > 0:
+            ptrs[h0] = s0
+            s0 = 0
+
+        if literal:
+            h0 = h
+            s0 = s + 1
+            compressed[d] = data[s]
+            d += 1
+            s += 1
+        else:
+            ptrs[h] = s + 1
+            f |= i
+            p += 2
+            s += 2
+            r = s
+            q = min(s + 255, data_size)
+
+            while s < q and data[s] == data[p]:
+                s += 1
+                p += 1
+
+            compressed[d] = h
+            compressed[d + 1] = s - r
+            d += 2
+
+        i = (i << 1) & 0xff
+
+    compressed[c] = f
+    return d
+
+
+
+def compress(const unsigned char[::1] data):
+    '''
+    Compresses q IPC message payload.
+    
+    :Parameters:
+     - `data` (bytes-like) - payload to be compressed (without message header)
+    
+    :returns: `bytearray` with compressed payload or ``None`` if compressed 
+              payload would exceed half of the `data` size
+    '''
+    cdef Py_ssize_t size
+    cdef bytearray result = bytearray(data.shape[0] // 2)
+    cdef unsigned char[::1] compressed
+
+    if len(result) < 17:
+        return None
+
+    compressed = result
+    with nogil:
+        size = _compress(&data[0], data.shape[0], &compressed[0], compressed.shape[0])
+    compressed = None
+
+    if size < 0:
+        return None
+
+    del result[size:]
+    return result
+
+
+
+cdef Py_ssize_t _find_strings(const unsigned char* data, Py_ssize_t data_size, Py_ssize_t count,
+                              bint little_endian, long long* starts, long long* lengths) nogil:
+    cdef Py_ssize_t i, p = 0
+    cdef long long n
+
+    for i in range(count):
+        # char atom: type (-10), char
+        if p + 2 <= data_size and data[p] == 246:
+            starts[i] = p + 1
+            lengths[i] = 1
+            p += 2
+            continue
+
+        # char vector: type (10), attributes, 32-bit length, data
+        if p + 6 > data_size or data[p] != 10:
+            return -1
+
+        if little_endian:
+            n = <int>(data[p + 2] | (data[p + 3] << 8) | (data[p + 4] << 16) | (<unsigned int>data[p + 5] << 24))
+        else:
+            n = <int>(data[p + 5] | (data[p + 4] << 8) | (data[p + 3] << 16) | (<unsigned int>data[p + 2] << 24))
+
+        if n < 0 or p + 6 + n > data_size:
+            return -1
+
+        starts[i] = p + 6
+        lengths[i] = n
+        p += 6 + n
+
+    return p
+
+
+
+def find_strings(const unsigned char[::1] data, Py_ssize_t count, bint little_endian):
+    '''
+    Locates `count` consecutive char vectors (or char atoms) in serialized 
+    data.
+    
+    :Parameters:
+     - `data` (bytes-like) - serialized data starting with the first vector
+     - `count` (`integer`) - number of vectors to be located
+     - `little_endian` (`boolean`) - byte order of the serialized data
+    
+    :returns: tuple of `numpy.array` of vectors offsets, `numpy.array` of 
+              vectors lengths and the size of scanned data or ``None`` if data 
+              doesn't consist of `count` char vectors
+    '''
+    cdef Py_ssize_t end
+    cdef long long[::1] starts_view
+    cdef long long[::1] lengths_view
+
+    starts = numpy.empty(count, dtype = numpy.int64)
+    lengths = numpy.empty(count, dtype = numpy.int64)
+    if count == 0:
+        return starts, lengths, 0
+
+    starts_view = starts
+    lengths_view = lengths
+    with nogil:
+        end = _find_strings(&data[0], data.shape[0], count, little_endian, &starts_view[0], &lengths_view[0])
+
+    if end < 0:
+        return None
+
+    return starts, lengths, end
+
+
+
+ctypedef fused raw_temporal_t:
+    int
+    long long
+
+
+
+def from_raw_temporals(const raw_temporal_t[::1] raw, long long[::1] array, long long offset, long long null):
+    '''
+    Shifts raw q temporal values by the epoch `offset`, q nulls are mapped to
+    ``NaT``. `array` may share memory with `raw` (conversion in place).
+    
+    :Parameters:
+     - `raw` (`numpy.array` of `int32` or `int64`) - raw q temporal values
+     - `array` (`numpy.array` of `int64`) - output array
+     - `offset` (`integer`) - epoch offset
+     - `null` (`integer`) - raw q null value
+    '''
+    cdef Py_ssize_t i
+    cdef long long value
+    cdef long long nat = -0x7fffffffffffffff - 1
+
+    if array.shape[0] != raw.shape[0]:
+        raise ValueError('Output array size doesn`t match the raw data')
+
+    with nogil:
+        for i in range(raw.shape[0]):
+            value = raw[i]
+            array[i] = nat if value == null else value + offset
@@ -0,0 +1,31 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+'''asyncio based connector, requires Python 3.5 or newer.'''
+
+import sys
+
+if sys.version_info < (3, 5):
+    raise ImportError('qpython.qasync requires Python 3.5 or newer')
+
+# coroutines are defined in separate module, so that importing this one on
+# older Python versions fails with ImportError instead of SyntaxError
+from qpython._qasync import AsyncQConnection  # @UnusedImport
+from qpython.qconnection import MessageType, QConnectionException, QAuthenticationException  # @UnusedImport
+from qpython.qreader import QReaderException  # @UnusedImport
+from qpython.qwriter import QWriterException  # @UnusedImport
+
+__all__ = ['AsyncQConnection']
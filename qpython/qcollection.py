@@ -16,7 +16,7 @@
 
 from qpython.qtype import *  # @UnusedWildImport
 from qpython import MetaData
-from qpython.qtemporal import qtemporal, from_raw_qtemporal, to_raw_qtemporal
+from qpython.qtemporal import QTemporal, qtemporal, from_raw_qtemporal, to_raw_qtemporal, array_from_raw_qtemporal, array_to_raw_qtemporal
 
 
 class QList(numpy.ndarray):
@@ -41,13 +41,67 @@ class QList(numpy.ndarray):
 
 
 class QTemporalList(QList):
-    '''An array object represents a q vector of datetime objects.'''
+    '''An array object represents a q vector of datetime objects.
+    
+    Elements are stored in raw q representation, :class:`.QTemporal` 
+    instances are created only when single elements are accessed. Slices are
+    returned as :class:`.QTemporalList` views, whole vectors can be converted
+    via :meth:`.to_numpy`.
+    '''
+
+    _ITER_CHUNK = 65536
 
     def __getitem__(self, idx):
-        return qtemporal(from_raw_qtemporal(numpy.ndarray.__getitem__(self, idx), -abs(self.meta.qtype)), qtype = -abs(self.meta.qtype))
+        item = numpy.ndarray.__getitem__(self, idx)
+        if isinstance(item, numpy.ndarray):
+            return item
+
+        qtype = -abs(self.meta.qtype)
+        return qtemporal(from_raw_qtemporal(item, qtype), qtype = qtype)
 
     def __setitem__(self, idx, value):
-        numpy.ndarray.__setitem__(self, idx, to_raw_qtemporal(value, - -abs(self.meta.qtype)))
+        qtype = -abs(self.meta.qtype)
+        if isinstance(value, QTemporal):
+            value = value.raw
+
+        if isinstance(value, numpy.ndarray) and value.dtype.type in (numpy.datetime64, numpy.timedelta64):
+            value = array_to_raw_qtemporal(value, qtype)
+        elif not isinstance(value, numpy.ndarray):
+            value = to_raw_qtemporal(value, qtype)
+
+        numpy.ndarray.__setitem__(self, idx, value)
+
+    def __iter__(self):
+        qtype = -abs(self.meta.qtype)
+        for i in range(0, len(self), self._ITER_CHUNK):
+            for dt in self[i : i + self._ITER_CHUNK].to_numpy():
+                yield qtemporal(dt, qtype = qtype)
+
+    def to_numpy(self):
+        '''Converts the vector to ``datetime64``/``timedelta64`` array.
+        
+           >>> t = qlist(numpy.array([366, 121, qnull(QDATE)]), qtype=QDATE_LIST)
+           >>> print(t.to_numpy())
+           ['2001-01-01' '2000-05-01' 'NaT']
+        
+        :returns: `numpy.array` with ``datetime64``/``timedelta64``
+        '''
+        return array_from_raw_qtemporal(self.view(numpy.ndarray), -abs(self.meta.qtype))
+
+    def iter_raw(self):
+        '''Iterates over raw representation of the datetime objects. Values 
+        are yielded as Python `int` (or `float` for datetimes) instances.
+        
+           >>> t = qlist(numpy.array([366, 121, qnull(QDATE)]), qtype=QDATE_LIST)
+           >>> print(list(t.iter_raw()))
+           [366, 121, -2147483648]
+        
+        :returns: iterator over raw values
+        '''
+        raw = self.view(numpy.ndarray)
+        for i in range(0, len(raw), self._ITER_CHUNK):
+            for value in raw[i : i + self._ITER_CHUNK].tolist():
+                yield value
 
     def raw(self, idx):
         '''Gets the raw representation of the datetime object at the specified 
@@ -68,6 +122,316 @@ class QTemporalList(QList):
 
 
 
+class QGUIDList(QList):
+    '''An array object represents a q vector of GUIDs.
+    
+    GUIDs are stored as contiguous 16-byte values (`numpy.dtype('V16')`), 
+    `uuid.UUID` instances are created only when elements are accessed.
+    
+       >>> g = qlist([uuid.UUID('8c680a01-5a49-5aab-5a65-d4bfddb6a661'), qnull(QGUID)], qtype=QGUID_LIST)
+       >>> print(g.dtype, g[0])
+       |V16 8c680a01-5a49-5aab-5a65-d4bfddb6a661
+    '''
+
+    def __getitem__(self, idx):
+        item = numpy.ndarray.__getitem__(self, idx)
+        return item if isinstance(item, numpy.ndarray) else uuid.UUID(bytes = bytes(item))
+
+    def __setitem__(self, idx, value):
+        numpy.ndarray.__setitem__(self, idx, _guid_array(value) if isinstance(value, (list, tuple, numpy.ndarray)) else numpy.void(value.bytes))
+
+    def __iter__(self):
+        for item in numpy.asarray(self):
+            yield uuid.UUID(bytes = bytes(item))
+
+    def __eq__(self, other):
+        if isinstance(other, numpy.ndarray) and other.dtype != GUID_DTYPE:
+            return numpy.array_equal(self.as_uuid(), other)
+        return numpy.array_equal(self, other)
+
+    def __hash__(self):
+        return QList.__hash__(self)
+
+    def __str__(self):
+        return str(self.as_uuid())
+
+    def __repr__(self):
+        return 'QGUIDList(%s)' % list(self)
+
+    def raw(self, idx):
+        '''Gets the raw (16-byte) representation of the GUID at the specified 
+        index.
+        
+        :Parameters:
+         - `idx` (`integer`) - array index of the GUID to be retrieved
+         
+        :returns: raw representation of the GUID
+        '''
+        return numpy.ndarray.__getitem__(self, idx)
+
+    def as_uuid(self):
+        '''Converts the vector to `numpy.array` of `uuid.UUID` objects.
+        
+        :returns: `numpy.array` of `uuid.UUID` objects
+        '''
+        array = numpy.empty(len(self), dtype = numpy.object_)
+        array[:] = list(self)
+        return array
+
+
+
+def _guid_array(array):
+    # converts GUIDs (uuid.UUID objects, 16-byte values or (n, 2) 64-bit 
+    # integers) into contiguous V16 representation
+    array = numpy.asarray(array) if not isinstance(array, numpy.ndarray) else array
+
+    if array.size == 0:
+        return numpy.empty(0, dtype = GUID_DTYPE)
+    elif array.dtype == numpy.object_:
+        return numpy.frombuffer(bytearray(b''.join(guid.bytes for guid in array)), dtype = GUID_DTYPE)
+    elif array.dtype.itemsize == 16 and array.ndim == 1:
+        return numpy.ascontiguousarray(array).view(GUID_DTYPE)
+    elif array.dtype.itemsize == 8 and array.ndim == 2 and array.shape[1] == 2:
+        return numpy.ascontiguousarray(array).view(GUID_DTYPE).reshape(len(array))
+
+    raise ValueError('Unable to convert array of type: %s to GUID vector' % array.dtype)
+
+
+
+# masks selecting the lowest n bytes of 64-bit little-endian word
+_BYTE_MASKS = numpy.array([(1 << (8 * n)) - 1 for n in range(9)], dtype = numpy.uint64)
+
+
+
+class QCompactSymbolList(object):
+    '''Represents a q symbol vector stored in a compact form.
+
+    Symbols are kept in a single contiguous block of ``\\x00`` terminated
+    strings (exactly as transferred in q IPC protocol) along with an array of
+    offsets, instead of a fixed-width `numpy.string_` array padded to the
+    longest symbol. Elements are retrieved as `numpy.string_`, fixed-width,
+    object and categorical representations are created on demand.
+
+    :class:`.QCompactSymbolList` is returned by the :class:`.QReader` when the
+    `compact_symbols` option is set. In such case the block references the
+    message buffer (no copy is made).
+
+       >>> s = QCompactSymbolList.from_symbols([b'Dent', b'Beeblebrox', b'Prefect'])
+       >>> print(len(s), s[1], s.to_fixed().dtype)
+       3 Beeblebrox |S10
+
+    :Parameters:
+     - `block` (`numpy.array` of `uint8`) - ``\\x00`` terminated symbols
+     - `offsets` (`numpy.array` of `int64`) - offsets of consecutive symbols
+       within the `block`, followed by an offset of the end of the last symbol
+       terminator
+    '''
+    def __init__(self, block, offsets):
+        self._block = block
+        self._offsets = offsets
+        self._dtype = None
+        self.meta = MetaData(qtype = QSYMBOL)
+
+    @staticmethod
+    def from_symbols(symbols):
+        '''Creates compact symbol vector out of a sequence of symbols.
+
+        :Parameters:
+         - `symbols` (list of `bytes` or `numpy.string_` array) - symbols
+
+        :returns: :class:`.QCompactSymbolList` - compact symbol vector
+        '''
+        symbols = [symbol if isinstance(symbol, bytes) else symbol.encode('latin-1') for symbol in symbols]
+        block = numpy.frombuffer(b''.join(symbol + b'\x00' for symbol in symbols), dtype = numpy.uint8)
+        return QCompactSymbolList.from_block(block, len(symbols))
+
+    @staticmethod
+    def from_block(block, count):
+        '''Creates compact symbol vector out of a block of ``count``
+        ``\\x00`` terminated strings.
+
+        :Parameters:
+         - `block` (`numpy.array` of `uint8`) - ``\\x00`` terminated symbols
+         - `count` (`integer`) - number of symbols
+
+        :returns: :class:`.QCompactSymbolList` - compact symbol vector
+
+        :raises: `ValueError`
+        '''
+        terminators = numpy.flatnonzero(block == 0)
+        if len(terminators) != count or (count and terminators[-1] != len(block) - 1):
+            raise ValueError('Block doesn`t contain %s symbols' % count)
+
+        offsets = numpy.empty(count + 1, dtype = numpy.int64)
+        offsets[0] = 0
+        offsets[1:] = terminators + 1
+        return QCompactSymbolList(block, offsets)
+
+    def _meta_init(self, **meta):
+        self.meta = MetaData(**meta)
+
+    @property
+    def block(self):
+        '''Contiguous block of ``\\x00`` terminated symbols.'''
+        return self._block[self._offsets[0] : self._offsets[-1]]
+
+    @property
+    def offsets(self):
+        '''Offsets of the symbols within the :attr:`.block`.'''
+        return self._offsets - self._offsets[0]
+
+    @property
+    def dtype(self):
+        '''`numpy.dtype` of the fixed-width representation.'''
+        if self._dtype is None:
+            self._dtype = numpy.dtype('S%d' % max(int(self._lengths().max()) if len(self) else 0, 1))
+        return self._dtype
+
+    @property
+    def shape(self):
+        return (len(self), )
+
+    @property
+    def nbytes(self):
+        return len(self.block) + self._offsets.nbytes
+
+    def _lengths(self):
+        return numpy.diff(self._offsets) - 1
+
+    def _take(self, indices):
+        # gathers selected symbols into a new block
+        starts = self._offsets[:-1][indices]
+        sizes = self._offsets[1:][indices] - starts
+        offsets = numpy.zeros(len(sizes) + 1, dtype = numpy.int64)
+        numpy.cumsum(sizes, out = offsets[1:])
+        positions = numpy.arange(offsets[-1], dtype = numpy.int64) + numpy.repeat(starts - offsets[:-1], sizes)
+        return QCompactSymbolList(self._block[positions], offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, long, numpy.integer)):
+            if idx < 0:
+                idx += len(self)
+            if idx < 0 or idx >= len(self):
+                raise IndexError('QCompactSymbolList index out of range: %s' % idx)
+            return numpy.string_(self._block[self._offsets[idx] : self._offsets[idx + 1] - 1].tostring())
+        elif isinstance(idx, slice) and idx.step in (None, 1):
+            start, stop, _ = idx.indices(len(self))
+            vector = QCompactSymbolList(self._block, self._offsets[start : max(start, stop) + 1])
+        elif isinstance(idx, slice):
+            vector = self._take(numpy.arange(*idx.indices(len(self))))
+        else:
+            idx = numpy.asarray(idx)
+            vector = self._take(numpy.flatnonzero(idx) if idx.dtype == numpy.bool_ else idx)
+
+        vector._meta_init(**self.meta.as_dict())
+        return vector
+
+    def __iter__(self):
+        for symbol in self.to_object():
+            yield numpy.string_(symbol)
+
+    def __array__(self, dtype = None):
+        array = self.to_fixed()
+        return array if dtype is None else array.astype(dtype)
+
+    def __eq__(self, other):
+        if isinstance(other, QCompactSymbolList):
+            return len(self) == len(other) and numpy.array_equal(self.block, other.block)
+        return numpy.array_equal(self.to_fixed(), other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((QSYMBOL_LIST, self.block.tostring()))
+
+    def __str__(self):
+        return str(self.to_fixed())
+
+    def __repr__(self):
+        return 'QCompactSymbolList(%s)' % list(self.to_object())
+
+    def to_fixed(self):
+        '''Converts the vector to fixed-width representation.
+
+        :returns: :class:`.QList` of `numpy.string_` - symbol vector as returned
+                  by the :class:`.QReader` by default
+        '''
+        count = len(self)
+        width = self.dtype.itemsize
+        words = (width + 7) // 8
+
+        # symbols are read as 64-bit words starting at every symbol offset,
+        # bytes beyond the symbol length are masked out
+        block = numpy.zeros(len(self.block) + 8, dtype = numpy.uint8)
+        block[:-8] = self.block
+        windows = numpy.ndarray(shape = (len(block) - 7, ), dtype = '<u8', buffer = block, strides = (1, ))
+
+        starts = self.offsets[:-1]
+        lengths = self._lengths()
+        matrix = numpy.empty((count, words), dtype = '<u8')
+
+        for i in range(words):
+            if i:
+                starts = numpy.minimum(starts + 8, len(block) - 8)
+            numpy.bitwise_and(windows[starts], _BYTE_MASKS[numpy.clip(lengths - 8 * i, 0, 8)], out = matrix[:, i])
+
+        fixed = matrix.view('S%d' % (words * 8)).reshape(count)
+        return qlist(fixed.astype(self.dtype) if fixed.dtype != self.dtype else fixed, qtype = QSYMBOL_LIST, adjust_dtype = False)
+
+    def to_object(self):
+        '''Converts the vector to `numpy.array` of `bytes` objects.
+
+        :returns: `numpy.array` of `bytes` objects
+        '''
+        array = numpy.empty(len(self), dtype = numpy.object_)
+        if len(self):
+            array[:] = self._block[self._offsets[0] : self._offsets[-1] - 1].tostring().split(b'\x00')
+        return array
+
+    def to_categorical(self):
+        '''Converts the vector to `pandas.Categorical`.
+
+        :returns: `pandas.Categorical` with symbols as categories
+        '''
+        import pandas
+
+        categories, codes = unique_symbols(self.to_fixed())
+        return pandas.Categorical.from_codes(codes, categories = categories)
+
+
+
+def unique_symbols(symbols):
+    '''Finds unique symbols and indices reconstructing the input symbols.
+    
+    Symbols up to 8 bytes long are compared as 64-bit integers.
+    
+       >>> unique, inverse = unique_symbols(numpy.array([b'IBM', b'MSFT', b'IBM']))
+       >>> print(unique, inverse)
+       [b'IBM' b'MSFT'] [0 1 0]
+    
+    :Parameters:
+     - `symbols` (`numpy.string_` array or list of `bytes`) - symbols
+    
+    :returns: `tuple` - sorted `numpy.string_` array of unique symbols and
+              `numpy.array` of indices into it
+    '''
+    symbols = numpy.asarray(symbols)
+    if len(symbols) == 0:
+        return symbols.astype(numpy.string_), numpy.empty(0, dtype = numpy.intp)
+
+    symbols = symbols.astype(numpy.string_) if symbols.dtype == numpy.object_ else symbols
+    if symbols.dtype.itemsize <= 8:
+        # big-endian keys preserve the lexicographical order
+        unique, inverse = numpy.unique(symbols.astype('S8').view('>u8').astype(numpy.uint64), return_inverse = True)
+        return unique.astype('>u8').view('S8').astype(symbols.dtype), inverse
+    return numpy.unique(symbols, return_inverse = True)
+
+
+
 def get_list_qtype(array):
     '''Finds out a corresponding qtype for a specified `QList`/`numpy.ndarray` 
     instance.
@@ -88,16 +452,26 @@ def get_list_qtype(array):
     if str(array.dtype) in ('|S1', '<U1', '>U1', '|U1') :
         qtype = QCHAR
 
+    if array.dtype == GUID_DTYPE:
+        qtype = QGUID
+
     if qtype is None:
         qtype = Q_TYPE.get(array.dtype.type, None)
 
     if qtype is None and array.dtype.type in (numpy.datetime64, numpy.timedelta64):
         qtype = TEMPORAL_PY_TYPE.get(str(array.dtype), None)
 
+    if qtype is None and array.dtype.kind == 'U':
+        qtype = QSYMBOL
+
     if qtype is None:
         # determinate type based on first element of the numpy array
         qtype = Q_TYPE.get(type(array[0]), QGENERAL_LIST)
 
+        if qtype == QSTRING:
+            # assume we have a generic list of strings -> force representation as symbol list
+            qtype = QSYMBOL
+
     return qtype
 
 
@@ -183,12 +557,19 @@ def qlist(array, adjust_dtype = True, **meta):
     if meta and 'qtype' in meta:
         qtype = -abs(meta['qtype'])
         dtype = PY_TYPE[qtype]
-        if adjust_dtype and dtype != array.dtype and not is_numpy_temporal:
+        if qtype == QGUID:
+            array = _guid_array(array)
+        elif adjust_dtype and dtype != array.dtype and not is_numpy_temporal:
             array = array.astype(dtype = dtype)
 
     qtype = get_list_qtype(array) if qtype is None else qtype
     meta['qtype'] = qtype
 
+    if qtype == QGUID:
+        vector = _guid_array(array).view(QGUIDList)
+        vector._meta_init(**meta)
+        return vector
+
     is_raw_temporal = meta['qtype'] in [QMONTH, QDATE, QDATETIME, QMINUTE, QSECOND, QTIME, QTIMESTAMP, QTIMESPAN] \
                       and not is_numpy_temporal
     vector = array.view(QList) if not is_raw_temporal else array.view(QTemporalList)
@@ -197,6 +578,175 @@ def qlist(array, adjust_dtype = True, **meta):
 
 
 
+def _index_column(column):
+    # representation of a key column stored in the hash index
+    if isinstance(column, QCompactSymbolList):
+        return column.to_fixed()
+    if isinstance(column, numpy.ndarray):
+        array = column.view(numpy.ndarray)
+        return array.view(numpy.int64) if array.dtype.kind in 'Mm' else array
+    return column
+
+
+def _index_key(column, key):
+    # converts a single key to representation stored in the hash index
+    if isinstance(key, QTemporal):
+        key = key.raw
+
+    if isinstance(key, (numpy.datetime64, numpy.timedelta64)):
+        if isinstance(column, QTemporalList):
+            return to_raw_qtemporal(key, -abs(column.meta.qtype))
+        if isinstance(column, numpy.ndarray) and column.dtype.kind in 'Mm':
+            return numpy.array(key).astype(column.dtype).view(numpy.int64)[()]
+    return key
+
+
+def _snapshot(column):
+    # copy of a key column used to detect in place modifications, compact 
+    # symbol lists are immutable
+    if isinstance(column, QCompactSymbolList):
+        return None
+    return column.copy() if isinstance(column, numpy.ndarray) else list(column)
+
+
+def _unchanged(snapshot, column):
+    if snapshot is None:
+        return True
+    if isinstance(snapshot, numpy.ndarray):
+        if snapshot.dtype != column.dtype or snapshot.shape != column.shape:
+            return False
+        if snapshot.dtype.kind != 'O':
+            # compared bitwise as words, fast for strings and NaN keys are 
+            # equal
+            word = numpy.uint64 if snapshot.nbytes % 8 == 0 else numpy.uint8
+            snapshot, column = snapshot.reshape(-1).view(word), numpy.ascontiguousarray(column).reshape(-1).view(word)
+        return numpy.array_equal(snapshot, column)
+    return snapshot == list(column)
+
+
+def _index_keys(column, keys):
+    # converts a vector of keys to representation stored in the hash index
+    if isinstance(keys, QCompactSymbolList):
+        return keys.to_fixed()
+
+    if not isinstance(column, numpy.ndarray) and isinstance(keys, (list, tuple)):
+        return keys
+
+    keys = numpy.asarray(keys)
+    if keys.dtype.kind in 'Mm':
+        if isinstance(column, QTemporalList):
+            return array_to_raw_qtemporal(keys, -abs(column.meta.qtype))
+        if isinstance(column, numpy.ndarray) and column.dtype.kind in 'Mm':
+            return keys.astype(column.dtype).view(numpy.int64)
+    return keys
+
+
+
+class _KeyIndex(object):
+    # hash index over (possibly multiple) key columns, positions refer to the 
+    # first occurrence of a key; vectorized lookups are resolved via sorted 
+    # codes built on first use
+    #
+    # keys can be modified in place via any view, so the index is validated
+    # on use: the key found at the indexed position is compared with the 
+    # looked up one, misses and bulk lookups compare the keys with the 
+    # snapshot taken when the index was built
+
+    def __init__(self, keys):
+        self._keys = keys
+        # live views over the keys and their copies
+        self._views = [_index_column(column) if not isinstance(column, QCompactSymbolList) else column for column in keys]
+        self._snapshots = [_snapshot(column) for column in self._views]
+        self._columns = [column.to_fixed() if snapshot is None else snapshot for column, snapshot in zip(self._views, self._snapshots)]
+        rows = self._rows(self._columns)
+        self._positions = dict(zip(reversed(rows), range(len(rows) - 1, -1, -1)))
+        self._uniques = None
+
+    def is_valid(self, keys):
+        '''Checks whether the index reflects current `keys`.'''
+        return all(column is current for column, current in zip(self._keys, keys)) \
+            and all(_unchanged(snapshot, column) for snapshot, column in zip(self._snapshots, self._views))
+
+    def find(self, keys, key):
+        '''Position of the `key` (in index representation) in the current
+        `keys`, ``None`` if the index is stale.'''
+        idx = self.get(key)
+        if idx >= 0:
+            if len(self._views) == 1:
+                valid = self._keys[0] is keys[0] and self._views[0][idx] == key
+            else:
+                valid = all(column is current for column, current in zip(self._keys, keys)) and tuple(view[idx] for view in self._views) == key
+            return idx if valid else None
+        return idx if self.is_valid(keys) else None
+
+    @staticmethod
+    def _rows(columns):
+        columns = [column.tolist() if isinstance(column, numpy.ndarray) else list(column) for column in columns]
+        return columns[0] if len(columns) == 1 else list(zip(*columns))
+
+    def get(self, key):
+        try:
+            return self._positions.get(key, -1)
+        except TypeError:
+            # unhashable keys are never present in the index
+            return -1
+
+    def lookup(self, keys):
+        try:
+            return self._lookup(keys)
+        except TypeError:
+            # keys cannot be ordered, resolved one by one
+            return numpy.array([self.get(key) for key in self._rows(keys)], dtype = numpy.int64)
+
+    def _build_codes(self):
+        if not all(isinstance(column, numpy.ndarray) for column in self._columns):
+            raise TypeError('Key columns cannot be encoded')
+
+        uniques = [numpy.unique(column) for column in self._columns]
+        if numpy.prod([float(max(len(unique), 1)) for unique in uniques]) >= 2 ** 62:
+            raise TypeError('Key columns cannot be encoded')
+
+        codes = numpy.zeros(len(self._columns[0]), dtype = numpy.int64)
+        for unique, column in zip(uniques, self._columns):
+            codes = codes * len(unique) + numpy.searchsorted(unique, column)
+
+        self._sorter = numpy.argsort(codes, kind = 'mergesort')
+        self._codes = codes[self._sorter]
+        self._uniques = uniques
+
+    def _lookup(self, keys):
+        if self._uniques is None:
+            self._build_codes()
+
+        keys = [numpy.asarray(key) for key in keys]
+        codes = numpy.zeros(len(keys[0]), dtype = numpy.int64)
+        found = numpy.ones(len(keys[0]), dtype = numpy.bool_)
+
+        for unique, key in zip(self._uniques, keys):
+            if unique.dtype.kind == 'O' and key.dtype.kind != 'O':
+                key = key.astype(numpy.object_)
+            elif key.dtype.kind == 'O' and len(key):
+                key = numpy.array(key.tolist())
+
+            if key.dtype.kind != unique.dtype.kind and not (key.dtype.kind in 'biu' and unique.dtype.kind in 'biu'):
+                raise TypeError('Keys are not comparable with the index')
+
+            if len(unique) == 0:
+                return numpy.full(len(keys[0]), -1, dtype = numpy.int64)
+
+            position = numpy.minimum(numpy.searchsorted(unique, key), len(unique) - 1)
+            found &= unique[position] == key
+            codes = codes * len(unique) + position
+
+        if len(self._codes) == 0:
+            return numpy.full(len(codes), -1, dtype = numpy.int64)
+
+        position = numpy.minimum(numpy.searchsorted(self._codes, codes), len(self._codes) - 1)
+        found &= self._codes[position] == codes
+        return numpy.where(found, self._sorter[position], -1).astype(numpy.int64)
+
+
+
 class QDictionary(object):
     '''Represents a q dictionary.
     
@@ -227,6 +777,18 @@ class QDictionary(object):
         self.keys = keys
         self.values = values
 
+    @property
+    def keys(self):
+        '''Dictionary keys. Key lookups are resolved via hash index built on
+        first use, the index is rebuilt when keys are reassigned or modified
+        in place.'''
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys):
+        self._keys = keys
+        self._key_index = None
+
     def __str__(self, *args, **kwargs):
         return '%s!%s' % (self.keys, self.values)
 
@@ -245,12 +807,34 @@ class QDictionary(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def _get_key_index(self, rebuild = False):
+        if self._key_index is None or (rebuild and self._key_index):
+            try:
+                self._key_index = _KeyIndex([self.keys])
+            except TypeError:
+                # unhashable keys, lookups fall back to linear scan
+                self._key_index = False
+
+        return self._key_index
+
     def _find_key_(self, key):
-        idx = 0
-        for k in self.keys:
-            if key == k:
+        index = self._get_key_index()
+        if index:
+            indexed = _index_key(self.keys, key)
+            idx = index.find([self.keys], indexed)
+            if idx is None:
+                # keys were modified in place
+                index = self._get_key_index(rebuild = True)
+                idx = index.get(indexed) if index else -1
+            if idx >= 0:
                 return idx
-            idx += 1
+
+        if not index:
+            idx = 0
+            for k in self.keys:
+                if key == k:
+                    return idx
+                idx += 1
 
         raise KeyError('QDictionary doesn`t contain key: %s' % key)
 
@@ -260,6 +844,40 @@ class QDictionary(object):
     def __setitem__(self, key, value):
         self.values[self._find_key_(key)] = value
 
+    def __contains__(self, key):
+        try:
+            self._find_key_(key)
+            return True
+        except KeyError:
+            return False
+
+    def lookup(self, keys):
+        '''Finds positions of the `keys` in the dictionary.
+        
+           >>> d = QDictionary(qlist(numpy.array([1, 2, 3], dtype=numpy.int64), qtype=QLONG_LIST), 
+           ...                 qlist(numpy.array(['abc', 'cdefgh', 'ij']), qtype=QSYMBOL_LIST))
+           >>> print(d.lookup([3, 4, 1]))
+           [ 2 -1  0]
+        
+        :Parameters:
+         - `keys` (`QList`, `numpy.array`, `tuple` or `list`) - keys to be found
+         
+        :returns: `numpy.array` of `int64` positions, ``-1`` for missing keys
+        '''
+        index = self._get_key_index()
+        if index and not index.is_valid([self.keys]):
+            index = self._get_key_index(rebuild = True)
+        if index:
+            return index.lookup([_index_keys(self.keys, keys)])
+
+        positions = []
+        for key in keys:
+            try:
+                positions.append(self._find_key_(key))
+            except KeyError:
+                positions.append(-1)
+        return numpy.array(positions, dtype = numpy.int64)
+
     def __len__(self):
         return len(self.keys)
 
@@ -285,23 +903,246 @@ class QDictionary(object):
 
 
 
-class QTable(numpy.recarray):
+class QTable(object):
     '''Represents a q table.
     
-    Internal table data is stored as a `numpy.array` separately for each column.
-    This mimics the internal representation of tables in q.
+    Internal table data is stored as a :class:`.QList` separately for each 
+    column. This mimics the internal representation of tables in q, columns 
+    are neither copied nor interleaved into a row-major record buffer.
+    
+    :class:`.QTable` provides `numpy.recarray` like API:
+     - ``t['name']`` or ``t.name`` - returns a column as `numpy.ndarray` 
+       view (no copy),
+     - ``t[0]`` - returns a row as `numpy.record`,
+     - ``t[1:3]``, ``t[t['iq'] > 50]``, ``t[[0, 2]]`` - returns a 
+       :class:`.QTable` with selected rows,
+     - ``t.dtype`` - returns structured `numpy.dtype` describing the columns,
+     - ``numpy.asarray(t)`` or ``t.to_recarray()`` - copies the table into 
+       a structured array.
+    
+    :class:`.QTable` is not a `numpy.ndarray` subclass, code passing tables 
+    to numpy functions expecting arrays has to convert them first.
+    
+    :Parameters:
+     - `columns` (list of `strings`) - table column names
+     - `data` (list of :class:`.QList`) - list of columns containing table data
+    
+    :Options:
+     - `length` (`integer` or `None`) - number of rows, used for tables 
+       without columns (e.g. when column projection selects none of them)
+    
+    :raises: `ValueError`
     '''
+    def __init__(self, columns, data, length = None):
+        if len(columns) != len(data):
+            raise ValueError('Number of columns doesn`t match the data layout. %s vs %s' % (len(columns), len(data)))
+
+        if data:
+            length = len(data[0]) if length is None else length
+            if any(len(column) != length for column in data):
+                raise ValueError('Table columns are required to have the same length')
+
+        self._columns = list(columns)
+        self._data = list(data)
+        self._length = length or 0
+        self._index = dict((column, i) for i, column in enumerate(self._columns))
+        self._dtype = numpy.dtype([(column, self._data[i].dtype) for i, column in enumerate(self._columns)])
+        self.meta = MetaData()
+
     def _meta_init(self, **meta):
         self.meta = MetaData(**meta)
 
+    @property
+    def dtype(self):
+        '''Structured `numpy.dtype` describing table columns.'''
+        return self._dtype
+
+    @property
+    def shape(self):
+        return (len(self), )
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def size(self):
+        return len(self)
+
+    def to_recarray(self):
+        '''Copies the table into a `numpy.recarray`.
+        
+        Provides a compatibility path for code relying on table being a 
+        `numpy.ndarray` (ufuncs, record array methods, ``isinstance`` checks).
+        
+        :returns: `numpy.recarray` with a copy of the table data
+        '''
+        return self.__array__().view(numpy.recarray)
+
+    def column(self, name):
+        '''Gets the column data as :class:`.QList`.
+        
+        :Parameters:
+         - `name` (`string`) - column name
+         
+        :returns: :class:`.QList` backing the column
+        '''
+        try:
+            return self._data[self._index[name]]
+        except KeyError:
+            raise KeyError('QTable doesn`t contain column: %s' % name)
+
+    def _get_data(self):
+        return self._data
+
+    def _row(self, idx):
+        return numpy.rec.fromrecords([tuple(column[idx] if isinstance(column, QCompactSymbolList) else numpy.asarray(column)[idx] for column in self._get_data())], dtype = self.dtype)[0]
+
+    def _select(self, idx):
+        data = []
+        for column in self._get_data():
+            if isinstance(column, QCompactSymbolList):
+                data.append(column[idx])
+                continue
+
+            selection = numpy.asarray(column)[idx]
+            vector = selection.view(type(column))
+            vector._meta_init(**column.meta.as_dict())
+            data.append(vector)
+
+        table = QTable(self._columns, data, None if data else len(numpy.arange(len(self))[idx]))
+        table._meta_init(**self.meta.as_dict())
+        return table
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (str, bytes)):
+            return numpy.asarray(self.column(idx if isinstance(idx, str) else idx.decode('utf-8')))
+        elif isinstance(idx, (int, long, numpy.integer)):
+            if idx < -len(self) or idx >= len(self):
+                raise IndexError('QTable index out of range: %s' % idx)
+            return self._row(idx)
+        else:
+            return self._select(idx)
+
+    def __setitem__(self, idx, value):
+        if isinstance(idx, (str, bytes)):
+            numpy.asarray(self.column(idx if isinstance(idx, str) else idx.decode('utf-8')))[...] = value
+        else:
+            raise TypeError('QTable supports only column assignment')
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or attr not in self.__dict__.get('_index', ()):
+            raise AttributeError('\'%s\' object has no attribute \'%s\'' % (self.__class__.__name__, attr))
+        return self[attr]
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __array__(self, dtype = None):
+        array = numpy.empty(len(self), dtype = self.dtype)
+        for column, data in zip(self._columns, self._get_data()):
+            array[column] = numpy.asarray(data)
+        return array if dtype is None else array.astype(dtype)
+
     def __eq__(self, other):
-        return numpy.array_equal(self, other)
+        if isinstance(other, QTable):
+            return self._columns == other._columns and len(self) == len(other) and all(numpy.array_equal(left, right) for left, right in zip(self._get_data(), other._get_data()))
+        return numpy.array_equal(self.__array__(), other)
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def __array_finalize__(self, obj):
-        self.meta = MetaData() if obj is None else getattr(obj, 'meta', MetaData())
+    def __str__(self):
+        return str(self.__array__())
+
+    def __repr__(self):
+        return '%s(%s, dtype=%s)' % (self.__class__.__name__, self.__array__(), self.dtype)
+
+
+
+class QLazyTable(QTable):
+    '''Represents a q table which columns are decoded on first access.
+    
+    :class:`.QLazyTable` is returned by the :class:`.QReader` when the 
+    `lazy_tables` option is set. The reader only records where each column 
+    starts in the message, a column is decoded (and cached) when it is first 
+    accessed. Operations touching all columns (e.g. `dtype`, iteration over 
+    rows, conversion via `numpy.asarray`, serialization) decode all remaining
+    columns.
+    
+    :Parameters:
+     - `columns` (list of `strings`) - table column names
+     - `loaders` (list of callables) - functions decoding particular columns
+     - `length` (`integer`) - number of rows
+    '''
+    def __init__(self, columns, loaders, length):
+        if len(columns) != len(loaders):
+            raise ValueError('Number of columns doesn`t match the data layout. %s vs %s' % (len(columns), len(loaders)))
+
+        self._columns = list(columns)
+        self._data = [None] * len(self._columns)
+        self._loaders = list(loaders)
+        self._length = length
+        self._index = dict((column, i) for i, column in enumerate(self._columns))
+        self._dtype = None
+        self.meta = MetaData()
+
+    @property
+    def dtype(self):
+        '''Structured `numpy.dtype` describing table columns.'''
+        if self._dtype is None:
+            self._dtype = numpy.dtype([(column, data.dtype) for column, data in zip(self._columns, self._get_data())])
+        return self._dtype
+
+    def is_loaded(self, name):
+        '''Checks whether the column has been already decoded.
+        
+        :Parameters:
+         - `name` (`string`) - column name
+         
+        :returns: ``True`` if the column is decoded, ``False`` otherwise
+        '''
+        return self._data[self._index[name]] is not None
+
+    def column(self, name):
+        try:
+            i = self._index[name]
+        except KeyError:
+            raise KeyError('QTable doesn`t contain column: %s' % name)
+
+        if self._data[i] is None:
+            self._data[i] = _table_column(self._loaders[i]())
+            self._loaders[i] = None
+        return self._data[i]
+
+    def _get_data(self):
+        return [self.column(column) for column in self._columns]
+
+
+
+def _table_column(data, qtype = None):
+    if isinstance(data, QCompactSymbolList):
+        return data
+
+    if isinstance(data, str):
+        # convert character list (represented as string) to numpy representation
+        data = numpy.array(list(data), dtype = numpy.string_)
+    if isinstance(data, bytes):
+        data = numpy.array(list(data.decode()), dtype = numpy.string_)
+
+    if qtype is not None:
+        data = qlist(data, qtype = qtype)
+    elif not isinstance(data, QList):
+        if type(data) in (list, tuple):
+            data = qlist(data, qtype = QGENERAL_LIST)
+        else:
+            data = qlist(data)
+
+    return data
 
 
 
@@ -309,9 +1150,10 @@ def qtable(columns, data, **meta):
     '''Creates a QTable out of given column names and data, and initialises the 
     meta data.
     
-    :class:`.QTable` is represented internally by `numpy.core.records.recarray`.
+    :class:`.QTable` keeps data for each column as a separate :class:`.QList`.
     Data for each column is converted to :class:`.QList` via :func:`.qlist` 
-    function. If qtype indicator is defined for a column, this information
+    function (columns which already are :class:`.QList` instances are not 
+    copied). If qtype indicator is defined for a column, this information
     is used for explicit array conversion.
     
     Table examples:
@@ -364,31 +1206,16 @@ def qtable(columns, data, **meta):
     if not 'qtype' in meta:
         meta['qtype'] = QTABLE
 
-    dtypes = []
+    data = list(data)
+    column_names = []
     for i in range(len(columns)):
         column_name = columns[i] if isinstance(columns[i], str) else columns[i].decode("utf-8")
         
-        if isinstance(data[i], str):
-            # convert character list (represented as string) to numpy representation
-            data[i] = numpy.array(list(data[i]), dtype = numpy.string_)
-        if isinstance(data[i], bytes):
-            data[i] = numpy.array(list(data[i].decode()), dtype = numpy.string_)
-
-        if column_name in meta:
-            data[i] = qlist(data[i], qtype = meta[column_name])
-        elif not isinstance(data[i], QList):
-            if type(data[i]) in (list, tuple):
-                data[i] = qlist(data[i], qtype = QGENERAL_LIST)
-            else:
-                data[i] = qlist(data[i])
-
-        
+        data[i] = _table_column(data[i], meta[column_name] if column_name in meta else None)
         meta[column_name] = data[i].meta.qtype
-        dtypes.append((column_name, data[i].dtype))
-
-    table = numpy.core.records.fromarrays(data, dtype = dtypes)
-    table = table.view(QTable)
+        column_names.append(column_name)
 
+    table = QTable(column_names, data)
     table._meta_init(**meta)
     return table
 
@@ -433,11 +1260,85 @@ class QKeyedTable(object):
         self.keys = keys
         self.values = values
 
+    @property
+    def keys(self):
+        '''Table keys. Key lookups are resolved via hash index built on first
+        use, the index is rebuilt when keys are reassigned or modified in 
+        place.'''
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys):
+        self._keys = keys
+        self._key_index = None
+
+    def _get_key_index(self, rebuild = False):
+        if self._key_index is None or rebuild:
+            self._key_index = _KeyIndex(self.keys._get_data())
+        return self._key_index
+
+    def _find_key_(self, key):
+        columns = self.keys._get_data()
+        row = tuple(key) if isinstance(key, (tuple, list, numpy.void)) else (key, )
+
+        if len(row) == len(columns):
+            row = [_index_key(column, k) for column, k in zip(columns, row)]
+            row = row[0] if len(row) == 1 else tuple(row)
+            idx = self._get_key_index().find(columns, row)
+            if idx is None:
+                # keys were modified in place
+                idx = self._get_key_index(rebuild = True).get(row)
+            if idx >= 0:
+                return idx
+
+        raise KeyError('QKeyedTable doesn`t contain key: %s' % (key, ))
+
+    def __getitem__(self, key):
+        return self.values[self._find_key_(key)]
+
+    def __contains__(self, key):
+        try:
+            self._find_key_(key)
+            return True
+        except KeyError:
+            return False
+
+    def lookup(self, keys):
+        '''Finds positions of the `keys` in the keyed table.
+        
+           >>> t = QKeyedTable(qtable(['eid'], [qlist(numpy.array([1001, 1002, 1003]), qtype = QLONG_LIST)]),
+           ...                 qtable(['pos'], [qlist(numpy.array(['d1', 'd2', 'd3']), qtype = QSYMBOL_LIST)]))
+           >>> print(t.lookup([1003, 1001, 1004]))
+           [ 2  0 -1]
+        
+        :Parameters:
+         - `keys` (`QTable`, structured `numpy.array`, list of key columns or
+           a single key column) - keys to be found
+         
+        :returns: `numpy.array` of `int64` positions, ``-1`` for missing keys
+        '''
+        columns = self.keys._get_data()
+
+        if isinstance(keys, QTable):
+            keys = [keys.column(name) for name in self.keys._columns]
+        elif isinstance(keys, numpy.ndarray) and keys.dtype.names:
+            keys = [keys[name] for name in keys.dtype.names]
+        elif len(columns) == 1:
+            keys = [keys]
+
+        if len(keys) != len(columns):
+            raise ValueError('Expected %d key columns. Actual: %d' % (len(columns), len(keys)))
+
+        index = self._get_key_index()
+        if not index.is_valid(columns):
+            index = self._get_key_index(rebuild = True)
+        return index.lookup([_index_keys(column, k) for column, k in zip(columns, keys)])
+
     def __str__(self, *args, **kwargs):
         return '%s!%s' % (self.keys, self.values)
 
     def __eq__(self, other):
-        return isinstance(other, QKeyedTable) and numpy.array_equal(self.keys, other.keys) and numpy.array_equal(self.values, other.values)
+        return isinstance(other, QKeyedTable) and self.keys == other.keys and self.values == other.values
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -16,10 +16,11 @@
 
 import socket
 import struct
+import sys
 
 from qpython import MetaData, CONVERSION_OPTIONS
 from qpython.qtype import QException
-from qpython.qreader import QReader, QReaderException
+from qpython.qreader import QReader, QReaderException, QSymbolCache
 from qpython.qwriter import QWriter, QWriterException
 
 
@@ -36,6 +37,47 @@ class QAuthenticationException(QConnectionException):
 
 
 
+#: prefix of the host addressing a co-located q service via Unix domain socket
+UNIX_SOCKET_PREFIX = 'unix://'
+
+
+def _unix_socket_paths(host, port):
+    '''Resolves paths of the Unix domain socket addressed by the `host`.
+
+    The host ``unix://`` addresses socket ``/tmp/kx.<port>`` the q service
+    listens on, the port can be also given as a part of the host (e.g.
+    ``unix://5000``). On Linux, kdb+ 3.4+ listens on the socket in the 
+    abstract namespace, so (as in the kdb+ C client) the abstract socket
+    ``\\0/tmp/kx.<port>`` is tried first, followed by the socket file. Any 
+    other suffix is treated as path of the socket, path starting with ``@`` 
+    denotes a socket in the Linux abstract namespace.
+
+    :returns: list of `strings` -- paths of the socket to be tried in order 
+              or ``None`` if the `host` does not address a Unix domain socket
+    '''
+    if not host or not str(host).startswith(UNIX_SOCKET_PREFIX):
+        return None
+
+    path = host[len(UNIX_SOCKET_PREFIX):]
+    if not path or path.isdigit():
+        path = '/tmp/kx.%s' % (path if path else port)
+        return ['\0' + path, path] if sys.platform.startswith('linux') else [path]
+    elif path.startswith('@'):
+        return ['\0' + path[1:]]
+    else:
+        return [path]
+
+
+def _address(host, port):
+    if host == UNIX_SOCKET_PREFIX:
+        return '%s%s' % (host, port)
+    elif _unix_socket_paths(host, port) is not None:
+        return host
+    else:
+        return '%s:%s' % (host, port)
+
+
+
 class MessageType(object):
     '''Enumeration defining IPC protocol message types.'''
     ASYNC = 0
@@ -56,8 +98,16 @@ class QConnection(object):
             print(q)
             print(q('{`int$ til x}', 10))
     
+    Co-located q service can be reached via Unix domain socket, which avoids
+    overhead of the loopback TCP stack::
+
+        with qconnection.QConnection(host = 'unix://', port = 5000) as q:
+            print(q('til 10'))
+    
     :Parameters:
-     - `host` (`string`) - q service hostname
+     - `host` (`string`) - q service hostname or ``unix://`` to connect via
+       Unix domain socket ``/tmp/kx.<port>`` (abstract socket is tried first
+       on Linux, ``unix://<path>`` connects to the socket with given path)
      - `port` (`integer`) - q service port
      - `username` (`string` or `None`) - username for q authentication/authorization
      - `password` (`string` or `None`) - password for q authentication/authorization
@@ -65,6 +115,8 @@ class QConnection(object):
      - `encoding` (`string`) - string encoding for data deserialization
      - `reader_class` (subclass of `QReader`) - data deserializer
      - `writer_class` (subclass of `QWriter`) - data serializer
+     - `symbol_cache` (:class:`.QSymbolCache` or `None`) - if set, symbols in
+       received messages are interned in the cache
     :Options: 
      - `raw` (`boolean`) - if ``True`` returns raw data chunk instead of parsed 
        data, **Default**: ``False``
@@ -73,24 +125,50 @@ class QConnection(object):
        :class:`.QTemporal`) instances, otherwise are represented as 
        `numpy datetime64`/`timedelta64` arrays and atoms,
        **Default**: ``False``
+     - `lazy_tables` (`boolean`) - if ``True`` tables are returned as 
+       :class:`.QLazyTable` instances with columns decoded on first access, 
+       **Default**: ``False``
+     - `columns` (list of `strings` or `None`) - if set, only listed columns 
+       of tables are decoded, remaining columns are skipped (keys of keyed 
+       tables are always decoded), **Default**: ``None``
+     - `compact_symbols` (`boolean`) - if ``True`` symbol vectors are 
+       returned as :class:`.QCompactSymbolList` instances backed by the 
+       message buffer, **Default**: ``False``
+     - `categorical_symbols` (`boolean`) - if ``True`` and ``pandas`` flag is 
+       set, symbol vectors are returned as ``pandas.Categorical``, 
+       **Default**: ``False``
+     - `nullable_dtypes` (`boolean`) - if ``True`` and ``pandas`` flag is set, 
+       integer vectors are returned as pandas nullable integer arrays 
+       instead of being converted to floats, **Default**: ``False``
+     - `string_dtype` (`string` or `None`) - if set and ``pandas`` flag is set, 
+       char vectors and string list columns are decoded to series of 
+       given dtype (e.g. ``object`` or ``'string'``), **Default**: ``None``
      - `single_char_strings` (`boolean`) - if ``True`` single char Python 
        strings are encoded as q strings instead of chars, **Default**: ``False``
+     - `compress` (`boolean`) - if ``True`` queries larger than 
+       `compress_threshold` are sent in compressed form, 
+       **Default**: ``False``
+     - `compress_threshold` (`integer`) - minimal size (in bytes) of the 
+       message to be compressed, **Default**: ``2000``
+     - `scatter_gather` (`boolean`) - if ``True`` queries are sent via 
+       vectored writes referencing vector data instead of being copied into 
+       a single buffer, **Default**: ``False``
     '''
 
 
-    def __init__(self, host, port, username = None, password = None, timeout = None, encoding = 'latin-1', reader_class = None, writer_class = None, **options):
+    def __init__(self, host, port, username = None, password = None, timeout = None, encoding = 'latin-1', reader_class = None, writer_class = None, symbol_cache = None, **options):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
 
         self._connection = None
-        self._connection_file = None
         self._protocol_version = None
 
         self.timeout = timeout
 
         self._encoding = encoding
+        self._symbol_cache = symbol_cache
 
         self._options = MetaData(**CONVERSION_OPTIONS.union_dict(**options))
 
@@ -144,27 +222,39 @@ class QConnection(object):
             self._initialize()
 
             self._writer = self._writer_class(self._connection, protocol_version = self._protocol_version, encoding = self._encoding)
-            self._reader = self._reader_class(self._connection_file, encoding = self._encoding)
+            self._reader = self._reader_class(self._connection, encoding = self._encoding, symbol_cache = self._symbol_cache)
 
 
     def _init_socket(self):
         '''Initialises the socket used for communicating with a q service,'''
+        paths = _unix_socket_paths(self.host, self.port)
+        if paths is not None and not hasattr(socket, 'AF_UNIX'):
+            raise QConnectionException('Unix domain sockets are not supported on this platform')
+
         try:
-            self._connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._connection.connect((self.host, self.port))
+            if paths is not None:
+                for i, path in enumerate(paths):
+                    self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    try:
+                        self._connection.connect(path)
+                        break
+                    except socket.error:
+                        self._connection.close()
+                        # falls back to the next path (e.g. the socket file)
+                        if i == len(paths) - 1:
+                            raise
+            else:
+                self._connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._connection.connect((self.host, self.port))
             self._connection.settimeout(self.timeout)
-            self._connection_file = self._connection.makefile('b')
         except:
             self._connection = None
-            self._connection_file = None
             raise
 
 
     def close(self):
         '''Closes connection with the q service.'''
         if self._connection:
-            self._connection_file.close()
-            self._connection_file = None
             self._connection.close()
             self._connection = None
 
@@ -203,7 +293,7 @@ class QConnection(object):
 
 
     def __str__(self):
-        return '%s@:%s:%s' % (self.username, self.host, self.port) if self.username else ':%s:%s' % (self.host, self.port)
+        return '%s@:%s' % (self.username, _address(self.host, self.port)) if self.username else ':%s' % _address(self.host, self.port)
 
 
     def query(self, msg_type, query, *parameters, **options):
@@ -230,6 +320,12 @@ class QConnection(object):
          - `single_char_strings` (`boolean`) - if ``True`` single char Python 
            strings are encoded as q strings instead of chars, 
            **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than 
+           `compress_threshold` are sent in compressed form, 
+           **Default**: ``False``
+         - `scatter_gather` (`boolean`) - if ``True`` the query is sent via 
+           vectored write referencing vector data instead of being copied 
+           into a single buffer, **Default**: ``False``
         
         :raises: :class:`.QConnectionException`, :class:`.QWriterException`
         '''
@@ -290,9 +386,33 @@ class QConnection(object):
            :class:`.QTemporal`) instances, otherwise are represented as 
            `numpy datetime64`/`timedelta64` arrays and atoms,
            **Default**: ``False``
+         - `lazy_tables` (`boolean`) - if ``True`` tables are returned as 
+           :class:`.QLazyTable` instances with columns decoded on first access, 
+           **Default**: ``False``
+         - `columns` (list of `strings` or `None`) - if set, only listed columns 
+           of tables are decoded, remaining columns are skipped (keys of keyed 
+           tables are always decoded), **Default**: ``None``
+         - `compact_symbols` (`boolean`) - if ``True`` symbol vectors are 
+           returned as :class:`.QCompactSymbolList` instances backed by the 
+           message buffer, **Default**: ``False``
+         - `categorical_symbols` (`boolean`) - if ``True`` and ``pandas`` flag is 
+           set, symbol vectors are returned as ``pandas.Categorical``, 
+           **Default**: ``False``
+         - `nullable_dtypes` (`boolean`) - if ``True`` and ``pandas`` flag is set, 
+           integer vectors are returned as pandas nullable integer arrays 
+           instead of being converted to floats, **Default**: ``False``
+         - `string_dtype` (`string` or `None`) - if set and ``pandas`` flag is set, 
+           char vectors and string list columns are decoded to series of 
+           given dtype (e.g. ``object`` or ``'string'``), **Default**: ``None``
          - `single_char_strings` (`boolean`) - if ``True`` single char Python 
            strings are encoded as q strings instead of chars, 
            **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than 
+           `compress_threshold` are sent in compressed form, 
+           **Default**: ``False``
+         - `scatter_gather` (`boolean`) - if ``True`` the query is sent via 
+           vectored write referencing vector data instead of being copied 
+           into a single buffer, **Default**: ``False``
 
         :returns: query result parsed to Python data structures
         
@@ -309,6 +429,115 @@ class QConnection(object):
             raise QReaderException('Received message of type: %s where response was expected')
 
 
+    def sendSyncMany(self, queries, window = 256, return_exceptions = False, **options):
+        '''Performs multiple synchronous queries in pipelined manner and returns 
+        parsed data.
+        
+        Queries are written back to back (in batches of up to `window` 
+        queries sent via single write) before responses are read. As q 
+        service answers synchronous queries on a connection in order, the 
+        responses are matched with the queries by their order. This saves 
+        a round trip per query compared to :func:`.sendSync`.
+        
+        Each query is either a `string` (q expression) or a `tuple` 
+        consisting of the query and its parameters:
+        
+            >>> print(q.sendSyncMany(['til 3', ('{x+y}', 1, 2), ('{x*x}', 4)]))
+            [array([0, 1, 2]), 3, 16]
+        
+        Errors raised by the q service don't break alignment of the remaining 
+        responses. If `return_exceptions` is ``True``, the :class:`.QException` 
+        is returned in place of the result of the failed query, otherwise the 
+        first error is raised once all responses are read:
+        
+            >>> print(q.sendSyncMany(['til 3', '1+`a', '2+2'], return_exceptions = True))
+            [array([0, 1, 2]), QException(b'type',), 4]
+        
+        If a message other than a response is received (or reading of 
+        a response fails), the remaining responses cannot be matched with the 
+        queries. In such case the connection is closed before the error is 
+        raised.
+        
+        :Parameters:
+         - `queries` (iterable of `string` or `tuple`) - queries to be executed
+         - `window` (`integer`) - maximal number of queries sent before the 
+           responses are read, limits the amount of unread responses 
+           buffered by q service and operating system
+         - `return_exceptions` (`boolean`) - if ``True`` errors are returned 
+           in place of the results of failed queries
+        :Options: 
+         - same as in :func:`.sendSync`, except `scatter_gather`
+
+        :returns: `list` of query results parsed to Python data structures
+        
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`, 
+                 :class:`.QReaderException`, :class:`.QException`
+        '''
+        if not self._connection:
+            raise QConnectionException('Connection is not established.')
+
+        if window < 1:
+            raise ValueError('Invalid window size: %s' % window)
+
+        options = self._options.union_dict(**options)
+        options['scatter_gather'] = False
+        # serializes queries to be sent via single write
+        writer = self._writer_class(None, protocol_version = self._protocol_version, encoding = self._encoding)
+
+        results = []
+        error = None
+        batch = []
+
+        for query in queries:
+            if isinstance(query, tuple):
+                if len(query) > 9:
+                    raise QWriterException('Too many parameters.')
+                batch.append(writer.write(list(query) if len(query) > 1 else query[0], MessageType.SYNC, **options))
+            else:
+                batch.append(writer.write(query, MessageType.SYNC, **options))
+
+            if len(batch) == window:
+                error = self._pipeline(batch, results, error, **options)
+                batch = []
+
+        if batch:
+            error = self._pipeline(batch, results, error, **options)
+
+        if error is not None and not return_exceptions:
+            raise error
+
+        return results
+
+
+    def _pipeline(self, batch, results, error, **options):
+        '''Sends batch of serialized synchronous queries and reads the 
+        responses.'''
+        try:
+            self._connection.sendall(b''.join(batch))
+
+            for _ in range(len(batch)):
+                try:
+                    response = self._reader.read(**options)
+                except QException as e:
+                    # response has been fully consumed, connection stays aligned
+                    results.append(e)
+                    error = e if error is None else error
+                    continue
+
+                if response.type != MessageType.RESPONSE:
+                    self._writer.write(QException('nyi: qPython expected response message'), MessageType.ASYNC if response.type == MessageType.ASYNC else MessageType.RESPONSE)
+                    raise QReaderException('Received message of type: %s where response was expected' % response.type)
+
+                results.append(response.data)
+        except:
+            # unread responses of the window would be matched with subsequent
+            # queries, connection cannot be reused
+            self.close()
+            raise
+
+        return error
+
+
     def sendAsync(self, query, *parameters, **options):
         '''Performs an asynchronous query and returns **without** retrieving of 
         the response.
@@ -332,6 +561,12 @@ class QConnection(object):
          - `single_char_strings` (`boolean`) - if ``True`` single char Python 
            strings are encoded as q strings instead of chars, 
            **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than 
+           `compress_threshold` are sent in compressed form, 
+           **Default**: ``False``
+         - `scatter_gather` (`boolean`) - if ``True`` the query is sent via 
+           vectored write referencing vector data instead of being copied 
+           into a single buffer, **Default**: ``False``
         
         :raises: :class:`.QConnectionException`, :class:`.QWriterException`
         '''
@@ -372,6 +607,24 @@ class QConnection(object):
            :class:`.QTemporal`) instances, otherwise are represented as 
            `numpy datetime64`/`timedelta64` arrays and atoms,
            **Default**: ``False``
+         - `lazy_tables` (`boolean`) - if ``True`` tables are returned as 
+           :class:`.QLazyTable` instances with columns decoded on first access, 
+           **Default**: ``False``
+         - `columns` (list of `strings` or `None`) - if set, only listed columns 
+           of tables are decoded, remaining columns are skipped (keys of keyed 
+           tables are always decoded), **Default**: ``None``
+         - `compact_symbols` (`boolean`) - if ``True`` symbol vectors are 
+           returned as :class:`.QCompactSymbolList` instances backed by the 
+           message buffer, **Default**: ``False``
+         - `categorical_symbols` (`boolean`) - if ``True`` and ``pandas`` flag is 
+           set, symbol vectors are returned as ``pandas.Categorical``, 
+           **Default**: ``False``
+         - `nullable_dtypes` (`boolean`) - if ``True`` and ``pandas`` flag is set, 
+           integer vectors are returned as pandas nullable integer arrays 
+           instead of being converted to floats, **Default**: ``False``
+         - `string_dtype` (`string` or `None`) - if set and ``pandas`` flag is set, 
+           char vectors and string list columns are decoded to series of 
+           given dtype (e.g. ``object`` or ``'string'``), **Default**: ``None``
         
         :returns: depending on parameter flags: :class:`.QMessage` instance, 
                   parsed message, raw data 
@@ -0,0 +1,391 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import select
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from qpython import MetaData
+from qpython.qconnection import QConnection, QConnectionException, _address
+from qpython.qreader import QReaderException
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+
+class QConnectionPool(object):
+    '''Thread-safe pool of connections to a q service.
+
+    Connections are checked out for exclusive use by a single thread and
+    returned to the pool afterwards, so the handshake is performed once per
+    pooled connection instead of once per request::
+
+        pool = qpool.QConnectionPool(host = 'localhost', port = 5000, min_size = 2, max_size = 8)
+        pool.open()
+
+        with pool.connection() as q:
+            print(q('{`int$ til x}', 10))
+
+    A connection is discarded instead of being returned to the pool if the
+    block raises a socket error, :class:`.QReaderException` or
+    :class:`.QConnectionException` (errors returned by the q service, i.e.
+    :class:`.QException`, don't invalidate the connection). Discarded
+    connections are replaced on demand.
+
+    Connections idle for at least `health_check_interval` seconds are checked
+    before being handed out: the socket is verified not to be closed by the
+    remote side and, if set, the `health_check_query` is executed. Failing
+    connections are transparently replaced.
+
+    :Parameters:
+     - `host` (`string`) - q service hostname or ``unix://`` to connect via
+       Unix domain socket (see :class:`.QConnection`)
+     - `port` (`integer`) - q service port
+     - `min_size` (`integer`) - number of connections opened by :func:`.open`
+       and kept in the pool
+     - `max_size` (`integer`) - maximal number of connections
+     - `checkout_timeout` (`nonnegative float` or `None`) - maximal time to
+       wait for a connection, if ``None`` waits indefinitely
+     - `health_check_interval` (`nonnegative float` or `None`) - minimal idle
+       time (in seconds) after which connection is checked before checkout,
+       if ``None`` connections are not checked
+     - `health_check_query` (`string` or `None`) - q expression executed
+       synchronously to verify idle connection
+     - `max_idle_time` (`nonnegative float` or `None`) - connections in
+       excess of `min_size` idle for longer are closed
+     - `connection_class` (subclass of :class:`.QConnection`) - connector
+       class
+     - `kwargs` - parameters and options passed to the `connection_class`
+       (e.g. `username`, `password`, `timeout`, conversion options)
+    '''
+
+
+    def __init__(self, host, port, min_size = 1, max_size = 10, checkout_timeout = None, health_check_interval = 30.0, health_check_query = None, max_idle_time = None, connection_class = QConnection, **kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size = %s, max_size = %s' % (min_size, max_size))
+
+        self.host = host
+        self.port = port
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        self.max_idle_time = max_idle_time
+
+        self._connection_class = connection_class
+        self._kwargs = kwargs
+
+        self._lock = threading.Condition(threading.Lock())
+        # idle connections along with time of checkin, most recent last
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._busy_time = 0.0
+        self._busy_since = _clock()
+        self._created_time = self._busy_since
+
+
+    def __enter__(self):
+        self.open()
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+    def __str__(self):
+        return 'QConnectionPool: :%s, size: %s, in use: %s' % (_address(self.host, self.port), self._size, self._in_use)
+
+
+    def _new_connection(self):
+        connection = self._connection_class(self.host, self.port, **self._kwargs)
+        connection.open()
+        return connection
+
+
+    def open(self):
+        '''Pre-warms the pool by opening `min_size` connections.
+
+        :raises: :class:`.QConnectionException`, :class:`.QAuthenticationException`
+        '''
+        with self._lock:
+            self._closed = False
+            count = max(self.min_size - self._size, 0)
+            self._size += count
+
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(self._new_connection())
+        except:
+            for connection in connections:
+                connection.close()
+            with self._lock:
+                self._size -= count
+                self._lock.notify_all()
+            raise
+
+        with self._lock:
+            self._created += count
+            now = _clock()
+            self._idle.extend((connection, now) for connection in connections)
+            self._lock.notify_all()
+
+
+    def close(self):
+        '''Closes idle connections, connections in use are closed when
+        checked in.'''
+        with self._lock:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+
+        for connection in idle:
+            connection.close()
+
+
+    def checkout(self, timeout = None):
+        '''Retrieves a connection for exclusive use.
+
+        Idle connection is returned if available, otherwise a new connection is
+        opened if the pool is not exhausted. Connection has to be returned
+        via :func:`.checkin`.
+
+        :Parameters:
+         - `timeout` (`nonnegative float` or `None`) - maximal time to wait
+           for a connection, if ``None`` the `checkout_timeout` is used
+
+        :returns: :class:`.QConnection` instance
+        :raises: :class:`.QConnectionException`, :class:`.QAuthenticationException`
+        '''
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = _clock()
+
+        for stale in self._prune():
+            stale.close()
+
+        while True:
+            connection, idle_since = self._acquire(start, timeout)
+
+            if connection is None:
+                try:
+                    connection = self._new_connection()
+                except:
+                    self._release_slot()
+                    raise
+                with self._lock:
+                    self._created += 1
+            elif not self._check(connection, idle_since):
+                self._discard(connection)
+                continue
+
+            wait_time = _clock() - start
+            with self._lock:
+                self._checkouts += 1
+                self._wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+            return connection
+
+
+    def _acquire(self, start, timeout):
+        '''Reserves idle connection or slot for a new connection.'''
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise QConnectionException('Connection pool is closed.')
+
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    connection, idle_since = None, None
+                else:
+                    remaining = None if timeout is None else timeout - (_clock() - start)
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        raise QConnectionException('Timeout while waiting for connection.')
+                    self._lock.wait(remaining)
+                    continue
+
+                self._update_busy_time()
+                self._in_use += 1
+                return connection, idle_since
+
+
+    def _prune(self):
+        '''Removes connections in excess of `min_size` idle for longer than
+        `max_idle_time`.'''
+        stale = []
+        if self.max_idle_time is not None:
+            with self._lock:
+                deadline = _clock() - self.max_idle_time
+                # the least recently used connections are at the front
+                while self._idle and self._size > self.min_size and self._idle[0][1] < deadline:
+                    stale.append(self._idle.popleft()[0])
+                    self._size -= 1
+        return stale
+
+
+    def _check(self, connection, idle_since):
+        if not connection.is_connected():
+            return False
+
+        if self.health_check_interval is None or _clock() - idle_since < self.health_check_interval:
+            return True
+
+        try:
+            # idle connection is not supposed to receive any data, readable
+            # socket indicates it has been closed by the remote side
+            if select.select([connection._connection], [], [], 0)[0]:
+                return False
+
+            if self.health_check_query:
+                connection.sendSync(self.health_check_query)
+        except Exception:
+            return False
+
+        return True
+
+
+    def _release_slot(self):
+        with self._lock:
+            self._update_busy_time()
+            self._size -= 1
+            self._in_use -= 1
+            self._lock.notify()
+
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except socket.error:
+            pass
+
+        with self._lock:
+            self._discarded += 1
+        self._release_slot()
+
+
+    def checkin(self, connection, discard = False):
+        '''Returns the connection to the pool.
+
+        :Parameters:
+         - `connection` (:class:`.QConnection`) - connection retrieved via
+           :func:`.checkout`
+         - `discard` (`boolean`) - if ``True`` the connection is closed instead
+           of being returned to the pool
+        '''
+        if discard or not connection.is_connected():
+            self._discard(connection)
+            return
+
+        with self._lock:
+            self._update_busy_time()
+            self._in_use -= 1
+
+            if not self._closed:
+                self._idle.append((connection, _clock()))
+                self._lock.notify()
+                return
+
+            self._size -= 1
+
+        connection.close()
+
+
+    @contextmanager
+    def connection(self, timeout = None):
+        '''Context manager retrieving a connection from the pool.
+
+            >>> with pool.connection() as q:
+            ...     print(q.sendSync('til 10'))
+            [0 1 2 3 4 5 6 7 8 9]
+
+        :Parameters:
+         - `timeout` (`nonnegative float` or `None`) - maximal time to wait
+           for a connection, if ``None`` the `checkout_timeout` is used
+
+        :returns: :class:`.QConnection` instance
+        :raises: :class:`.QConnectionException`, :class:`.QAuthenticationException`
+        '''
+        connection = self.checkout(timeout)
+        try:
+            yield connection
+        except (socket.error, QReaderException, QConnectionException):
+            self.checkin(connection, discard = True)
+            raise
+        except Exception:
+            self.checkin(connection)
+            raise
+        except:
+            # interrupted I/O (e.g. KeyboardInterrupt) leaves the stream in unknown state
+            self.checkin(connection, discard = True)
+            raise
+        else:
+            self.checkin(connection)
+
+
+    def _update_busy_time(self):
+        now = _clock()
+        self._busy_time += self._in_use * (now - self._busy_since)
+        self._busy_since = now
+
+
+    def stats(self):
+        '''Retrieves pool metrics.
+
+        :returns: :class:`.MetaData` with attributes:
+         - `size` - number of open (and being opened) connections
+         - `idle` - number of idle connections
+         - `in_use` - number of checked out connections
+         - `checkouts` - number of checkouts
+         - `timeouts` - number of checkouts timed out
+         - `created` - number of opened connections
+         - `discarded` - number of discarded (broken) connections
+         - `wait_time` - total time (in seconds) spent waiting for connections
+         - `max_wait_time` - maximal time (in seconds) spent waiting for
+           a connection
+         - `utilization` - average fraction of `max_size` connections checked
+           out since the pool creation
+        '''
+        with self._lock:
+            self._update_busy_time()
+            elapsed = self._busy_since - self._created_time
+            return MetaData(size = self._size,
+                            idle = len(self._idle),
+                            in_use = self._in_use,
+                            checkouts = self._checkouts,
+                            timeouts = self._timeouts,
+                            created = self._created,
+                            discarded = self._discarded,
+                            wait_time = self._wait_time,
+                            max_wait_time = self._max_wait_time,
+                            utilization = self._busy_time / (elapsed * self.max_size) if elapsed > 0 else 0.0)
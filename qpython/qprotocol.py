@@ -0,0 +1,323 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import struct
+from collections import deque
+
+from qpython import MetaData, CONVERSION_OPTIONS
+from qpython.qconnection import QConnectionException, QAuthenticationException
+from qpython.qreader import QReader, QReaderException
+from qpython.qwriter import QWriter, QWriterException
+
+
+
+class ProtocolState(object):
+    '''Enumeration defining states of the :class:`.QProtocolParser`.'''
+    INITIAL = 0
+    HANDSHAKE = 1
+    HANDSHAKE_FALLBACK = 2
+    CONNECTED = 3
+    CLOSED = 4
+
+
+
+class QProtocolParser(object):
+    '''Sans-IO implementation of the q IPC protocol.
+
+    The parser performs no I/O. Data received from a transport is passed to
+    :func:`.feed` in chunks of arbitrary size, the parser reassembles
+    complete messages and queues them to be parsed on retrieval via
+    :func:`.messages` or :func:`.next_message`. Data to be sent (handshake,
+    queries) is returned as `bytes` to be written by the caller. This allows
+    integrating the protocol with any I/O framework (`asyncio`, Twisted,
+    gevent, selectors)::
+
+        parser = QProtocolParser(username = 'user', password = 'pwd')
+        sock.sendall(parser.handshake())
+
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                retry = parser.connection_lost()
+                # ... reconnect and send retry, if set
+                break
+
+            parser.feed(data)
+            for message in parser.messages():
+                print(message.data)
+
+            if parser.state == ProtocolState.CONNECTED:
+                sock.sendall(parser.query(MessageType.SYNC, 'til 10'))
+
+    Once the message header is received, the buffer for the whole message is
+    allocated with its exact size and the following chunks are copied into
+    it, so each byte of the message is copied exactly once. Parsed vectors
+    reference the message buffer, a new buffer is allocated for each message.
+
+    :Parameters:
+     - `username` (`string` or `None`) - username for q authentication/authorization
+     - `password` (`string` or `None`) - password for q authentication/authorization
+     - `encoding` (`string`) - string encoding for data deserialization
+     - `reader_class` (subclass of `QReader`) - data deserializer
+     - `writer_class` (subclass of `QWriter`) - data serializer
+     - `symbol_cache` (:class:`.QSymbolCache` or `None`) - if set, symbols in
+       received messages are interned in the cache
+    :Options:
+     - same as in :class:`.QConnection`
+    '''
+
+
+    def __init__(self, username = None, password = None, encoding = 'latin-1', reader_class = None, writer_class = None, symbol_cache = None, **options):
+        self.username = username
+        self.password = password
+
+        self._state = ProtocolState.INITIAL
+        self._protocol_version = None
+
+        self._encoding = encoding
+        self._symbol_cache = symbol_cache
+
+        self._options = MetaData(**CONVERSION_OPTIONS.union_dict(**options))
+
+        try:
+            from qpython._pandas import PandasQReader, PandasQWriter
+            self._reader_class = PandasQReader
+            self._writer_class = PandasQWriter
+        except ImportError:
+            self._reader_class = QReader
+            self._writer_class = QWriter
+
+        if reader_class:
+            self._reader_class = reader_class
+
+        if writer_class:
+            self._writer_class = writer_class
+
+        self._header = bytearray(8)
+        self._header_size = 0
+        self._message = None
+        self._message_size = 0
+        self._received = 0
+        self._pending = deque()
+
+
+    @property
+    def state(self):
+        '''Retrieves state of the protocol.
+
+        :returns: one of the constants defined in :class:`.ProtocolState`
+        '''
+        return self._state
+
+
+    @property
+    def protocol_version(self):
+        '''Retrieves established version of the IPC protocol.
+
+        :returns: `integer` -- version of the IPC protocol
+        '''
+        return self._protocol_version
+
+
+    def _credentials(self):
+        credentials = (self.username if self.username else '') + ':' + (self.password if self.password else '')
+        return credentials.encode(self._encoding)
+
+
+    def handshake(self):
+        '''Starts the IPC protocol handshake.
+
+        :returns: `bytes` -- handshake request to be sent to the q service
+        '''
+        self._state = ProtocolState.HANDSHAKE
+        return self._credentials() + b'\3\0'
+
+
+    def connection_lost(self):
+        '''Notifies the parser that the connection has been closed.
+
+        If the connection is closed by the q service during the handshake,
+        the service doesn't support the requested protocol version. In such
+        case, the handshake has to be retried with a new connection.
+
+        :returns: `bytes` -- handshake request to be sent via a new connection
+                  or ``None`` if handshake should not be retried
+        :raises: :class:`.QAuthenticationException`
+        '''
+        if self._state == ProtocolState.HANDSHAKE:
+            self._state = ProtocolState.HANDSHAKE_FALLBACK
+            return self._credentials() + b'\0'
+
+        closed_state = self._state
+        self._state = ProtocolState.CLOSED
+        self._header_size = 0
+        self._message = None
+        self._pending.clear()
+
+        if closed_state == ProtocolState.HANDSHAKE_FALLBACK:
+            raise QAuthenticationException('Connection denied.')
+
+
+    def feed(self, data):
+        '''Processes a chunk of data received from the q service.
+
+        Complete messages are queued and parsed on retrieval via 
+        :func:`.next_message` or :func:`.messages`.
+
+        :Parameters:
+         - `data` (`bytes`, `bytearray` or `memoryview`) - received data
+
+        :returns: `integer` -- number of queued messages
+        :raises: :class:`.QConnectionException`, :class:`.QReaderException`
+        '''
+        view = memoryview(data)
+
+        if self._state in (ProtocolState.HANDSHAKE, ProtocolState.HANDSHAKE_FALLBACK):
+            if not len(view):
+                return len(self._pending)
+
+            self._init(bytearray(view[:1])[0])
+            view = view[1:]
+        elif self._state != ProtocolState.CONNECTED:
+            raise QConnectionException('Connection is not established.')
+
+        position = 0
+        length = len(view)
+
+        while position < length:
+            if self._message is None:
+                count = min(8 - self._header_size, length - position)
+                self._header[self._header_size : self._header_size + count] = view[position : position + count]
+                self._header_size += count
+                position += count
+
+                if self._header_size < 8:
+                    break
+
+                self._header_size = 0
+                self._message_size = struct.unpack('<i' if self._header[0] == 1 else '>i', self._header[4:])[0]
+                if self._message_size < 8:
+                    raise QReaderException('Invalid message size: %s' % self._message_size)
+
+                self._message = bytearray(self._message_size)
+                self._message[:8] = self._header
+                self._received = 8
+
+            count = min(self._message_size - self._received, length - position)
+            self._message[self._received : self._received + count] = view[position : position + count]
+            self._received += count
+            position += count
+
+            if self._received == self._message_size:
+                self._pending.append(self._message)
+                self._message = None
+
+        return len(self._pending)
+
+
+    def next_message(self, **options):
+        '''Retrieves and parses the first queued message.
+
+        The message is removed from the queue even if it cannot be parsed 
+        (e.g. if it represents q error), so the following messages can be 
+        retrieved.
+
+        :Options:
+         - same as in :func:`.QConnection.receive`
+
+        :returns: :class:`.QMessage` or ``None`` if no complete message is 
+                  queued
+        :raises: :class:`.QReaderException`
+        '''
+        if not self._pending:
+            return None
+
+        return self._reader.read(self._pending.popleft(), owned = True, **self._options.union_dict(**options))
+
+
+    def messages(self, **options):
+        '''Retrieves and parses all queued messages.
+
+        :Options:
+         - same as in :func:`.QConnection.receive`
+
+        :returns: generator of :class:`.QMessage` instances
+        :raises: :class:`.QReaderException`
+        '''
+        while self._pending:
+            yield self.next_message(**options)
+
+
+    def _init(self, capability):
+        self._state = ProtocolState.CONNECTED
+        self._protocol_version = min(capability, 3)
+
+        self._writer = self._writer_class(None, protocol_version = self._protocol_version, encoding = self._encoding)
+        self._reader = self._reader_class(None, encoding = self._encoding, symbol_cache = self._symbol_cache)
+
+
+    def query(self, msg_type, query, *parameters, **options):
+        '''Serializes a query to be sent to the q service.
+
+        :Parameters:
+         - `msg_type` (one of the constants defined in :class:`.MessageType`) -
+           type of the query to be executed
+         - `query` (`string`) - query to be executed
+         - `parameters` (`list` or `None`) - parameters for the query
+        :Options:
+         - `single_char_strings` (`boolean`) - if ``True`` single char Python
+           strings are encoded as q strings instead of chars,
+           **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` queries larger than
+           `compress_threshold` are sent in compressed form,
+           **Default**: ``False``
+
+        :returns: `bytes` -- serialized message
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`
+        '''
+        if self._state != ProtocolState.CONNECTED:
+            raise QConnectionException('Connection is not established.')
+
+        if parameters and len(parameters) > 8:
+            raise QWriterException('Too many parameters.')
+
+        options = self._options.union_dict(**options)
+        options['scatter_gather'] = False
+
+        if not parameters or len(parameters) == 0:
+            return self._writer.write(query, msg_type, **options)
+        else:
+            return self._writer.write([query] + list(parameters), msg_type, **options)
+
+
+    def write(self, data, msg_type, **options):
+        '''Serializes a single data object, e.g. a response to the message
+        received from the q service.
+
+        :Parameters:
+         - `data` - data to be serialized
+         - `msg_type` (one of the constants defined in :class:`.MessageType`) -
+           type of the message
+
+        :returns: `bytes` -- serialized message
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`
+        '''
+        if self._state != ProtocolState.CONNECTED:
+            raise QConnectionException('Connection is not established.')
+
+        options = self._options.union_dict(**options)
+        options['scatter_gather'] = False
+        return self._writer.write(data, msg_type, **options)
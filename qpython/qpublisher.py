@@ -0,0 +1,640 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import numpy
+import sys
+import threading
+import time
+import uuid
+
+from qpython import MetaData
+from qpython.qcollection import qlist
+from qpython.qtype import *  # @UnusedWildImport
+from qpython.qwriter import QWriter
+
+_clock = getattr(time, 'monotonic', time.time)
+
+# columns represented as object arrays, sizes of values vary
+_VARIABLE_TYPES = (QSYMBOL_LIST, QGENERAL_LIST)
+
+_STRING_TYPES = (bytes, str)
+
+# rows are staged and copied into the column buffers in chunks
+_STAGED_ROWS = 256
+
+_INT64_MAX = numpy.iinfo(numpy.int64).max
+
+
+
+def _column_dtype(qtype):
+    if qtype in _VARIABLE_TYPES:
+        return numpy.dtype(numpy.object_)
+    elif qtype == QGUID_LIST:
+        return GUID_DTYPE
+    elif qtype == QSTRING:
+        return numpy.dtype('S1')
+    elif -qtype in TEMPORAL_Q_TYPE:
+        return numpy.dtype(TEMPORAL_Q_TYPE[-qtype])
+    else:
+        return numpy.dtype(PY_TYPE[-qtype])
+
+
+def _value_size(value):
+    try:
+        return len(value) + 1
+    except TypeError:
+        return 1
+
+
+def _is_serializable(value):
+    # checks whether the value can be a part of q general list
+    if isinstance(value, (list, tuple)):
+        return all(_is_serializable(item) for item in value)
+    return value is None or type(value) in Q_TYPE or QWriter._writer_map.get(type(value)) is not None
+
+
+def _check_numeric(values, dtype):
+    # rejects values which cannot be converted to the column type without 
+    # loss, e.g. floats stored in integer column
+    if numpy.can_cast(values.dtype, dtype) or (dtype.kind == 'f' and values.dtype.kind in 'biuf'):
+        return values
+    if values.dtype.kind in 'biu' and dtype.kind in 'biu':
+        converted = values.astype(dtype)
+        if (converted == values).all():
+            return converted
+    raise TypeError('Unable to convert values of type: %s to %s without loss' % (values.dtype, dtype))
+
+
+
+def _converter(column, qtype, dtype):
+    # creates function validating and converting a single value of the 
+    # column
+    if qtype == QSYMBOL_LIST:
+        def convert(value):
+            if not isinstance(value, _STRING_TYPES):
+                raise TypeError('Expected symbol in column %s, got: %s' % (column, type(value)))
+            return value
+    elif qtype == QGENERAL_LIST:
+        def convert(value):
+            if not _is_serializable(value):
+                raise TypeError('Unable to serialize value in column %s of type: %s' % (column, type(value)))
+            return value
+    elif qtype == QGUID_LIST:
+        def convert(value):
+            if not isinstance(value, uuid.UUID):
+                raise TypeError('Expected uuid.UUID in column %s, got: %s' % (column, type(value)))
+            return numpy.void(value.bytes)
+    elif qtype == QSTRING:
+        def convert(value):
+            if not isinstance(value, _STRING_TYPES) or len(value) != 1:
+                raise TypeError('Expected single character in column %s, got: %r' % (column, value))
+            return value
+    elif dtype.kind in 'mM':
+        def convert(value):
+            return value if type(value) is dtype.type else numpy.array(value, dtype = dtype)[()]
+    elif dtype == numpy.int64:
+        def convert(value):
+            if type(value) is int and -_INT64_MAX <= value <= _INT64_MAX or type(value) is dtype.type:
+                return value
+            return _check_numeric(numpy.asarray(value), dtype)
+    else:
+        # values of the most common types are assigned directly
+        exact = (dtype.type, float) if dtype.kind == 'f' else (dtype.type, )
+        def convert(value):
+            return value if type(value) in exact else _check_numeric(numpy.asarray(value), dtype)
+    return convert
+
+
+
+def _exact_types(qtype, dtype):
+    # types of values stored without conversion
+    if qtype == QSYMBOL_LIST:
+        return (bytes, str, numpy.bytes_, numpy.str_)
+    elif qtype in (QGENERAL_LIST, QGUID_LIST, QSTRING):
+        return ()
+    elif dtype.kind == 'f':
+        return (float, dtype.type)
+    elif dtype.kind == 'b':
+        return (bool, dtype.type)
+    elif dtype == numpy.int64:
+        return (int, dtype.type)
+    return (dtype.type, )
+
+
+
+class _TableBuffer(object):
+    '''Preallocated, typed buffers for rows of a single table.
+
+    Each column is stored in its own contiguous array. Values are validated
+    and converted to the column type before the row is appended, so that the
+    buffered data can always be serialized. Published rows are staged and
+    copied into the arrays in chunks, with a single assignment per column.
+    '''
+
+    def __init__(self, columns, qtypes, capacity):
+        self.columns = columns
+        self.qtypes = qtypes
+        self.dtypes = [_column_dtype(qtype) for qtype in qtypes]
+        self.arrays = [numpy.empty(max(capacity, 1), dtype = dtype) for dtype in self.dtypes]
+        self.converters = [_converter(column, qtype, dtype) for column, qtype, dtype in zip(columns, qtypes, self.dtypes)]
+        self.exact = [_exact_types(qtype, dtype) for qtype, dtype in zip(qtypes, self.dtypes)]
+        # combinations of types of values known to require no conversion,
+        # only range of integers in long columns is checked
+        self.trusted = set()
+        self.ranged = [i for i, dtype in enumerate(self.dtypes) if dtype == numpy.int64]
+        self.variable = [i for i, qtype in enumerate(qtypes) if qtype in _VARIABLE_TYPES]
+        self.row_size = sum(dtype.itemsize for qtype, dtype in zip(qtypes, self.dtypes) if qtype not in _VARIABLE_TYPES)
+        self.staged = []
+        self.stored = 0
+        self.count = 0
+        self.size = 0
+        self.since = None
+        # buffer swapped in while the data is being sent
+        self.spare = None
+
+
+    def reserve(self, count):
+        capacity = len(self.arrays[0])
+        if self.stored + count > capacity:
+            capacity = max(2 * capacity, self.stored + count)
+            for i, array in enumerate(self.arrays):
+                self.arrays[i] = numpy.empty(capacity, dtype = array.dtype)
+                self.arrays[i][:self.stored] = array[:self.stored]
+
+
+    def store(self):
+        '''Copies staged rows into the column buffers.'''
+        if not self.staged:
+            return
+
+        count = len(self.staged)
+        self.reserve(count)
+        position = self.stored
+        for array, column in zip(self.arrays, zip(*self.staged)):
+            array[position : position + count] = column
+
+        self.stored += count
+        del self.staged[:]
+
+
+    def _convert_column(self, i, data):
+        qtype, dtype, convert = self.qtypes[i], self.dtypes[i], self.converters[i]
+
+        if isinstance(data, numpy.ndarray):
+            if qtype == QSYMBOL_LIST and data.dtype.kind in 'SU':
+                return data
+            if qtype == QGUID_LIST and data.dtype == GUID_DTYPE:
+                return data
+            if qtype == QSTRING and data.dtype == dtype:
+                return data
+        elif qtype == QSTRING and isinstance(data, bytes):
+            return numpy.frombuffer(data, dtype = dtype)
+
+        if qtype in _VARIABLE_TYPES or qtype in (QGUID_LIST, QSTRING):
+            return [convert(value) for value in data]
+        elif dtype.kind in 'biuf':
+            return _check_numeric(numpy.asarray(data), dtype)
+        return data
+
+
+    def append_row(self, row):
+        if len(row) != len(self.qtypes):
+            raise ValueError('Expected %s values, got: %s' % (len(self.qtypes), len(row)))
+
+        # invalid row raises before being stored, buffered rows are retained
+        types = tuple(map(type, row))
+        values = tuple(row) if types in self.trusted else None
+        for i in self.ranged:
+            if values is not None and not -_INT64_MAX <= row[i] <= _INT64_MAX:
+                values = None
+
+        if values is None:
+            values = [convert(value) for convert, value in zip(self.converters, row)]
+            if all(value_type in exact for value_type, exact in zip(types, self.exact)):
+                self.trusted.add(types)
+
+        self.staged.append(values)
+        if len(self.staged) == _STAGED_ROWS:
+            self.store()
+
+        size = self.row_size
+        for i in self.variable:
+            size += _value_size(row[i])
+
+        self.count += 1
+        self.size += size
+
+
+    def append_columns(self, data):
+        if len(data) != len(self.qtypes):
+            raise ValueError('Expected %s columns, got: %s' % (len(self.qtypes), len(data)))
+
+        count = len(data[0])
+        if any(len(column) != count for column in data):
+            raise ValueError('Columns have different lengths')
+        if not count:
+            return
+
+        data = [self._convert_column(i, column) for i, column in enumerate(data)]
+
+        self.store()
+        self.reserve(count)
+        position = self.stored
+        for array, column in zip(self.arrays, data):
+            array[position : position + count] = column
+
+        self.stored += count
+        self.count += count
+        self.size += self.row_size * count + sum(_value_size(value) for i in self.variable for value in data[i])
+
+
+    def extend(self, other):
+        '''Appends rows buffered in other buffer of the same table.'''
+        self.store()
+        other.store()
+        self.reserve(other.count)
+        for array, column in zip(self.arrays, other.arrays):
+            array[self.stored : self.stored + other.count] = column[:other.count]
+
+        self.stored += other.count
+        self.count += other.count
+        self.size += other.size
+        if self.since is None:
+            self.since = other.since
+
+
+    def data(self):
+        '''Retrieves buffered columns as q vectors (views over the buffers).'''
+        self.store()
+        return [qlist(array[:self.count], qtype = qtype, adjust_dtype = False) for array, qtype in zip(self.arrays, self.qtypes)]
+
+
+    def clear(self):
+        # releases references to the buffered objects
+        for i in self.variable:
+            self.arrays[i][:self.stored] = None
+        del self.staged[:]
+        self.stored = 0
+        self.count = 0
+        self.size = 0
+        self.since = None
+
+
+    def swap(self):
+        '''Retrieves an empty buffer of the same table, preallocated arrays
+        are reused between flushes.'''
+        spare, self.spare = self.spare, None
+        if spare is None:
+            spare = _TableBuffer(self.columns, self.qtypes, len(self.arrays[0]))
+        return spare
+
+
+
+class QPublisher(object):
+    '''Coalesces published rows into batches sent to a q service (e.g.
+    tickerplant) via asynchronous update function calls.
+
+    Rows and column chunks of each table are accumulated in preallocated,
+    typed column buffers. Buffered data is sent as a single asynchronous
+    call, e.g. ``.u.upd[`trade; columns]``, once any of thresholds is hit:
+    number of rows (`max_rows`), estimated size of the data (`max_bytes`) or
+    time since the first buffered row (`max_latency`)::
+
+        q = qconnection.QConnection(host = 'localhost', port = 17010)
+        q.open()
+
+        with qpublisher.QPublisher(q, max_rows = 10000, max_latency = 0.05) as publisher:
+            publisher.register('trade', ['time', 'sym', 'price', 'size'],
+                               [QTIMESPAN_LIST, QSYMBOL_LIST, QFLOAT_LIST, QLONG_LIST])
+
+            publisher.publish('trade', (numpy.timedelta64(1, 'ms'), 'AAPL', 101.5, 100))
+            publisher.publish_columns('trade', [times, syms, prices, sizes])
+
+            # blocks until the tickerplant processes published data
+            publisher.flush(barrier = True)
+
+    The publisher is thread-safe and requires exclusive use of the
+    connection. Data is sent without holding the lock guarding the buffers,
+    so publishing threads are not blocked by the network.
+
+    Rows are validated when published: values have to match the column
+    types (e.g. strings in symbol columns, `uuid.UUID` in guid columns) and
+    numbers have to be convertible without loss, invalid rows are rejected
+    with `ValueError` or `TypeError`. Data which cannot be sent stays
+    buffered until the next flush. Errors raised while flushing in
+    background or after a threshold is hit are raised by the next call of
+    :func:`.publish`, :func:`.publish_columns` or :func:`.flush`, so that an
+    exception raised by :func:`.publish` always means the row was not
+    accepted.
+
+    :Parameters:
+     - `connection` (:class:`.QConnection`) - opened connection
+     - `function` (`string`) - name of the update function
+     - `max_rows` (`integer` or `None`) - number of buffered rows of a table
+       triggering flush
+     - `max_bytes` (`integer` or `None`) - estimated size (in bytes) of
+       buffered data of a table triggering flush
+     - `max_latency` (`nonnegative float` or `None`) - maximal time (in
+       seconds) rows are buffered, if set, a background thread flushes the
+       buffers
+     - `barrier_query` (`string`) - q expression executed synchronously by
+       :func:`.flush` to confirm delivery
+    :Options:
+     - same as in :func:`.QConnection.sendAsync`, used for sending the updates
+    '''
+
+
+    def __init__(self, connection, function = '.u.upd', max_rows = 10000, max_bytes = 1 << 20, max_latency = 0.1, barrier_query = '::', **options):
+        self._connection = connection
+        self.function = function
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.barrier_query = barrier_query
+        self._options = options
+
+        self._tables = {}
+        # guards the buffers and the metrics
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        # serializes usage of the connection
+        self._send_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._error = None
+
+        self._published = 0
+        self._messages = 0
+        self._flushed = 0
+        self._bytes = 0
+        self._sending = 0
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(flush = exc_type is None)
+
+
+    def register(self, table, columns, qtypes, capacity = None):
+        '''Defines the schema of the published table. Data buffered for
+        previous schema of the table is flushed.
+
+        :Parameters:
+         - `table` (`string`) - name of the table
+         - `columns` (list of `strings`) - names of the columns, in order
+           expected by the update function
+         - `qtypes` (list of `integers`) - q types of the columns, e.g.
+           `QLONG_LIST`, `QSYMBOL_LIST`, `QSTRING` (char column),
+           `QSTRING_LIST` (column of strings)
+         - `capacity` (`integer` or `None`) - initial capacity of the buffers,
+           if ``None`` `max_rows` is used
+        '''
+        if len(columns) != len(qtypes) or not columns:
+            raise ValueError('Columns and qtypes are expected to be non-empty lists of equal length')
+
+        qtypes = [abs(qtype) for qtype in qtypes]
+        if capacity is None:
+            capacity = self.max_rows if self.max_rows else 1024
+
+        if table in self._tables:
+            self._flush_tables([table])
+
+        with self._lock:
+            self._tables[table] = _TableBuffer(list(columns), qtypes, capacity)
+
+
+    def start(self):
+        '''Starts the background thread flushing the buffers after
+        `max_latency`.'''
+        if self.max_latency is None:
+            return
+
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = threading.Thread(target = self._flush_loop, name = 'QPublisher')
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def close(self, flush = True):
+        '''Stops the background thread, optionally flushing the buffers.
+
+        The connection is not closed.
+
+        :Parameters:
+         - `flush` (`boolean`) - if ``True`` buffered data is sent
+        '''
+        with self._lock:
+            self._running = False
+            self._wakeup.notify_all()
+
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+        if flush:
+            self.flush()
+
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+    def _buffer(self, table):
+        self._raise_error()
+
+        try:
+            return self._tables[table]
+        except KeyError:
+            raise ValueError('Table %s is not registered' % table)
+
+
+    def publish(self, table, row):
+        '''Buffers a single row of the table.
+
+        :Parameters:
+         - `table` (`string`) - name of the table
+         - `row` (`list` or `tuple`) - values of the columns
+
+        :raises: `ValueError`, `TypeError` if the row is invalid, 
+                 :class:`.QConnectionException`, :class:`.QWriterException`
+                 or `socket.error` reported by previous flush
+        '''
+        with self._lock:
+            buffer = self._buffer(table)
+            buffer.append_row(row)
+            due = self._appended(buffer, 1)
+
+        if due:
+            self._flush_due(table)
+
+
+    def publish_columns(self, table, data):
+        '''Buffers a chunk of rows of the table given as columns.
+
+        :Parameters:
+         - `table` (`string`) - name of the table
+         - `data` (list of `lists` or `numpy.arrays`) - values of the columns
+
+        :raises: `ValueError`, `TypeError` if the data is invalid, 
+                 :class:`.QConnectionException`, :class:`.QWriterException`
+                 or `socket.error` reported by previous flush
+        '''
+        with self._lock:
+            buffer = self._buffer(table)
+            count = buffer.count
+            buffer.append_columns(data)
+            due = self._appended(buffer, buffer.count - count)
+
+        if due:
+            self._flush_due(table)
+
+
+    def _appended(self, buffer, count):
+        if not count:
+            return False
+
+        self._published += count
+
+        if buffer.since is None:
+            buffer.since = _clock()
+            self._wakeup.notify_all()
+
+        return (self.max_rows is not None and buffer.count >= self.max_rows) or (self.max_bytes is not None and buffer.size >= self.max_bytes)
+
+
+    def _flush_due(self, table):
+        # row is already accepted, the error is reported by the next call
+        try:
+            self._flush_tables([table])
+        except Exception:
+            with self._lock:
+                self._error = sys.exc_info()[1]
+
+
+    def _flush_tables(self, tables, barrier = False):
+        '''Sends buffered data of the tables. Buffers are swapped under the
+        lock, while the data is sent, rows are published into the spare
+        buffers.'''
+        with self._send_lock:
+            for table in tables:
+                with self._lock:
+                    buffer = self._tables.get(table)
+                    if buffer is None or not buffer.count:
+                        continue
+                    self._tables[table] = buffer.swap()
+                    self._sending = buffer.count
+
+                try:
+                    self._connection.sendAsync(self.function, numpy.string_(table), buffer.data(), **self._options)
+                except:
+                    with self._lock:
+                        # data is retained, rows published meanwhile follow it
+                        current = self._tables[table]
+                        buffer.extend(current)
+                        current.clear()
+                        buffer.spare = current
+                        self._tables[table] = buffer
+                        self._sending = 0
+                    raise
+
+                with self._lock:
+                    self._messages += 1
+                    self._flushed += buffer.count
+                    self._bytes += buffer.size
+                    self._sending = 0
+                    buffer.clear()
+                    self._tables[table].spare = buffer
+
+            if barrier:
+                self._connection.sendSync(self.barrier_query)
+
+
+    def flush(self, barrier = False):
+        '''Sends buffered data of all tables.
+
+        :Parameters:
+         - `barrier` (`boolean`) - if ``True`` waits until the q service
+           processes the sent data, by executing synchronous `barrier_query`
+
+        :raises: :class:`.QConnectionException`, :class:`.QWriterException`,
+                 :class:`.QReaderException`
+        '''
+        with self._lock:
+            self._raise_error()
+            tables = list(self._tables)
+
+        self._flush_tables(tables, barrier)
+
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+
+                now = _clock()
+                timeout = self.max_latency
+                due = []
+
+                for table, buffer in self._tables.items():
+                    # after failure, data is retained until the error is 
+                    # reported by publish or flush
+                    if buffer.since is None or self._error is not None:
+                        continue
+
+                    remaining = buffer.since + self.max_latency - now
+                    if remaining <= 0:
+                        due.append(table)
+                    else:
+                        timeout = min(timeout, remaining)
+
+                if not due:
+                    self._wakeup.wait(timeout)
+                    continue
+
+            try:
+                self._flush_tables(due)
+            except Exception:
+                with self._lock:
+                    self._error = sys.exc_info()[1]
+
+
+    def stats(self):
+        '''Retrieves publisher metrics.
+
+        :returns: :class:`.MetaData` with attributes:
+         - `published` - number of published rows
+         - `flushed` - number of sent rows
+         - `messages` - number of sent update messages
+         - `bytes` - estimated size of sent data
+         - `buffered` - number of buffered rows (including rows being sent)
+        '''
+        with self._lock:
+            return MetaData(published = self._published,
+                            flushed = self._flushed,
+                            messages = self._messages,
+                            bytes = self._bytes,
+                            buffered = self._sending + sum(buffer.count for buffer in self._tables.values()))
@@ -14,21 +14,24 @@
 #  limitations under the License.
 #
 
+import copy
+import functools
 import struct
 import sys
+from collections import OrderedDict
 if sys.version > '3':
     from sys import intern
     unicode = str
 
 from qpython import MetaData, CONVERSION_OPTIONS
 from qpython.qtype import *  # @UnusedWildImport
-from qpython.qcollection import qlist, QDictionary, qtable, QTable, QKeyedTable
+from qpython.qcollection import qlist, QDictionary, qtable, QTable, QLazyTable, QKeyedTable, QCompactSymbolList, unique_symbols
 from qpython.qtemporal import qtemporal, from_raw_qtemporal, array_from_raw_qtemporal
 
 try:
-    from qpython.fastutils import uncompress
+    from qpython.fastutils import uncompress, find_strings
 except:
-    from qpython.utils import uncompress
+    from qpython.utils import uncompress, find_strings
 
 
 
@@ -93,13 +96,163 @@ class QMessage(object):
 
 
 
+class QSymbolCache(object):
+    '''
+    Bounded cache interning symbols across parsed messages.
+    
+    Maps raw symbol bytes to a canonical `numpy.string_` instance and an 
+    integer code. When the `capacity` is exceeded, the least recently used 
+    symbol is evicted. Evicted symbols are assigned new codes when they are 
+    seen again, codes are never reused.
+    
+    The cache can be shared between :class:`.QReader` instances (and 
+    connections), but it is not thread-safe.
+    
+       >>> cache = QSymbolCache(capacity = 1024)
+       >>> cache.intern(b'IBM') is cache.intern(b'IBM')
+       True
+       >>> cache.code(b'IBM'), cache.code(b'MSFT'), cache.hits, cache.misses
+       (0, 1, 2, 2)
+    
+    :Parameters:
+     - `capacity` (`integer`) - maximal number of cached symbols
+    
+    :raises: `ValueError`
+    '''
+
+    def __init__(self, capacity = 65536):
+        if capacity <= 0:
+            raise ValueError('Cache capacity is required to be positive, got: %s' % capacity)
+
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._symbols = {}
+        self._next_code = 0
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def __contains__(self, symbol):
+        return bytes(symbol) in self._entries
+
+
+    def clear(self):
+        '''Removes all cached symbols and resets hit and miss counters.'''
+        self.hits = 0
+        self.misses = 0
+        self._entries.clear()
+        self._symbols.clear()
+
+
+    def intern(self, symbol):
+        '''
+        Gets the canonical instance of a symbol.
+        
+        :Parameters:
+         - `symbol` (`bytes`) - raw symbol
+        
+        :returns: `numpy.string_` - cached symbol instance
+        '''
+        return self._lookup(symbol)[0]
+
+
+    def code(self, symbol):
+        '''
+        Gets the integer code assigned to a symbol.
+        
+        :Parameters:
+         - `symbol` (`bytes`) - raw symbol
+        
+        :returns: `integer` - symbol code
+        '''
+        return self._lookup(symbol)[1]
+
+
+    def symbol(self, code):
+        '''
+        Gets the symbol assigned to a code.
+        
+        :Parameters:
+         - `code` (`integer`) - symbol code
+        
+        :returns: `numpy.string_` - cached symbol instance
+        
+        :raises: `KeyError` if the code is unknown or the symbol was evicted
+        '''
+        return self._symbols[code]
+
+
+    def intern_all(self, symbols):
+        '''
+        Gets canonical instances of symbols. Each distinct symbol is looked up
+        in the cache once.
+        
+        :Parameters:
+         - `symbols` (`numpy.string_` array or list of `bytes`) - raw symbols
+        
+        :returns: `numpy.array` of cached `numpy.string_` instances
+        '''
+        unique, inverse = unique_symbols(symbols)
+        interned = numpy.empty(len(unique), dtype = numpy.object_)
+        interned[:] = [self._lookup(symbol)[0] for symbol in unique]
+        return interned[inverse]
+
+
+    def codes(self, symbols):
+        '''
+        Gets integer codes of symbols. Each distinct symbol is looked up in the
+        cache once.
+        
+        :Parameters:
+         - `symbols` (`numpy.string_` array or list of `bytes`) - raw symbols
+        
+        :returns: `numpy.array` of `int64` codes
+        '''
+        unique, inverse = unique_symbols(symbols)
+        codes = numpy.array([self._lookup(symbol)[1] for symbol in unique], dtype = numpy.int64)
+        return codes[inverse]
+
+
+    def _lookup(self, symbol):
+        symbol = bytes(symbol)
+        # re-inserted entries are kept in the least to the most recently used order
+        entry = self._entries.pop(symbol, None)
+
+        if entry is None:
+            self.misses += 1
+            entry = (numpy.string_(symbol), self._next_code)
+            self._symbols[entry[1]] = entry[0]
+            self._next_code += 1
+
+            if len(self._entries) >= self.capacity:
+                _, evicted = self._entries.popitem(last = False)
+                del self._symbols[evicted[1]]
+        else:
+            self.hits += 1
+
+        self._entries[symbol] = entry
+        return entry
+
+
+
 class QReader(object):
     '''
     Provides deserialization from q IPC protocol.
     
+    Messages are read from the `stream` directly into preallocated, exactly 
+    sized buffers (via ``recv_into`` for sockets or ``readinto`` for file 
+    objects) and parsed in place.
+    
     :Parameters:
-     - `stream` (`file object` or `None`) - data input stream
+     - `stream` (`socket`, `file object` or `None`) - data input stream
      - `encoding` (`string`) - encoding for characters parsing
+     - `symbol_cache` (:class:`.QSymbolCache` or `None`) - if set, symbols 
+       are interned in the cache, symbol vectors are represented as arrays 
+       of cached `numpy.string_` instances (`numpy.object_` dtype)
      
     :Attrbutes:
      - `_reader_map` - stores mapping between q types and functions 
@@ -110,19 +263,30 @@ class QReader(object):
     parse = Mapper(_reader_map)
 
 
-    def __init__(self, stream, encoding = 'latin-1'):
+    def __init__(self, stream, encoding = 'latin-1', symbol_cache = None):
         self._stream = stream
         self._buffer = QReader.BytesBuffer()
         self._encoding = encoding
+        self._symbol_cache = symbol_cache
+
+        if hasattr(stream, 'recv_into'):
+            self._read_into = stream.recv_into
+        elif hasattr(stream, 'readinto'):
+            self._read_into = stream.readinto
+        else:
+            self._read_into = self._read_into_from_stream
 
 
-    def read(self, source = None, **options):
+    def read(self, source = None, owned = False, **options):
         '''
         Reads and optionally parses a single message.
         
         :Parameters:
          - `source` - optional data buffer to be read, if not specified data is 
            read from the wrapped stream
+         - `owned` (`boolean`) - if ``True`` the `source` is owned by the 
+           reader and vectors may be converted (e.g. byte swapped) in place, 
+           otherwise the `source` is never modified
         :Options:
          - `raw` (`boolean`) - indicates whether read data should parsed or 
            returned in raw byte form
@@ -131,17 +295,26 @@ class QReader(object):
            :class:`.QTemporal`) instances, otherwise are represented as 
            `numpy datetime64`/`timedelta64` arrays and atoms,
            **Default**: ``False``
+         - `lazy_tables` (`boolean`) - if ``True`` tables are returned as 
+           :class:`.QLazyTable` instances with columns decoded on first access, 
+           **Default**: ``False``
+         - `columns` (list of `strings` or `None`) - if set, only listed columns 
+           of tables are decoded, remaining columns are skipped (keys of keyed 
+           tables are always decoded), **Default**: ``None``
+         - `compact_symbols` (`boolean`) - if ``True`` symbol vectors are 
+           returned as :class:`.QCompactSymbolList` instances backed by the 
+           message buffer, **Default**: ``False``
          
         :returns: :class:`.QMessage` - read data (parsed or raw byte form) along
                   with meta information
         '''
-        message = self.read_header(source)
+        message = self.read_header(source, owned)
         message.data = self.read_data(message.size, message.is_compressed, **options)
 
         return message
 
 
-    def read_header(self, source = None):
+    def read_header(self, source = None, owned = False):
         '''
         Reads and parses message header.
         
@@ -151,6 +324,8 @@ class QReader(object):
         :Parameters:
          - `source` - optional data buffer to be read, if not specified data is 
            read from the wrapped stream
+         - `owned` (`boolean`) - if ``True`` the `source` is owned by the 
+           reader and vectors may be converted in place
            
         :returns: :class:`.QMessage` - read meta information
         '''
@@ -158,7 +333,7 @@ class QReader(object):
             header = self._read_bytes(8)
             self._buffer.wrap(header)
         else:
-            self._buffer.wrap(source)
+            self._buffer.wrap(source, owned)
 
         self._buffer.endianness = '<' if self._buffer.get_byte() == 1 else '>'
         self._is_native = self._buffer.endianness == ('<' if sys.byteorder == 'little' else '>')
@@ -171,6 +346,28 @@ class QReader(object):
         return QMessage(None, message_type, message_size, message_compressed)
 
 
+    def read_frame(self):
+        '''
+        Reads a single message from the wrapped stream without parsing it.
+        
+        The message can be parsed later on via :func:`.read` (e.g. by another
+        reader instance).
+        
+        :returns: `bytearray` - whole message, including the header
+        :raises: :class:`.QReaderException`
+        '''
+        header = self._read_bytes(8)
+        message_size = struct.unpack('<i' if header[0] == 1 else '>i', header[4:])[0]
+
+        if message_size < 8:
+            raise QReaderException('Invalid message size: %s' % message_size)
+
+        frame = bytearray(message_size)
+        frame[:8] = header
+        self._read_into_view(memoryview(frame)[8:])
+        return frame
+
+
     def read_data(self, message_size, is_compressed = False, **options):
         '''
         Reads and optionally parses data part of a message.
@@ -189,6 +386,15 @@ class QReader(object):
            :class:`.QTemporal`) instances, otherwise are represented as 
            `numpy datetime64`/`timedelta64` arrays and atoms,
            **Default**: ``False``
+         - `lazy_tables` (`boolean`) - if ``True`` tables are returned as 
+           :class:`.QLazyTable` instances with columns decoded on first access, 
+           **Default**: ``False``
+         - `columns` (list of `strings` or `None`) - if set, only listed columns 
+           of tables are decoded, remaining columns are skipped (keys of keyed 
+           tables are always decoded), **Default**: ``None``
+         - `compact_symbols` (`boolean`) - if ``True`` symbol vectors are 
+           returned as :class:`.QCompactSymbolList` instances backed by the 
+           message buffer, **Default**: ``False``
          
         :returns: read data (parsed or raw byte form)
         '''
@@ -200,20 +406,21 @@ class QReader(object):
             uncompressed_size = -8 + self._buffer.get_int()
             compressed_data = self._read_bytes(message_size - 12) if self._stream else self._buffer.raw(message_size - 12)
 
-            raw_data = numpy.frombuffer(compressed_data, dtype = numpy.uint8)
             if  uncompressed_size <= 0:
                 raise QReaderException('Error while data decompression.')
 
-            raw_data = uncompress(raw_data, numpy.intc(uncompressed_size))
-            raw_data = numpy.ndarray.tostring(raw_data)
-            self._buffer.wrap(raw_data)
+            try:
+                raw_data = uncompress(compressed_data, uncompressed_size)
+            except ValueError:
+                raise QReaderException('Error while data decompression.')
+            self._buffer.wrap(raw_data, True)
         elif self._stream:
             raw_data = self._read_bytes(message_size - 8)
-            self._buffer.wrap(raw_data)
+            self._buffer.wrap(raw_data, True)
         if not self._stream and self._options.raw:
             raw_data = self._buffer.raw(message_size - 8)
 
-        return raw_data if self._options.raw else self._read_object()
+        return bytes(raw_data) if self._options.raw else self._read_object()
 
 
     def _read_object(self):
@@ -249,6 +456,8 @@ class QReader(object):
 
     @parse(QSYMBOL)
     def _read_symbol(self, qtype = QSYMBOL):
+        if self._symbol_cache is not None:
+            return self._symbol_cache.intern(self._buffer.get_symbol())
         return numpy.string_(self._buffer.get_symbol())
 
 
@@ -287,21 +496,31 @@ class QReader(object):
         length = self._buffer.get_int()
         conversion = PY_TYPE.get(-qtype, None)
 
-        if qtype == QSYMBOL_LIST:
+        if qtype == QSYMBOL_LIST and self._options.compact_symbols:
+            block = self._buffer.get_symbols_block(length)
+            return QCompactSymbolList.from_block(numpy.frombuffer(block, dtype = numpy.uint8), length)
+        elif qtype == QSYMBOL_LIST:
             symbols = self._buffer.get_symbols(length)
             data = numpy.array(symbols, dtype = numpy.string_)
+            if self._symbol_cache is not None:
+                data = self._symbol_cache.intern_all(data)
             return qlist(data, qtype = qtype, adjust_dtype = False)
         elif qtype == QGUID_LIST:
-            data = numpy.array([self._read_guid() for x in range(length)])
+            data = numpy.frombuffer(self._buffer.view(length * ATOM_SIZE[qtype]), dtype = GUID_DTYPE)
             return qlist(data, qtype = qtype, adjust_dtype = False)
         elif conversion:
-            raw = self._buffer.raw(length * ATOM_SIZE[qtype])
+            raw = self._buffer.view(length * ATOM_SIZE[qtype])
             data = numpy.frombuffer(raw, dtype = conversion)
+            # buffers supplied by the caller are never modified
+            inplace = self._buffer.owned and data.flags.writeable
             if not self._is_native:
-                data.byteswap(True)
+                data = data.byteswap(inplace)
+                # swapped copy is owned by the reader
+                inplace = True
 
             if qtype >= QTIMESTAMP_LIST and qtype <= QTIME_LIST and self._options.numpy_temporals:
-                data = array_from_raw_qtemporal(data, qtype)
+                # views over the message buffer are converted in place
+                data = array_from_raw_qtemporal(data, qtype, inplace = inplace)
 
             return qlist(data, qtype = qtype, adjust_dtype = False)
         else:
@@ -310,7 +529,7 @@ class QReader(object):
 
     @parse(QDICTIONARY)
     def _read_dictionary(self, qtype = QDICTIONARY):
-        keys = self._read_object()
+        keys = self._read_keys()
         values = self._read_object()
 
         if isinstance(keys, QTable):
@@ -325,11 +544,122 @@ class QReader(object):
         self._buffer.skip()  # ignore dict type stamp
 
         columns = self._read_object()
-        data = self._read_object()
+
+        if self._options.lazy_tables:
+            return self._read_lazy_table(columns)
+        elif self._options.columns is not None:
+            columns, data, size = self._read_columns(columns)
+            if not columns:
+                # none of the columns is selected, keep the number of rows
+                table = QTable([], [], size)
+                table._meta_init(qtype = QTABLE)
+                return table
+        else:
+            data = self._read_object()
 
         return qtable(columns, data, qtype = QTABLE)
 
 
+    def _read_keys(self):
+        # keys of keyed tables are always read in full
+        columns = self._options.columns
+        self._options.columns = None
+        try:
+            return self._read_object()
+        finally:
+            self._options.columns = columns
+
+
+    def _get_column_selection(self):
+        if self._options.columns is None:
+            return None
+
+        return set(column if isinstance(column, str) else column.decode('utf-8') for column in self._options.columns)
+
+
+    def _read_columns_header(self):
+        if self._buffer.get_byte() != QGENERAL_LIST:
+            raise QReaderException('Unable to deserialize q table: columns data is expected to be a general list')
+
+        self._buffer.skip()  # ignore attributes
+        return self._buffer.get_int()
+
+
+    def _peek_column_size(self):
+        # reads the number of rows from the header of the next column
+        position = self._buffer.tell()
+        self._buffer.skip(2)  # ignore type and attributes
+        size = self._buffer.get_int()
+        self._buffer.seek(position)
+        return size
+
+
+    def _read_columns(self, columns):
+        # reads columns data skipping the columns which are not selected
+        length = self._read_columns_header()
+        selection = self._get_column_selection()
+
+        column_names = []
+        data = []
+        size = self._peek_column_size() if length else 0
+
+        for i in range(length):
+            column_name = columns[i] if isinstance(columns[i], str) else columns[i].decode('utf-8')
+
+            if selection is None or column_name in selection:
+                column_names.append(column_name)
+                data.append(self._read_column())
+            else:
+                self._skip_object()
+
+        return column_names, data, size
+
+
+    def _read_column(self):
+        return self._read_object()
+
+
+    def _read_lazy_table(self, columns):
+        length = self._read_columns_header()
+        selection = self._get_column_selection()
+
+        meta = MetaData(qtype = QTABLE)
+        column_names = []
+        loaders = []
+        size = self._peek_column_size() if length else 0
+        reader = self._snapshot()
+
+        for i in range(length):
+            column_name = columns[i] if isinstance(columns[i], str) else columns[i].decode('utf-8')
+            position = self._buffer.tell()
+            qtype = self._buffer.get_byte()
+            self._skip(qtype)
+
+            if selection is not None and column_name not in selection:
+                continue
+
+            meta[column_name] = -abs(qtype)
+            column_names.append(column_name)
+            loaders.append(functools.partial(reader._read_object_at, position))
+
+        table = QLazyTable(column_names, loaders, size)
+        table._meta_init(**meta.as_dict())
+        return table
+
+
+    def _snapshot(self):
+        # independent reader over the current message, used for deferred reads
+        reader = copy.copy(self)
+        reader._buffer = copy.copy(self._buffer)
+        return reader
+
+
+    def _read_object_at(self, position):
+        reader = self._snapshot()
+        reader._buffer.seek(position)
+        return reader._read_object()
+
+
     @parse(QGENERAL_LIST)
     def _read_general_list(self, qtype = QGENERAL_LIST):
         self._buffer.skip()  # ignore attributes
@@ -378,28 +708,89 @@ class QReader(object):
         return QProjection(parameters)
 
 
+    def _skip_object(self):
+        self._skip(self._buffer.get_byte())
+
+
+    def _skip(self, qtype):
+        # moves the read position past the object without constructing it
+        if qtype == QGENERAL_LIST:
+            self._buffer.skip()  # ignore attributes
+            for x in range(self._buffer.get_int()):
+                self._skip_object()
+        elif qtype == QSYMBOL_LIST:
+            self._buffer.skip()  # ignore attributes
+            self._buffer.skip_symbols(self._buffer.get_int())
+        elif qtype >= QBOOL_LIST and qtype <= QTIME_LIST and ATOM_SIZE[qtype]:
+            self._buffer.skip()  # ignore attributes
+            self._buffer.skip(self._buffer.get_int() * ATOM_SIZE[qtype])
+        elif qtype == QSYMBOL or qtype == QERROR:
+            self._buffer.skip_symbols(1)
+        elif qtype <= QBOOL and qtype >= QTIME and ATOM_SIZE[-qtype]:
+            self._buffer.skip(ATOM_SIZE[-qtype])
+        elif qtype == QTABLE:
+            self._buffer.skip()  # ignore attributes
+            self._skip_object()
+        elif qtype == QDICTIONARY:
+            self._skip_object()
+            self._skip_object()
+        elif qtype in (QNULL, QUNARY_FUNC, QBINARY_FUNC, QTERNARY_FUNC):
+            self._buffer.skip()
+        elif qtype == QLAMBDA:
+            self._buffer.skip_symbols(1)
+            self._skip_object()
+        elif qtype in (QPROJECTION, QCOMPOSITION_FUNC):
+            for x in range(self._buffer.get_int()):
+                self._skip_object()
+        elif qtype >= QADVERB_FUNC_106 and qtype <= QADVERB_FUNC_111:
+            self._skip_object()
+        else:
+            raise QReaderException('Unable to skip q type: %s' % hex(qtype))
+
+
     def _read_bytes(self, length):
         if not self._stream:
             raise QReaderException('There is no input data. QReader requires either stream or data chunk')
 
-        if length == 0:
-            return b''
-        else:
-            data = self._stream.read(length)
-
-        if len(data) == 0:
-            raise QReaderException('Error while reading data')
+        data = bytearray(length)
+        self._read_into_view(memoryview(data))
         return data
 
 
+    def _read_into_view(self, view):
+        if not self._stream:
+            raise QReaderException('There is no input data. QReader requires either stream or data chunk')
+
+        length = len(view)
+        position = 0
+
+        while position < length:
+            count = self._read_into(view[position:])
+
+            if not count:
+                raise QReaderException('Error while reading data')
+            position += count
+
+
+    def _read_into_from_stream(self, view):
+        data = self._stream.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+
 
     class BytesBuffer(object):
         '''
         Utility class for reading bytes from wrapped buffer.
+
+        Apart from copying reads (:func:`.raw`), the buffer provides zero-copy
+        access to the wrapped data via `memoryview` slices (:func:`.view`).
+        Arrays created over such slices keep the wrapped data alive.
         '''
 
         def __init__(self):
             self._endianness = '@'
+            self.owned = False
 
 
         @property
@@ -421,18 +812,44 @@ class QReader(object):
             self._endianness = endianness
 
 
-        def wrap(self, data):
+        def wrap(self, data, owned = False):
             '''
             Wraps the data in the buffer.
             
             :Parameters:
              - `data` - data to be wrapped
+             - `owned` (`boolean`) - if ``True`` the data has been allocated by 
+               the reader and can be modified in place
             '''
+            self.owned = owned
             self._data = data
+            self._view = memoryview(data)
             self._position = 0
             self._size = len(data)
 
 
+        def tell(self):
+            '''
+            Gets the current read position.
+            
+            :returns: current position in the buffer
+            '''
+            return self._position
+
+
+        def seek(self, position):
+            '''
+            Sets the read position.
+            
+            :Parameters:
+             - `position` (`integer`) - new position in the buffer
+            '''
+            if position < 0 or position > self._size:
+                raise QReaderException('Attempt to read data out of buffer bounds')
+
+            self._position = position
+
+
         def skip(self, offset = 1):
             '''
             Skips reading of `offset` bytes.
@@ -462,11 +879,30 @@ class QReader(object):
             if new_position > self._size:
                 raise QReaderException('Attempt to read data out of buffer bounds')
 
-            raw = self._data[self._position : new_position]
+            raw = bytes(self._view[self._position : new_position])
             self._position = new_position
             return raw
 
 
+        def view(self, offset):
+            '''
+            Gets a zero-copy view over `offset` number of bytes.
+            
+            :Parameters:
+             - `offset` (`integer`) - number of bytes to be retrieved
+             
+            :returns: `memoryview` referencing the wrapped data
+            '''
+            new_position = self._position + offset
+
+            if new_position > self._size:
+                raise QReaderException('Attempt to read data out of buffer bounds')
+
+            view = self._view[self._position : new_position]
+            self._position = new_position
+            return view
+
+
         def get(self, fmt, offset = None):
             '''
             Gets bytes from the buffer according to specified format or `offset`.
@@ -479,7 +915,14 @@ class QReader(object):
             '''
             fmt = self.endianness + fmt
             offset = offset if offset else struct.calcsize(fmt)
-            return struct.unpack(fmt, self.raw(offset))[0]
+            new_position = self._position + offset
+
+            if new_position > self._size:
+                raise QReaderException('Attempt to read data out of buffer bounds')
+
+            value = struct.unpack_from(fmt, self._data, self._position)[0]
+            self._position = new_position
+            return value
 
 
         def get_byte(self):
@@ -511,7 +954,7 @@ class QReader(object):
             if new_position < 0:
                 raise QReaderException('Failed to read symbol from stream')
 
-            raw = self._data[self._position : new_position]
+            raw = bytes(self._view[self._position : new_position])
             self._position = new_position + 1
             return raw
 
@@ -525,24 +968,82 @@ class QReader(object):
             
             :returns: list of ``\\x00`` terminated string read from the buffer
             '''
-            c = 0
-            new_position = self._position
-
             if count == 0:
                 return []
 
-            while c < count:
-                new_position = self._data.find(b'\x00', new_position)
+            new_position = self._find_symbols_end(count)
+            raw = bytes(self._view[self._position : new_position - 1])
+            self._position = new_position
 
-                if new_position < 0:
-                    raise QReaderException('Failed to read symbol from stream')
+            return raw.split(b'\x00')
 
-                c += 1
-                new_position += 1
 
-            raw = self._data[self._position : new_position - 1]
-            self._position = new_position
+        def get_symbols_block(self, count):
+            '''
+            Gets a zero-copy view over ``count`` ``\\x00`` terminated strings.
+            
+            :Parameters:
+             - `count` (`integer`) - number of strings to be read
+            
+            :returns: `memoryview` referencing the strings (including 
+                      terminators)
+            '''
+            return self.view(self._find_symbols_end(count) - self._position)
 
-            return raw.split(b'\x00')
+
+        def get_strings(self, count):
+            '''
+            Gets ``count`` consecutive char vectors from the buffer.
+            
+            :Parameters:
+             - `count` (`integer`) - number of char vectors to be read
+            
+            :returns: tuple of `numpy.array` referencing the vectors data, 
+                      vectors offsets and lengths or ``None`` if the buffer 
+                      doesn't contain ``count`` char vectors (read position is
+                      not changed)
+            '''
+            little_endian = self._endianness == '<' or (self._endianness not in '<>' and sys.byteorder == 'little')
+            strings = find_strings(self._view[self._position:], count, little_endian)
+
+            if strings is None:
+                return None
+
+            starts, lengths, size = strings
+            return numpy.frombuffer(self.view(size), dtype = numpy.uint8), starts, lengths
+
+
+        def skip_symbols(self, count):
+            '''
+            Skips reading of ``count`` ``\\x00`` terminated strings.
+            
+            :Parameters:
+             - `count` (`integer`) - number of strings to be skipped
+            '''
+            if count > 0:
+                self._position = self._find_symbols_end(count)
+
+
+        def _find_symbols_end(self, count):
+            # locates terminators in chunks of doubling size, sized initially
+            # for symbols of average length
+            position = self._position
+            chunk = max(count * 8, 256)
+
+            if count == 0:
+                return position
+
+            while position < self._size:
+                data = numpy.frombuffer(self._view[position : position + chunk], dtype = numpy.uint8)
+                terminators = numpy.flatnonzero(data == 0)
+
+                if len(terminators) >= count:
+                    return position + int(terminators[count - 1]) + 1
+
+                count -= len(terminators)
+                position += len(data)
+                chunk *= 2
+
+            raise QReaderException('Failed to read symbol from stream')
 
 
@@ -0,0 +1,374 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque, OrderedDict
+
+from qpython import MetaData
+from qpython.qconnection import QConnectionException
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+
+class BackpressurePolicy(object):
+    '''Enumeration defining behaviour of the :class:`.QSubscriber` when its
+    queue is full.'''
+    #: socket read loop waits until the queue is drained
+    BLOCK = 'block'
+    #: the oldest queued message is dropped
+    DROP_OLDEST = 'drop_oldest'
+    #: messages are spilled to a temporary file and dispatched in order
+    SPILL = 'spill'
+
+
+
+class QSubscriber(object):
+    '''Dispatches messages published by a q service (e.g. tickerplant
+    updates) in background threads.
+
+    The subscriber owns the read loop of the connection: the reader thread
+    only receives messages (without parsing them) and puts them into a
+    bounded queue, messages are parsed and dispatched to the callbacks by
+    the dispatcher thread. Thus, slow callbacks don't stall reading from the
+    socket.
+
+    Messages in form of the update function call (``(`upd; `trade; data)``)
+    are dispatched to the callbacks registered for the table via :func:`.on`
+    in micro-batches: all queued updates (up to `batch_size`) are grouped by
+    table and each callback is invoked once with the list of updates (in
+    arrival order). Remaining messages are passed to the `default_callback`::
+
+        def on_trade(table, updates):
+            for data in updates:
+                print(table, len(data))
+
+        q = qconnection.QConnection(host = 'localhost', port = 17010)
+        q.open()
+        q.sendSync('.u.sub', numpy.string_('trade'), numpy.string_(''))
+
+        with qsubscriber.QSubscriber(q, queue_size = 10000, policy = BackpressurePolicy.DROP_OLDEST) as subscriber:
+            subscriber.on('trade', on_trade)
+            # ...
+
+    :Parameters:
+     - `connection` (:class:`.QConnection`) - opened connection, closed when
+       the subscriber is stopped
+     - `queue_size` (`integer`) - maximal number of queued messages
+     - `policy` (one of the constants defined in :class:`.BackpressurePolicy`)
+       - behaviour when the queue is full
+     - `batch_size` (`integer`) - maximal number of messages dispatched at once
+     - `update_function` (`string`) - name of the update function
+     - `default_callback` (`function` or `None`) - invoked with
+       :class:`.QMessage` instances not representing updates
+     - `error_callback` (`function` or `None`) - invoked with
+       ``sys.exc_info()`` tuple if callback raises or connection fails
+    :Options:
+     - same as in :func:`.QConnection.receive`, used for parsing of the
+       messages
+    '''
+
+
+    def __init__(self, connection, queue_size = 10000, policy = BackpressurePolicy.BLOCK, batch_size = 1000, update_function = 'upd', default_callback = None, error_callback = None, **options):
+        if policy not in (BackpressurePolicy.BLOCK, BackpressurePolicy.DROP_OLDEST, BackpressurePolicy.SPILL):
+            raise ValueError('Unsupported backpressure policy: %s' % policy)
+
+        if queue_size < 1 or batch_size < 1:
+            raise ValueError('Invalid queue_size: %s or batch_size: %s' % (queue_size, batch_size))
+
+        self._connection = connection
+        self.queue_size = queue_size
+        self.policy = policy
+        self.batch_size = batch_size
+        self.default_callback = default_callback
+        self.error_callback = error_callback
+
+        self._update_function = self._encode(update_function)
+        self._callbacks = {}
+        self._options = connection._options.union_dict(**options)
+
+        self._lock = threading.Condition(threading.Lock())
+        # queued messages along with time of receipt
+        self._queue = deque()
+        self._spill = None
+        self._spilled = 0
+        self._spill_position = 0
+        self._running = False
+        self._threads = []
+
+        self.error = None
+
+        self._received = 0
+        self._dispatched = 0
+        self._dropped = 0
+        self._spilled_total = 0
+        self._max_queue_depth = 0
+        self._lag = 0.0
+        self._max_lag = 0.0
+        self._errors = 0
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+    def _encode(self, name):
+        return name if isinstance(name, bytes) else name.encode(self._connection._encoding)
+
+
+    def on(self, table, callback):
+        '''Registers callback for updates of the table.
+
+        :Parameters:
+         - `table` (`string`) - name of the table
+         - `callback` (`function`) - invoked with the name of the table and
+           list of updates, ``None`` removes registered callback
+        '''
+        with self._lock:
+            if callback is None:
+                self._callbacks.pop(self._encode(table), None)
+            else:
+                self._callbacks[self._encode(table)] = callback
+
+
+    def start(self):
+        '''Starts the reader and dispatcher threads.'''
+        if not self._connection.is_connected():
+            raise QConnectionException('Connection is not established.')
+
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        self._threads = [threading.Thread(target = self._read_loop, name = 'QSubscriber-reader'),
+                         threading.Thread(target = self._dispatch_loop, name = 'QSubscriber-dispatcher')]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+
+    def stop(self, timeout = None):
+        '''Stops the subscriber and closes the connection.
+
+        Messages already queued are dispatched before the dispatcher thread
+        terminates.
+
+        :Parameters:
+         - `timeout` (`nonnegative float` or `None`) - maximal time to wait for
+           each of the threads
+        '''
+        with self._lock:
+            self._running = False
+            self._lock.notify_all()
+
+        connection = self._connection._connection
+        if connection:
+            try:
+                # unblocks the reader thread
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        self._connection.close()
+
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+
+    def is_running(self):
+        '''Checks whether the subscriber is running.
+
+        :returns: `boolean` -- ``True`` if the subscriber receives messages
+        '''
+        return self._running
+
+
+    def _read_loop(self):
+        reader = self._connection._reader
+
+        try:
+            while self._running:
+                frame = reader.read_frame()
+                self._put(_clock(), frame)
+        except Exception:
+            with self._lock:
+                stopped = not self._running
+                self._running = False
+                self._lock.notify_all()
+
+            if not stopped:
+                self.error = sys.exc_info()[1]
+                self._on_error(sys.exc_info())
+
+
+    def _put(self, received, frame):
+        with self._lock:
+            self._received += 1
+
+            if self._spilled:
+                self._spill_frame(received, frame)
+            elif len(self._queue) >= self.queue_size:
+                if self.policy == BackpressurePolicy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self._dropped += 1
+                    self._queue.append((received, frame))
+                elif self.policy == BackpressurePolicy.SPILL:
+                    self._spill_frame(received, frame)
+                else:
+                    while self._running and len(self._queue) >= self.queue_size:
+                        self._lock.wait()
+                    self._queue.append((received, frame))
+            else:
+                self._queue.append((received, frame))
+
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._lock.notify_all()
+
+
+    def _spill_frame(self, received, frame):
+        '''Appends message to the spill file, has to be called with lock
+        acquired.'''
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
+            self._spill_position = 0
+
+        self._spill.seek(0, 2)
+        self._spill.write(struct.pack('=di', received, len(frame)))
+        self._spill.write(frame)
+        self._spilled += 1
+        self._spilled_total += 1
+
+
+    def _unspill(self, count):
+        '''Moves spilled messages to the queue, has to be called with lock
+        acquired.'''
+        self._spill.seek(self._spill_position)
+        for _ in range(min(count, self._spilled)):
+            received, size = struct.unpack('=di', self._spill.read(12))
+            self._queue.append((received, bytearray(self._spill.read(size))))
+            self._spilled -= 1
+        self._spill_position = self._spill.tell()
+
+        if not self._spilled:
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_position = 0
+
+
+    def _take(self):
+        '''Retrieves a batch of messages, blocks until a message is available
+        or the subscriber is stopped and drained.'''
+        with self._lock:
+            while not self._queue and not self._spilled and self._running:
+                self._lock.wait()
+
+            if not self._queue and self._spilled:
+                self._unspill(self.queue_size)
+
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._lock.notify_all()
+            return batch
+
+
+    def _dispatch_loop(self):
+        reader = self._connection._reader_class(None, encoding = self._connection._encoding, symbol_cache = self._connection._symbol_cache)
+
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+
+            updates = OrderedDict()
+            for _, frame in batch:
+                try:
+                    message = reader.read(frame, owned = True, **self._options)
+                except Exception:
+                    self._on_error(sys.exc_info())
+                    continue
+
+                data = message.data
+                if isinstance(data, list) and len(data) == 3 and isinstance(data[0], bytes) and data[0] == self._update_function and isinstance(data[1], bytes):
+                    updates.setdefault(bytes(data[1]), []).append(data[2])
+                elif self.default_callback:
+                    self._invoke(self.default_callback, message)
+
+            for table, data in updates.items():
+                callback = self._callbacks.get(table)
+                if callback:
+                    self._invoke(callback, table.decode(self._connection._encoding), data)
+
+            lag = _clock() - batch[0][0]
+            with self._lock:
+                self._dispatched += len(batch)
+                self._lag = lag
+                self._max_lag = max(self._max_lag, lag)
+
+
+    def _invoke(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception:
+            self._on_error(sys.exc_info())
+
+
+    def _on_error(self, exc_info):
+        with self._lock:
+            self._errors += 1
+
+        if self.error_callback:
+            try:
+                self.error_callback(exc_info)
+            except Exception:
+                pass
+
+
+    def stats(self):
+        '''Retrieves subscriber metrics.
+
+        :returns: :class:`.MetaData` with attributes:
+         - `received` - number of received messages
+         - `dispatched` - number of dispatched messages
+         - `dropped` - number of messages dropped due to the backpressure
+         - `spilled` - number of messages spilled to file
+         - `queue_depth` - number of queued messages (including spilled)
+         - `max_queue_depth` - maximal number of messages in memory queue
+         - `lag` - time (in seconds) between receipt of the oldest message in
+           the last dispatched batch and completion of its dispatch
+         - `max_lag` - maximal observed `lag`
+         - `errors` - number of errors raised by callbacks or while parsing
+        '''
+        with self._lock:
+            return MetaData(received = self._received,
+                            dispatched = self._dispatched,
+                            dropped = self._dropped,
+                            spilled = self._spilled_total,
+                            queue_depth = len(self._queue) + self._spilled,
+                            max_queue_depth = self._max_queue_depth,
+                            lag = self._lag,
+                            max_lag = self._max_lag,
+                            errors = self._errors)
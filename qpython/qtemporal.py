@@ -18,6 +18,11 @@ from qpython import MetaData
 from qpython.qtype import *  # @UnusedWildImport
 from numpy import longlong
 
+try:
+    from qpython.fastutils import from_raw_temporals
+except:
+    from qpython.utils import from_raw_temporals
+
 _MILLIS_PER_DAY = 24 * 60 * 60 * 1000
 _MILLIS_PER_DAY_FLOAT = float(_MILLIS_PER_DAY)
 _QEPOCH_MS = long(10957 * _MILLIS_PER_DAY)
@@ -52,6 +57,8 @@ class QTemporal(object):
      - `dt` (`numpy.datetime64` or `numpy.timedelta64`) - datetime to be wrapped
     '''
 
+    __slots__ = ('_datetime', 'meta')
+
     def __init__(self, dt):
         self._datetime = dt
 
@@ -140,7 +147,7 @@ def to_raw_qtemporal(dt, qtype):
 
 
 
-def array_from_raw_qtemporal(raw, qtype):
+def array_from_raw_qtemporal(raw, qtype, inplace = False):
     '''
     Converts `numpy.array` containing raw q representation to ``datetime64``/``timedelta64``
     array.
@@ -154,6 +161,9 @@ def array_from_raw_qtemporal(raw, qtype):
     :Parameters:
      - `raw` (`numpy.array`) - numpy raw array to be converted
      - `qtype` (`integer`) - qtype indicator
+     - `inplace` (`boolean`) - if ``True`` and `raw` is a writable `int64` 
+       array, conversion is performed in place and returned array shares 
+       memory with `raw`
     
     :returns: `numpy.array` - numpy array with ``datetime64``/``timedelta64``
     
@@ -165,6 +175,24 @@ def array_from_raw_qtemporal(raw, qtype):
     qtype = -abs(qtype)
     conversion = _FROM_RAW_LIST[qtype]
 
+    if qtype in _FROM_RAW_OFFSET and raw.dtype in (numpy.int32, numpy.int64) and raw.ndim == 1:
+        # integer representations are converted in a single pass, q nulls of 
+        # 64-bit types share bit pattern with NaT
+        raw = raw.view(numpy.ndarray)
+        null, offset = qnull(qtype), _FROM_RAW_OFFSET[qtype]
+        dtype = _NUMPY_NULL[qtype].dtype
+
+        if raw.dtype == numpy.int64 and offset == 0 and null == _NAT:
+            array = raw if inplace else raw.copy()
+        else:
+            if raw.dtype == numpy.int64 and inplace and raw.flags.writeable and raw.flags.c_contiguous:
+                array = raw
+            else:
+                array = numpy.empty(len(raw), dtype = numpy.int64)
+            from_raw_temporals(numpy.ascontiguousarray(raw), array, offset, null)
+
+        return array.view(dtype)
+
     mask = raw == qnull(qtype)
 
     dtype = PY_TYPE[qtype]
@@ -421,6 +449,22 @@ _FROM_RAW_LIST = {
 
 
 
+_FROM_RAW_OFFSET = {
+                    QMONTH:      360,
+                    QDATE:       10957,
+                    QMINUTE:     0,
+                    QSECOND:     0,
+                    QTIME:       0,
+                    QTIMESTAMP:  _EPOCH_QTIMESTAMP_NS,
+                    QTIMESPAN:   0,
+                    }
+
+
+
+_NAT = numpy.iinfo(numpy.int64).min
+
+
+
 _NUMPY_NULL = {
                QMONTH:      numpy.datetime64('NaT', 'M'),
                QDATE:       numpy.datetime64('NaT', 'D'),
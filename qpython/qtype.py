@@ -159,6 +159,10 @@ ATOM_SIZE = ( 0, 1, 16, 0, 1, 2, 4, 8, 4, 8, 1, 0, 8, 4, 4, 8, 8, 4, 4, 4 )
 
 
 
+# raw representation of GUID vector elements
+GUID_DTYPE = numpy.dtype('V16')
+
+
 # mapping of q atoms to corresponding Python types
 PY_TYPE = {
     QBOOL:          numpy.bool_,
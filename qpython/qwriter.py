@@ -22,9 +22,14 @@ except ImportError:
 
 from qpython import MetaData, CONVERSION_OPTIONS
 from qpython.qtype import *  # @UnusedWildImport
-from qpython.qcollection import qlist, QList, QTemporalList, QDictionary, QTable, QKeyedTable, get_list_qtype
+from qpython.qcollection import qlist, QList, QTemporalList, QGUIDList, QCompactSymbolList, QDictionary, QTable, QLazyTable, QKeyedTable, get_list_qtype
 from qpython.qtemporal import QTemporal, to_raw_qtemporal, array_to_raw_qtemporal
 
+try:
+    from qpython.fastutils import compress
+except:
+    from qpython.utils import compress
+
 
 class QWriterException(Exception):
     '''
@@ -36,6 +41,22 @@ class QWriterException(Exception):
 
 ENDIANESS = '\1' if sys.byteorder == 'little' else '\0'
 
+# maximal number of buffers passed to a single sendmsg call
+IOV_MAX = 1024
+
+# size (in bytes) of symbol rows encoded at once
+_SYMBOLS_CHUNK = 1 << 16
+
+
+def _terminate_symbols(matrix):
+    # cuts fixed width symbols at the first NUL, which also terminates them
+    count, width = matrix.shape
+    padded = numpy.zeros((count, width + 1), dtype = numpy.uint8)
+    padded[:, :width] = matrix
+    lengths = numpy.argmax(padded == 0, axis = 1)
+    return padded[numpy.arange(width + 1) <= lengths[:, None]].tobytes()
+
+
 
 class QWriter(object):
     '''
@@ -72,29 +93,94 @@ class QWriter(object):
          - `single_char_strings` (`boolean`) - if ``True`` single char Python 
            strings are encoded as q strings instead of chars, 
            **Default**: ``False``
+         - `compress` (`boolean`) - if ``True`` messages larger than 
+           `compress_threshold` are sent in compressed form (requires IPC 
+           protocol version 1 or higher), **Default**: ``False``
+         - `compress_threshold` (`integer`) - minimal size (in bytes) of the 
+           message to be compressed, **Default**: ``2000``
+         - `scatter_gather` (`boolean`) - if ``True`` the message is collected 
+           as a list of buffers referencing vector data and sent via vectored
+           write (``socket.sendmsg`` if available), instead of being copied 
+           into a single buffer, **Default**: ``False``
         
         :returns: if wraped stream is ``None`` serialized data, 
                   otherwise ``None`` 
         '''
-        self._buffer = BytesIO()
-
         self._options = MetaData(**CONVERSION_OPTIONS.union_dict(**options))
 
-        # header and placeholder for message size
-        self._buffer.write(('%s%s\0\0\0\0\0\0' % (ENDIANESS, chr(msg_type))).encode(self._encoding))
+        if self._options.scatter_gather:
+            self._buffer = QWriter.GatherBuffer()
+            self._write(data)
+
+            data_size = 8 + self._buffer.tell()
+            chunks = [('%s%s\0\0' % (ENDIANESS, chr(msg_type))).encode(self._encoding) + struct.pack('i', data_size)]
+            chunks.extend(self._buffer.chunks())
+
+            if self._stream and not self._is_compressed(data_size):
+                self._send_chunks(chunks)
+                return
+
+            message = b''.join(chunks)
+        else:
+            self._buffer = BytesIO()
+
+            # header and placeholder for message size
+            self._buffer.write(('%s%s\0\0\0\0\0\0' % (ENDIANESS, chr(msg_type))).encode(self._encoding))
+
+            self._write(data)
+
+            # update message size
+            data_size = self._buffer.tell()
+            self._buffer.seek(4)
+            self._buffer.write(struct.pack('i', data_size))
 
-        self._write(data)
+            message = self._buffer.getvalue()
 
-        # update message size
-        data_size = self._buffer.tell()
-        self._buffer.seek(4)
-        self._buffer.write(struct.pack('i', data_size))
+        if self._is_compressed(data_size):
+            message = self._compress(message, msg_type)
 
         # write data to socket
         if self._stream:
-            self._stream.sendall(self._buffer.getvalue())
+            self._stream.sendall(message)
         else:
-            return self._buffer.getvalue()
+            return message
+
+
+    def _is_compressed(self, data_size):
+        return self._options.compress and self._protocol_version >= 1 and data_size > self._options.compress_threshold
+
+
+    def _send_chunks(self, chunks):
+        sendmsg = getattr(self._stream, 'sendmsg', None)
+
+        if sendmsg is None:
+            for chunk in chunks:
+                self._stream.sendall(chunk)
+            return
+
+        i = 0
+        while i < len(chunks):
+            sent = sendmsg(chunks[i : i + IOV_MAX])
+
+            # skip fully sent chunks and resume from the partially sent one
+            while i < len(chunks) and sent >= len(chunks[i]):
+                sent -= len(chunks[i])
+                i += 1
+
+            if sent:
+                chunks[i] = memoryview(chunks[i])[sent:]
+
+
+    def _compress(self, message, msg_type):
+        compressed = compress(memoryview(message)[8:])
+
+        # message is sent uncompressed if compression is not efficient
+        if compressed is None:
+            return message
+
+        return b''.join((('%s%s\1\0' % (ENDIANESS, chr(msg_type))).encode(self._encoding),
+                         struct.pack('ii', len(compressed) + 12, len(message)),
+                         compressed))
 
 
     def _write(self, data):
@@ -235,17 +321,27 @@ class QWriter(object):
         self._write(data.values)
 
 
-    @serialize(QTable)
+    @serialize(QTable, QLazyTable)
     def _write_table(self, data):
         self._buffer.write(struct.pack('=bxb', QTABLE, QDICTIONARY))
         self._write(qlist(numpy.array(data.dtype.names), qtype = QSYMBOL_LIST))
         self._buffer.write(struct.pack('=bxi', QGENERAL_LIST, len(data.dtype)))
         for column in data.dtype.names:
-            self._write_list(data[column], data.meta[column])
+            self._write_list(data.column(column), data.meta[column])
 
 
-    @serialize(numpy.ndarray, QList, QTemporalList)
+    @serialize(QCompactSymbolList)
+    def _write_compact_symbol_list(self, data, qtype = None):
+        # symbols are already kept in q IPC representation
+        self._buffer.write(struct.pack('=bxi', QSYMBOL_LIST, len(data)))
+        self._buffer.write(memoryview(data.block))
+
+
+    @serialize(numpy.ndarray, QList, QTemporalList, QGUIDList)
     def _write_list(self, data, qtype = None):
+        if isinstance(data, QCompactSymbolList):
+            return self._write_compact_symbol_list(data)
+
         if qtype is not None:
             qtype = -abs(qtype)
 
@@ -266,16 +362,116 @@ class QWriter(object):
                 data = array_to_raw_qtemporal(data, qtype = qtype)
 
             if qtype == QSYMBOL:
-                for symbol in data:
-                    if symbol:
-                        self._buffer.write(symbol)
-                    self._buffer.write(b'\0')
+                self._buffer.write(self._encode_symbols(data))
             elif qtype == QGUID:
                 if self._protocol_version < 3:
                     raise QWriterException('kdb+ protocol version violation: Guid not supported pre kdb+ v3.0')
 
-                for guid in data:
-                    self._buffer.write(guid.bytes)
+                # uuid.UUID objects are converted to contiguous 16-byte representation
+                self._buffer.write(_raw_buffer(qlist(data, qtype = QGUID_LIST)))
             else:
-                self._buffer.write(data.tostring())
+                self._buffer.write(_raw_buffer(data))
+
+
+
+    def _encode_symbols(self, data):
+        # encodes symbols into a single block of NUL terminated strings, 
+        # symbols are cut at the first NUL regardless of the container
+        data = numpy.asarray(data)
+        count = len(data)
+
+        if count == 0:
+            return b''
+
+        if data.dtype.kind == 'O':
+            encoding = self._encoding
+            symbols = [symbol if isinstance(symbol, bytes) else symbol.encode(encoding) if symbol else b'' for symbol in data.tolist()]
+            block = b'\0'.join(symbols) + b'\0'
+            if block.count(b'\0') != count:
+                block = b'\0'.join([symbol.partition(b'\0')[0] for symbol in symbols]) + b'\0'
+            return block
+
+        matrix = None
+        if data.dtype.kind == 'U':
+            codes = numpy.ascontiguousarray(data).view(numpy.dtype(numpy.uint32).newbyteorder(data.dtype.byteorder)).reshape(count, -1)
+            if codes.max() < 128 and u'\x7f'.encode(self._encoding) == b'\x7f':
+                matrix = codes
+            else:
+                data = numpy.char.encode(data, self._encoding)
+
+        if matrix is None:
+            matrix = numpy.ascontiguousarray(data).view(numpy.uint8).reshape(count, data.dtype.itemsize)
+
+        # rows are processed in chunks to bound the size of temporary arrays
+        step = max(1, _SYMBOLS_CHUNK // (matrix.shape[1] + 1))
+        return b''.join([_terminate_symbols(matrix[start : start + step]) for start in range(0, count, step)])
+
+
+
+    class GatherBuffer(object):
+        '''
+        Utility class collecting serialized message as a list of buffers.
+        
+        Small writes are accumulated in memory, while large buffers (e.g. 
+        `memoryview` over vector data) are only referenced, so that the message
+        can be sent with a single vectored write without being copied.
+        
+        :Parameters:
+         - `threshold` (`integer`) - minimal size of the referenced buffer
+        '''
+
+        def __init__(self, threshold = 1 << 16):
+            self._threshold = threshold
+            self._chunks = []
+            self._pending = BytesIO()
+            self._size = 0
+
+
+        def write(self, data):
+            '''
+            Appends data to the buffer.
+            
+            :Parameters:
+             - `data` (`bytes` or `memoryview`) - data to be written
+            '''
+            size = len(data)
+
+            if size >= self._threshold:
+                self._flush()
+                self._chunks.append(data)
+            else:
+                self._pending.write(data)
+
+            self._size += size
+
+
+        def tell(self):
+            '''
+            Gets the number of bytes written to the buffer.
+            
+            :returns: size of the buffered data
+            '''
+            return self._size
+
+
+        def chunks(self):
+            '''
+            Gets the buffered data.
+            
+            :returns: list of `bytes` and `memoryview` objects
+            '''
+            self._flush()
+            return self._chunks
+
+
+        def _flush(self):
+            if self._pending.tell():
+                self._chunks.append(self._pending.getvalue())
+                self._pending = BytesIO()
+
+
+
+def _raw_buffer(array):
+    # byte view over the array data, contiguous arrays are not copied
+    return memoryview(numpy.ascontiguousarray(array).view(numpy.uint8))
 
@@ -14,57 +14,227 @@
 #
 
 import numpy
+import struct
 
 
 
 def uncompress(data, uncompressed_size):
-    _0 = numpy.intc(0)
-    _1 = numpy.intc(1)
-    _2 = numpy.intc(2)
-    _128 = numpy.intc(128)
-    _255 = numpy.intc(255)
+    '''
+    Decompresses q IPC message payload.
+    
+    :Parameters:
+     - `data` (bytes-like) - compressed payload (without message header and 
+       uncompressed size)
+     - `uncompressed_size` (`integer`) - size of the decompressed payload
+    
+    :returns: `bytearray` with decompressed payload
+    :raises: `ValueError` if compressed payload is malformed
+    '''
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
 
-    n, r, s, p = _0, _0, _0, _0
-    i, d = _1, _1
-    f = _255 & data[_0]
+    uncompressed_size = int(uncompressed_size)
+    if uncompressed_size <= 0:
+        raise ValueError('Invalid uncompressed size: %s' % uncompressed_size)
 
-    ptrs = numpy.zeros(256, dtype = numpy.intc)
-    uncompressed = numpy.zeros(uncompressed_size, dtype = numpy.uint8)
-    idx = numpy.arange(uncompressed_size, dtype = numpy.intc)
+    data_size = len(data)
+    ptrs = [0] * 256
+    uncompressed = bytearray(uncompressed_size)
 
-    while s < uncompressed_size:
-        pp = p + _1
+    try:
+        s, p = 0, 0
+        i, d = 1, 1
+        f = data[0]
 
-        if f & i:
-            r = ptrs[data[d]]
-            n = _2 + data[d + _1]
-            uncompressed[idx[s:s + n]] = uncompressed[r:r + n]
+        while s < uncompressed_size:
+            pp = p + 1
 
-            ptrs[(uncompressed[p]) ^ (uncompressed[pp])] = p
-            if s == pp:
-                ptrs[(uncompressed[pp]) ^ (uncompressed[pp + _1])] = pp
+            if f & i:
+                r = ptrs[data[d]]
+                n = 2 + data[d + 1]
 
-            d += _2
-            r += _2
-            s = s + n
-            p = s
+                if r >= s or s + n > uncompressed_size:
+                    raise ValueError('Malformed compressed data')
 
-        else:
-            uncompressed[s] = data[d]
+                # back-references may overlap the output, copy forward in chunks
+                # no longer than the distance between source and destination
+                t, e = s, s + n
+                while t < e:
+                    m = min(e - t, t - r)
+                    uncompressed[t:t + m] = uncompressed[r:r + m]
+                    r += m
+                    t += m
 
-            if pp == s:
-                ptrs[(uncompressed[p]) ^ (uncompressed[pp])] = p
-                p = pp
+                ptrs[uncompressed[p] ^ uncompressed[pp]] = p
+                if s == pp:
+                    ptrs[uncompressed[pp] ^ uncompressed[pp + 1]] = pp
 
-            s += _1
-            d += _1
+                d += 2
+                s = e
+                p = s
 
-        if i == _128:
-            if s < uncompressed_size:
-                f = _255 & data[d]
-                d += _1
-                i = _1
-        else:
-            i += i
+            else:
+                uncompressed[s] = data[d]
+
+                if pp == s:
+                    ptrs[uncompressed[p] ^ uncompressed[pp]] = p
+                    p = pp
+
+                s += 1
+                d += 1
+
+            if i == 128:
+                if s < uncompressed_size:
+                    f = data[d]
+                    d += 1
+                    i = 1
+            else:
+                i += i
+    except IndexError:
+        raise ValueError('Malformed compressed data')
 
     return uncompressed
+
+
+
+def compress(data):
+    '''
+    Compresses q IPC message payload.
+    
+    :Parameters:
+     - `data` (bytes-like) - payload to be compressed (without message header)
+    
+    :returns: `bytearray` with compressed payload or ``None`` if compressed 
+              payload would exceed half of the `data` size
+    '''
+    if not isinstance(data, bytearray):
+        data = bytearray(data)
+
+    t = len(data)
+    e = t // 2 - 17
+    if e < 0:
+        return None
+
+    # positions are stored with an offset of 1, 0 denotes an empty slot
+    ptrs = [0] * 256
+    compressed = bytearray()
+
+    i, c, f, s, s0, h0, h = 0, -1, 0, 0, 0, 0, 0
+
+    while s < t:
+        if i == 0:
+            if len(compressed) > e:
+                return None
+
+            if c >= 0:
+                compressed[c] = f
+            c = len(compressed)
+            compressed.append(0)
+            f = 0
+            i = 1
+
+        literal = s > t - 3
+        if not literal:
+            h = data[s] ^ data[s + 1]
+            p = ptrs[h] - 1
+            literal = p < 0 or data[s] != data[p]
+
+        if s0 > 0:
+            ptrs[h0] = s0
+            s0 = 0
+
+        if literal:
+            h0 = h
+            s0 = s + 1
+            compressed.append(data[s])
+            s += 1
+        else:
+            ptrs[h] = s + 1
+            f |= i
+            p += 2
+            s += 2
+            r = s
+
+            # binary search for the length of the match (up to 255 bytes)
+            lo, hi = 0, min(255, t - s)
+            while lo < hi:
+                m = (lo + hi + 1) // 2
+                if data[s:s + m] == data[p:p + m]:
+                    lo = m
+                else:
+                    hi = m - 1
+
+            s += lo
+            compressed.append(h)
+            compressed.append(s - r)
+
+        i = (i << 1) & 0xff
+
+    compressed[c] = f
+    return compressed
+
+
+
+def find_strings(data, count, little_endian):
+    '''
+    Locates `count` consecutive char vectors (or char atoms) in serialized 
+    data.
+    
+    :Parameters:
+     - `data` (bytes-like) - serialized data starting with the first vector
+     - `count` (`integer`) - number of vectors to be located
+     - `little_endian` (`boolean`) - byte order of the serialized data
+    
+    :returns: tuple of `numpy.array` of vectors offsets, `numpy.array` of 
+              vectors lengths and the size of scanned data or ``None`` if data 
+              doesn't consist of `count` char vectors
+    '''
+    data_size = len(data)
+    fmt = '<i' if little_endian else '>i'
+    starts = numpy.empty(count, dtype = numpy.int64)
+    lengths = numpy.empty(count, dtype = numpy.int64)
+
+    p = 0
+    for i in range(count):
+        qtype = struct.unpack_from('b', data, p)[0] if p < data_size else None
+
+        # char atom: type (-10), char
+        if qtype == -10 and p + 2 <= data_size:
+            starts[i] = p + 1
+            lengths[i] = 1
+            p += 2
+            continue
+
+        # char vector: type (10), attributes, 32-bit length, data
+        if qtype != 10 or p + 6 > data_size:
+            return None
+
+        n = struct.unpack_from(fmt, data, p + 2)[0]
+        if n < 0 or p + 6 + n > data_size:
+            return None
+
+        starts[i] = p + 6
+        lengths[i] = n
+        p += 6 + n
+
+    return starts, lengths, p
+
+
+
+def from_raw_temporals(raw, array, offset, null):
+    '''
+    Shifts raw q temporal values by the epoch `offset`, q nulls are mapped to
+    ``NaT``. `array` may share memory with `raw` (conversion in place).
+    
+    :Parameters:
+     - `raw` (`numpy.array` of `int32` or `int64`) - raw q temporal values
+     - `array` (`numpy.array` of `int64`) - output array
+     - `offset` (`integer`) - epoch offset
+     - `null` (`integer`) - raw q null value
+    '''
+    if len(array) != len(raw):
+        raise ValueError('Output array size doesn`t match the raw data')
+
+    mask = raw == null
+    numpy.add(raw, offset, out = array, casting = 'unsafe')
+    array[mask] = numpy.iinfo(numpy.int64).min
@@ -19,18 +19,17 @@ import numpy
 import random
 import threading
 import sys
-import time
 
 from qpython import qconnection
-from qpython.qcollection import qlist
+from qpython.qpublisher import QPublisher
 from qpython.qtype import QException, QTIME_LIST, QSYMBOL_LIST, QFLOAT_LIST
 
 
 class PublisherThread(threading.Thread):
 
-    def __init__(self, q):
+    def __init__(self, publisher):
         super(PublisherThread, self).__init__()
-        self.q = q
+        self.publisher = publisher
         self._stopper = threading.Event()
 
     def stop(self):
@@ -41,32 +40,26 @@ class PublisherThread(threading.Thread):
 
     def run(self):
         while not self.stopped():
-            print('.')
             try:
-                # publish data to tick
+                # rows are buffered and published to tick in batches
                 # function: .u.upd
                 # table: ask
-                self.q.sendSync('.u.upd', numpy.string_('ask'), self.get_ask_data())
+                self.publisher.publish('ask', self.get_ask_row())
 
-                time.sleep(1)
+                self._stopper.wait(0.001)
             except QException as e:
                 print(e)
             except:
                 self.stop()
 
-    def get_ask_data(self):
-        c = random.randint(1, 10)
-
+    def get_ask_row(self):
         today = numpy.datetime64(datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0))
 
-        time = [numpy.timedelta64((numpy.datetime64(datetime.datetime.now()) - today), 'ms') for x in range(c)]
-        instr = ['instr_%d' % random.randint(1, 100) for x in range(c)]
-        src = ['qPython' for x in range(c)]
-        ask = [random.random() * random.randint(1, 100) for x in range(c)]
+        time = numpy.timedelta64((numpy.datetime64(datetime.datetime.now()) - today), 'ms')
+        instr = 'instr_%d' % random.randint(1, 100)
+        ask = random.random() * random.randint(1, 100)
 
-        data = [qlist(time, qtype=QTIME_LIST), qlist(instr, qtype=QSYMBOL_LIST), qlist(src, qtype=QSYMBOL_LIST), qlist(ask, qtype=QFLOAT_LIST)]
-        print(data)
-        return data
+        return (time, instr, 'qPython', ask)
 
 
 if __name__ == '__main__':
@@ -75,10 +68,18 @@ if __name__ == '__main__':
         print('IPC version: %s. Is connected: %s' % (q.protocol_version, q.is_connected()))
         print('Press <ENTER> to close application')
 
-        t = PublisherThread(q)
-        t.start()
+        # buffered rows are sent once 1000 rows are collected or after 100 ms
+        with QPublisher(q, max_rows=1000, max_latency=0.1) as publisher:
+            publisher.register('ask', ['time', 'instr', 'src', 'ask'], [QTIME_LIST, QSYMBOL_LIST, QSYMBOL_LIST, QFLOAT_LIST])
+
+            t = PublisherThread(publisher)
+            t.start()
+
+            sys.stdin.readline()
 
-        sys.stdin.readline()
+            t.stop()
+            t.join()
 
-        t.stop()
-        t.join()
+            # waits until tick processes all published rows
+            publisher.flush(barrier=True)
+            print(publisher.stats())
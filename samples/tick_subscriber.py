@@ -15,64 +15,49 @@
 # 
 
 import numpy
-import threading
 import sys
 
 from qpython import qconnection
-from qpython.qtype import QException
-from qpython.qconnection import MessageType
 from qpython.qcollection import QTable
+from qpython.qreader import QSymbolCache
+from qpython.qsubscriber import QSubscriber, BackpressurePolicy
 
 
-class ListenerThread(threading.Thread):
-    
-    def __init__(self, q):
-        super(ListenerThread, self).__init__()
-        self.q = q
-        self._stopper = threading.Event()
+def on_trade(table, updates):
+    # updates queued since the last dispatch are delivered in a single batch
+    for data in updates:
+        for row in data:
+            print('%s: %s' % (table, row))
 
-    def stopit(self):
-        self._stopper.set()
 
-    def stopped(self):
-        return self._stopper.is_set()
-
-    def run(self):
-        while not self.stopped():
-            print('.')
-            try:
-                message = self.q.receive(data_only = False, raw = False) # retrieve entire message
-                
-                if message.type != MessageType.ASYNC:
-                    print('Unexpected message, expected message of type: ASYNC')
-                    
-                print('type: %s, message type: %s, data size: %s, is_compressed: %s ' % (type(message), message.type, message.size, message.is_compressed))
-                
-                if isinstance(message.data, list):
-                    # unpack upd message
-                    if len(message.data) == 3 and message.data[0] == b'upd' and isinstance(message.data[2], QTable):
-                        for row in message.data[2]:
-                            print(row)
-                
-            except QException as e:
-                print(e)
+def on_error(exc_info):
+    print('Error: %s' % exc_info[1])
 
 
 if __name__ == '__main__':
-    with qconnection.QConnection(host = 'localhost', port = 17010) as q:
-        print(q)
-        print('IPC version: %s. Is connected: %s' % (q.protocol_version, q.is_connected()))
-        print('Press <ENTER> to close application')
+    # symbols repeated in consecutive updates are interned instead of being re-created
+    cache = QSymbolCache(capacity = 16384)
+
+    q = qconnection.QConnection(host = 'localhost', port = 17010, symbol_cache = cache)
+    q.open()
+
+    print(q)
+    print('IPC version: %s. Is connected: %s' % (q.protocol_version, q.is_connected()))
+    print('Press <ENTER> to close application')
 
-        # subscribe to tick
-        response = q.sendSync('.u.sub', numpy.string_('trade'), numpy.string_(''))
-        # get table model 
-        if isinstance(response[1], QTable):
-            print('%s table data model: %s' % (response[0], response[1].dtype))
+    # subscribe to tick
+    response = q.sendSync('.u.sub', numpy.string_('trade'), numpy.string_(''))
+    # get table model 
+    if isinstance(response[1], QTable):
+        print('%s table data model: %s' % (response[0], response[1].dtype))
 
-        t = ListenerThread(q)
-        t.start()
-        
+    # subscriber reads the socket in background, updates are dispatched by another thread,
+    # so slow processing doesn't stall the tickerplant
+    subscriber = QSubscriber(q, queue_size = 100000, policy = BackpressurePolicy.SPILL, error_callback = on_error)
+    subscriber.on('trade', on_trade)
+
+    with subscriber:
         sys.stdin.readline()
-        
-        t.stopit()
+
+    print('Subscriber: %s' % subscriber.stats())
+    print('Symbol cache: %s hits, %s misses' % (cache.hits, cache.misses))
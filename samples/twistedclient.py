@@ -14,92 +14,59 @@
 #  limitations under the License.
 #
 
-import struct
 import sys
 
 from twisted.internet.protocol import Protocol, ClientFactory
 
 from twisted.internet import reactor
 from qpython.qconnection import MessageType, QAuthenticationException
-from qpython.qreader import QReader
-from qpython.qwriter import QWriter, QWriterException
+from qpython.qprotocol import QProtocolParser, ProtocolState
 
 
 
 class IPCProtocol(Protocol):
 
-    class State(object):
-        UNKNOWN = -1
-        HANDSHAKE = 0
-        CONNECTED = 1
-
     def connectionMade(self):
-        self.state = IPCProtocol.State.UNKNOWN
-        self.credentials = self.factory.username + ':' + self.factory.password if self.factory.password else ''
-
-        self.transport.write(self.credentials + '\3\0')
+        if self.factory.fallback:
+            # q service closed the connection during the handshake, 
+            # handshake is retried with the fallback request
+            self.parser, handshake = self.factory.fallback
+            self.factory.fallback = None
+        else:
+            self.parser = QProtocolParser(self.factory.username, self.factory.password, numpy_temporals = True)
+            handshake = self.parser.handshake()
 
-        self._message = None
+        self.transport.write(handshake)
 
     def dataReceived(self, data):
-        if self.state == IPCProtocol.State.CONNECTED:
+        connected = self.parser.state == ProtocolState.CONNECTED
+        self.parser.feed(data)
+
+        if not connected:
+            self.protocol_version = self.parser.protocol_version
+            self.factory.clientReady(self)
+
+        while True:
             try:
-                if not self._message:
-                    self._message = self._reader.read_header(source=data)
-                    self._buffer = ''
-
-                self._buffer += data
-                buffer_len = len(self._buffer) if self._buffer else 0
-
-                while self._message and self._message.size <= buffer_len:
-                    complete_message = self._buffer[:self._message.size]
-
-                    if buffer_len > self._message.size:
-                        self._buffer = self._buffer[self._message.size:]
-                        buffer_len = len(self._buffer) if self._buffer else 0
-                        self._message = self._reader.read_header(source=self._buffer)
-                    else:
-                        self._message = None
-                        self._buffer = ''
-                        buffer_len = 0
-
-                    self.factory.onMessage(self._reader.read(source=complete_message, numpy_temporals=True))
+                message = self.parser.next_message()
             except:
                 self.factory.onError(sys.exc_info())
-                self._message = None
-                self._buffer = ''
+                continue
 
-        elif self.state == IPCProtocol.State.UNKNOWN:
-            # handshake
-            if len(data) == 1:
-                self._init(data)
-            else:
-                self.state = IPCProtocol.State.HANDSHAKE
-                self.transport.write(self.credentials + '\0')
+            if message is None:
+                break
+            self.factory.onMessage(message)
 
-        else:
-            # protocol version fallback
-            if len(data) == 1:
-                self._init(data)
-            else:
-                raise QAuthenticationException('Connection denied.')
-
-    def _init(self, data):
-        self.state = IPCProtocol.State.CONNECTED
-        self.protocol_version = min(struct.unpack('B', data)[0], 3)
-        self._writer = QWriter(stream=None, protocol_version=self.protocol_version)
-        self._reader = QReader(stream=None)
-
-        self.factory.clientReady(self)
+    def connectionLost(self, reason):
+        try:
+            retry = self.parser.connection_lost()
+            if retry:
+                self.factory.fallback = (self.parser, retry)
+        except QAuthenticationException:
+            self.factory.onError(sys.exc_info())
 
     def query(self, msg_type, query, *parameters):
-        if parameters and len(parameters) > 8:
-            raise QWriterException('Too many parameters.')
-
-        if not parameters or len(parameters) == 0:
-            self.transport.write(self._writer.write(query, msg_type))
-        else:
-            self.transport.write(self._writer.write([query] + list(parameters), msg_type))
+        self.transport.write(self.parser.query(msg_type, query, *parameters))
 
 
 
@@ -111,6 +78,7 @@ class IPCClientFactory(ClientFactory):
         self.username = username
         self.password = password
         self.client = None
+        self.fallback = None
 
         # register callbacks
         self.connect_success_callback = connect_success_callback
@@ -120,6 +88,11 @@ class IPCClientFactory(ClientFactory):
 
 
     def clientConnectionLost(self, connector, reason):
+        if self.fallback:
+            # reconnect to send the fallback handshake
+            connector.connect()
+            return
+
         print('Lost connection.  Reason: %s' % reason)
         # connector.connect()
 
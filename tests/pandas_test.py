@@ -24,7 +24,9 @@ except ImportError:
 
 from collections import OrderedDict
 from qpython import MetaData
+from qpython import _pandas
 from qpython._pandas import PandasQReader, PandasQWriter
+from qpython.qreader import QReaderException
 from qpython.qtype import *  # @UnusedWildImport
 from qpython.qcollection import qlist, QList, QTemporalList, QDictionary
 from qpython.qtemporal import QTemporal
@@ -296,6 +298,136 @@ try:
                 print('.')
 
 
+    def test_reading_pandas_columns():
+        print('Deserialization (pandas, column projection)')
+        for query, value in iter(PANDAS_EXPRESSIONS.items()):
+            if not isinstance(value, dict) or not isinstance(value['data'], pandas.DataFrame) or 'index' in value:
+                continue
+
+            binary = binascii.unhexlify(BINARY[query])
+            sys.stdout.write('  %-75s' % query)
+
+            columns = list(value['data'].columns[-1:])
+            result = PandasQReader(None).read(source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary, pandas = True, columns = columns).data
+            assert list(result.columns) == columns, 'deserialization failed: %s, expected: %s actual: %s' % (query, columns, list(result.columns))
+            assert compare(value['data'][columns], result), 'deserialization failed: %s, expected: %s actual: %s' % (query, value['data'][columns], result)
+            print('.')
+
+
+    def test_pandas_categorical_symbols():
+        print('Deserialization/serialization (pandas, categorical symbols)')
+        w = PandasQWriter(None, 3)
+        for query, value in iter(PANDAS_EXPRESSIONS.items()):
+            if not isinstance(value, dict) or 'index' in value or QSYMBOL_LIST not in value['meta'].as_dict().values():
+                continue
+
+            binary = binascii.unhexlify(BINARY[query])
+            sys.stdout.write('  %-75s' % query)
+
+            result = PandasQReader(None).read(source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary, pandas = True, categorical_symbols = True).data
+            expected = value['data']
+            if isinstance(result, pandas.Series):
+                result, expected = pandas.DataFrame({'x': result}), pandas.DataFrame({'x': expected})
+
+            for column in result.columns:
+                if result.meta[column] == QSYMBOL_LIST if hasattr(result, 'meta') else True:
+                    assert pandas.api.types.is_categorical_dtype(result[column].dtype), 'deserialization failed: %s' % query
+                    assert list(result[column].astype(object)) == list(expected[column]), 'deserialization failed: %s, expected: %s actual: %s' % (query, expected[column], result[column])
+
+            result = PandasQReader(None).read(source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary, pandas = True, categorical_symbols = True).data
+            single_char_strings = value['single_char_strings'] if 'single_char_strings' in value else False
+            serialized = binascii.hexlify(w.write(result, 1, single_char_strings = single_char_strings, pandas = True))[16:].lower()
+            assert serialized == BINARY[query].lower(), 'serialization failed: %s, expected: %s actual: %s' % (query, BINARY[query].lower(), serialized)
+            print('.')
+
+        categorical = pandas.Series(pandas.Categorical([b'quick', None, u'fox', b'quick']))
+        assert w.write(categorical, 1) == w.write(qlist([b'quick', b'', b'fox', b'quick'], qtype = QSYMBOL_LIST), 1)
+        categorical = pandas.Series(pandas.Categorical([1, 2, 1]))
+        assert w.write(categorical, 1) == w.write(qlist([1, 2, 1], qtype = QLONG_LIST), 1)
+
+        # symbols longer than 8 bytes are factorized without fixed width representation
+        symbols = [b'a', b'Beeblebrox Zaphod', b'', b'Beeblebrox Zaphod', b'Prefect Ford', b'a']
+        binary = w.write(qlist(symbols, qtype = QSYMBOL_LIST), 1)
+        result = PandasQReader(None).read(source = binary, pandas = True, categorical_symbols = True).data
+        assert pandas.api.types.is_categorical_dtype(result.dtype)
+        assert list(result.astype(object)) == symbols
+        assert sorted(result.cat.categories) == sorted(set(symbols))
+        assert w.write(result, 1) == binary
+
+        categorical = pandas.Series(pandas.Categorical([u'Prefect Ford', None, b'Beeblebrox Zaphod', u'Prefect Ford']))
+        assert w.write(categorical, 1) == w.write(qlist([b'Prefect Ford', b'', b'Beeblebrox Zaphod', b'Prefect Ford'], qtype = QSYMBOL_LIST), 1)
+        assert w.write(pandas.Series(pandas.Categorical([], categories = [b'fox'])), 1) == w.write(qlist([], qtype = QSYMBOL_LIST), 1)
+
+
+    def test_pandas_nullable_dtypes():
+        print('Deserialization/serialization (pandas, nullable dtypes)')
+        w = PandasQWriter(None, 3)
+        for data, qtype, dtype in ((numpy.array([1, qnull(QBYTE), 3], dtype = numpy.int8), QBYTE_LIST, 'Int8'),
+                                   (numpy.array([1, 0, 3], dtype = numpy.int8), QBYTE_LIST, 'Int8'),
+                                   (numpy.array([1, qnull(QSHORT), 3], dtype = numpy.int16), QSHORT_LIST, 'Int16'),
+                                   (numpy.array([qnull(QINT), 2, 3], dtype = numpy.int32), QINT_LIST, 'Int32'),
+                                   (numpy.array([1, 2, qnull(QLONG)], dtype = numpy.int64), QLONG_LIST, 'Int64'),
+                                   (numpy.array([1, 2, 3], dtype = numpy.int64), QLONG_LIST, 'Int64')):
+            binary = w.write(qlist(data, qtype = qtype), 1)
+            sys.stdout.write('  %-75s' % data)
+
+            result = PandasQReader(None).read(source = binary, pandas = True).data
+            mask = data == qnull(-qtype)
+            assert result.dtype == (numpy.float64 if mask.any() else data.dtype), 'deserialization failed: %s' % result.dtype
+            assert list(result.isnull()) == list(mask)
+
+            try:
+                result = PandasQReader(None).read(source = binary, pandas = True, nullable_dtypes = True).data
+            except QReaderException:
+                # nullable integer arrays are not supported by installed pandas
+                assert _pandas.IntegerArray is None
+            else:
+                assert str(result.dtype) == dtype, 'deserialization failed: %s' % result.dtype
+                assert list(result.isnull()) == list(mask)
+                assert list(result[~mask]) == list(data[~mask])
+                assert w.write(result, 1, pandas = True) == binary
+            print('.')
+
+        binary = w.write(qlist(numpy.array([1.5, numpy.nan]), qtype = QDOUBLE_LIST), 1)
+        result = PandasQReader(None).read(source = binary, pandas = True, nullable_dtypes = True).data
+        assert result.dtype == numpy.float64 and result.isnull().tolist() == [False, True]
+
+        binary = w.write(qlist(numpy.array([False, True, False]), qtype = QBOOL_LIST), 1)
+        for nullable_dtypes in (False, True):
+            result = PandasQReader(None).read(source = binary, pandas = True, nullable_dtypes = nullable_dtypes).data
+            assert result.dtype == numpy.bool_ and result.tolist() == [False, True, False]
+
+
+    def test_pandas_string_dtype():
+        print('Deserialization/serialization (pandas, string dtype)')
+        w = PandasQWriter(None, 3)
+        string_dtypes = [numpy.object_] + (['string'] if hasattr(pandas, 'StringDtype') else [])
+        for query, value in iter(PANDAS_EXPRESSIONS.items()):
+            if not isinstance(value, dict) or not isinstance(value['data'], pandas.DataFrame) or 'index' in value:
+                continue
+
+            columns = [column for column in value['data'].columns if value['meta'][column] in (QSTRING, QSTRING_LIST)
+                       and all(isinstance(element, (str, bytes, float)) for element in value['data'][column])]
+            if not columns:
+                continue
+
+            binary = binascii.unhexlify(BINARY[query])
+            sys.stdout.write('  %-75s' % query)
+
+            for string_dtype in string_dtypes:
+                result = PandasQReader(None).read(source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary, pandas = True, string_dtype = string_dtype).data
+                for column in columns:
+                    expected = [None if pandas.isnull(element) or element in (b' ', ' ') else element.decode() if isinstance(element, bytes) else element for element in value['data'][column]]
+                    actual = [None if pandas.isnull(element) else element for element in result[column]]
+                    assert str(result[column].dtype) == str(pandas.Series([], dtype = string_dtype).dtype), 'deserialization failed: %s, %s' % (query, result[column].dtype)
+                    assert actual == expected, 'deserialization failed: %s, expected: %s actual: %s' % (query, expected, actual)
+
+                single_char_strings = value['single_char_strings'] if 'single_char_strings' in value else False
+                serialized = binascii.hexlify(w.write(result, 1, single_char_strings = single_char_strings, pandas = True))[16:].lower()
+                assert serialized == BINARY[query].lower(), 'serialization failed: %s, expected: %s actual: %s' % (query, BINARY[query].lower(), serialized)
+            print('.')
+
+
     def test_writing_pandas():
         w = PandasQWriter(None, 3)
 
@@ -337,6 +469,10 @@ try:
 
     init()
     test_reading_pandas()
+    test_reading_pandas_columns()
+    test_pandas_categorical_symbols()
+    test_pandas_nullable_dtypes()
+    test_pandas_string_dtype()
     test_writing_pandas()
 except ImportError:
     pandas = None
@@ -0,0 +1,170 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import asyncio
+import numpy
+import os
+import socket
+import sys
+import tempfile
+
+from qpython import qasync
+from qpython.qconnection import MessageType
+from qpython.qreader import QReader, QReaderException
+from qpython.qwriter import QWriter
+from qpython.qtype import QException, QLONG_LIST
+from qpython.qcollection import qlist
+
+
+
+async def echo_server(reader, writer):
+    # handshake: credentials terminated with capability byte and NUL
+    await reader.readuntil(b'\0')
+    writer.write(b'\3')
+
+    q_reader = QReader(None)
+    q_writer = QWriter(None, 3)
+
+    try:
+        while True:
+            header = await reader.readexactly(8)
+            message = header + await reader.readexactly(q_reader.read_header(header).size - 8)
+            message = q_reader.read(message)
+            query = message.data
+
+            if message.type == MessageType.ASYNC:
+                writer.write(q_writer.write(query, MessageType.ASYNC))
+            elif isinstance(query, bytes) and query == b'error':
+                writer.write(q_writer.write(QException('type'), MessageType.RESPONSE))
+            else:
+                # sleep to interleave concurrent queries
+                await asyncio.sleep(0.001)
+                writer.write(q_writer.write(query, MessageType.RESPONSE))
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+
+async def run_queries():
+    server = await asyncio.start_server(echo_server, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        async with qasync.AsyncQConnection('127.0.0.1', port, timeout = 5, offload_threshold = 1024) as q:
+            assert q.is_connected()
+            assert q.protocol_version == 3
+
+            assert await q('til 10') == b'til 10'
+
+            # concurrent queries are answered in order
+            results = await asyncio.gather(*[q.sendSync('{x}', i) for i in range(20)])
+            assert [r[1] for r in results] == list(range(20))
+
+            try:
+                await q.sendSync('error')
+                assert False, 'expected QException'
+            except QException as e:
+                assert e.args[0] == b'type'
+
+            assert await q('{x}', 1) == [b'{x}', 1]
+
+            # large message parsed in executor
+            data = qlist(numpy.arange(100000), qtype = QLONG_LIST)
+            result = await q.sendSync('{x}', data)
+            assert numpy.array_equal(result[1], data)
+
+            q.sendAsync('{x}', 2)
+            await q.drain()
+            message = await q.receive(data_only = False)
+            assert message.type == MessageType.ASYNC
+            assert message.data == [b'{x}', 2]
+
+        assert not q.is_connected()
+
+        try:
+            await q.sendSync('til 10')
+            assert False, 'expected QConnectionException'
+        except qasync.QConnectionException:
+            pass
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+
+def test_async_connection():
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_queries())
+    finally:
+        loop.close()
+
+
+async def run_unix_queries(path):
+    server = await asyncio.start_unix_server(echo_server, path)
+
+    try:
+        async with qasync.AsyncQConnection('unix://' + path, None, timeout = 5) as q:
+            assert str(q) == ':unix://' + path
+            assert q.protocol_version == 3
+            assert await q('til 10') == b'til 10'
+
+            results = await asyncio.gather(*[q.sendSync('{x}', i) for i in range(20)])
+            assert [r[1] for r in results] == list(range(20))
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def run_abstract_queries(port):
+    # kdb+ on Linux listens on socket in the abstract namespace
+    try:
+        server = await asyncio.start_unix_server(echo_server, '\0/tmp/kx.%s' % port)
+    except OSError:
+        # socket is used by a running kdb+ process
+        return
+
+    try:
+        async with qasync.AsyncQConnection('unix://', port, timeout = 5) as q:
+            assert str(q) == ':unix://%s' % port
+            assert await q('til 10') == b'til 10'
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+
+def test_async_unix_socket():
+    if not hasattr(socket, 'AF_UNIX'):
+        return
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'q.sock')
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_unix_queries(path))
+        if sys.platform.startswith('linux'):
+            loop.run_until_complete(run_abstract_queries(40000 + os.getpid() % 20000))
+    finally:
+        loop.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(directory)
+
+
+
+test_async_connection()
+test_async_unix_socket()
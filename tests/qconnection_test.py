@@ -0,0 +1,509 @@
+#
+#  Copyright (c) 2011-2014 Exxeleron GmbH
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import numpy
+import os
+import pytest
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from qpython import qconnection, qpool
+from qpython.qcollection import qlist
+from qpython.qpublisher import QPublisher
+from qpython.qsubscriber import QSubscriber, BackpressurePolicy
+from qpython.qconnection import MessageType, QConnectionException
+from qpython.qreader import QReader, QReaderException
+from qpython.qwriter import QWriter
+from qpython.qtype import *  # @UnusedWildImport
+
+
+
+def echo(message, client):
+    if message.data == b'error':
+        raise QException('type')
+    elif message.data == b'async':
+        # message sent to the client ahead of the response
+        QWriter(client, 3).write(b'async', MessageType.ASYNC)
+    return message.data
+
+
+
+class QServer(object):
+    '''Minimal q service: performs the handshake and passes received messages
+    to the handler. Value returned by the handler is sent back as response
+    to synchronous queries, :class:`.QException` raised by the handler is sent
+    as q error. By default, received data is echoed back. If `path` is set,
+    the server listens on the Unix domain socket.'''
+
+    def __init__(self, handler = None, path = None):
+        self.handler = handler if handler else echo
+        self.connections = 0
+        self.clients = []
+        self.path = path
+
+        if path:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.bind(path)
+            self.port = None
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._socket.bind(('127.0.0.1', 0))
+            self.port = self._socket.getsockname()[1]
+        self._socket.listen(16)
+
+        thread = threading.Thread(target = self._accept)
+        thread.daemon = True
+        thread.start()
+
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except socket.error:
+                return
+
+            self.connections += 1
+            self.clients.append(client)
+            thread = threading.Thread(target = self._serve, args = (client, ))
+            thread.daemon = True
+            thread.start()
+
+
+    def _serve(self, client):
+        credentials = b''
+        while not credentials.endswith(b'\0'):
+            credentials += client.recv(1)
+        client.sendall(b'\3')
+
+        reader = QReader(client)
+        writer = QWriter(client, 3)
+
+        try:
+            while True:
+                message = reader.read()
+
+                try:
+                    response = self.handler(message, client)
+                except QException as e:
+                    response = e
+
+                if message.type == MessageType.SYNC:
+                    writer.write(response, MessageType.RESPONSE)
+        except (socket.error, QReaderException, QException):
+            client.close()
+
+
+    def close(self):
+        try:
+            # wakes the thread blocked in accept, which keeps the socket open
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._socket.close()
+        if self.path and not self.path.startswith('\0') and os.path.exists(self.path):
+            os.remove(self.path)
+        for client in self.clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            client.close()
+
+
+
+def test_send_sync_many():
+    server = QServer()
+
+    try:
+        with qconnection.QConnection('127.0.0.1', server.port) as q:
+            queries = ['til 3', 'error', ('{x}', 1), ('{x+y}', 1, 2), ('til 10', )]
+            expected = [b'til 3', None, [b'{x}', 1], [b'{x+y}', 1, 2], b'til 10']
+
+            for window in (1, 2, 256):
+                results = q.sendSyncMany(queries, window = window, return_exceptions = True)
+                assert len(results) == len(expected)
+                for result, value in zip(results, expected):
+                    if value is None:
+                        assert isinstance(result, QException) and result.args == (b'type', )
+                    else:
+                        assert result == value
+
+            with pytest.raises(QException):
+                q.sendSyncMany(queries * 2, window = 3)
+            # remaining responses have been consumed
+            assert q.sendSync('til 10') == b'til 10'
+
+            assert q.sendSyncMany([]) == []
+            assert q.sendSyncMany(('{x}', i) for i in range(1000))[999] == [b'{x}', 999]
+
+            with pytest.raises(qconnection.QWriterException):
+                q.sendSyncMany([tuple(range(10))])
+
+            # connection is closed when responses cannot be matched with queries
+            with pytest.raises(QReaderException):
+                q.sendSyncMany(['til 3', 'async', 'til 5', 'til 6'], window = 4)
+            assert not q.is_connected()
+    finally:
+        server.close()
+
+
+def publish(updates):
+    '''Handler publishing updates to the client subscribing via .u.sub.'''
+    def handler(message, client):
+        def run():
+            # response to .u.sub is sent first
+            time.sleep(0.05)
+            writer = QWriter(client, 3)
+            for update in updates:
+                writer.write(update, MessageType.ASYNC)
+
+        if message.data[0] == b'.u.sub':
+            thread = threading.Thread(target = run)
+            thread.daemon = True
+            thread.start()
+        return message.data[1]
+    return handler
+
+
+
+def test_subscriber():
+    updates = []
+    for i in range(200):
+        table = numpy.string_('trade' if i % 4 else 'quote')
+        updates.append([numpy.string_('upd'), table, qlist(numpy.array([i]), qtype = QLONG_LIST)])
+    updates.append(b'end')
+
+    for policy in (BackpressurePolicy.BLOCK, BackpressurePolicy.DROP_OLDEST, BackpressurePolicy.SPILL):
+        server = QServer(publish(updates))
+        received = {'trade': [], 'quote': []}
+        others = []
+        batches = []
+        release = threading.Event()
+
+        def on_update(table, data):
+            # slow consumer, blocks until all updates are received
+            release.wait()
+            batches.append(len(data))
+            received[table].extend(int(x[0]) for x in data)
+
+        try:
+            q = qconnection.QConnection('127.0.0.1', server.port)
+            q.open()
+            assert q.sendSync('.u.sub', numpy.string_('trade'), numpy.string_('')) == b'trade'
+
+            subscriber = QSubscriber(q, queue_size = 10, policy = policy, batch_size = 50, default_callback = lambda message: others.append(message.data))
+            subscriber.on('trade', on_update)
+            subscriber.on(b'quote', on_update)
+
+            with subscriber:
+                for _ in range(500):
+                    if subscriber.stats().received == len(updates) or (policy == BackpressurePolicy.BLOCK and subscriber.stats().received >= 10):
+                        break
+                    time.sleep(0.01)
+                release.set()
+
+                for _ in range(500):
+                    if others:
+                        break
+                    time.sleep(0.01)
+
+            stats = subscriber.stats()
+            assert not q.is_connected() and not subscriber.is_running()
+            assert subscriber.error is None
+            assert others == [b'end']
+            assert stats.received == len(updates) and stats.queue_depth == 0
+            assert stats.dispatched + stats.dropped == len(updates)
+            assert stats.max_queue_depth <= 10
+            assert stats.lag > 0 and stats.max_lag >= stats.lag
+            assert stats.errors == 0
+            assert max(batches) <= 50
+
+            # updates of the tables are dispatched in order
+            trades = [i for i in range(200) if i % 4]
+            quotes = [i for i in range(200) if not i % 4]
+            if policy == BackpressurePolicy.DROP_OLDEST:
+                assert stats.dropped > 0
+                assert received['trade'] == sorted(received['trade']) and received['trade'][-1] == trades[-1]
+                assert len(received['trade']) + len(received['quote']) + stats.dropped == 200
+            else:
+                assert stats.dropped == 0
+                assert received['trade'] == trades and received['quote'] == quotes
+                assert (stats.spilled > 0) == (policy == BackpressurePolicy.SPILL)
+        finally:
+            release.set()
+            server.close()
+
+
+
+def test_publisher():
+    received = []
+    def record(message, client):
+        received.append(message.data)
+        return message.data
+
+    server = QServer(record)
+    try:
+        q = qconnection.QConnection('127.0.0.1', server.port)
+        q.open()
+
+        publisher = QPublisher(q, max_rows = 10, max_bytes = None, max_latency = None)
+        publisher.register('trade', ['time', 'sym', 'price', 'size', 'cond'], [QTIMESPAN_LIST, QSYMBOL_LIST, QDOUBLE_LIST, QLONG, QSTRING], capacity = 4)
+
+        with pytest.raises(ValueError):
+            publisher.publish('quote', (1, ))
+        with pytest.raises(ValueError):
+            publisher.publish('trade', (1, ))
+
+        for i in range(15):
+            publisher.publish('trade', (numpy.timedelta64(i, 'ms'), 'AAPL' if i % 2 else b'MSFT', i + 0.5, i, b'A'))
+
+        # invalid rows are rejected, buffered rows are retained
+        for row in [(numpy.timedelta64(99, 'ms'), 'IBM', 'bad', 99, b'A'),
+                    (numpy.timedelta64(99, 'ms'), 5, 1.0, 99, b'A'),
+                    (numpy.timedelta64(99, 'ms'), 'IBM', 1.0, 100.7, b'A'),
+                    (numpy.timedelta64(99, 'ms'), 'IBM', 1.0, 2 ** 70, b'A'),
+                    (numpy.timedelta64(99, 'ms'), 'IBM', 1.0, 99, b'AB')]:
+            with pytest.raises(TypeError):
+                publisher.publish('trade', row)
+        with pytest.raises(TypeError):
+            publisher.publish_columns('trade', [numpy.arange(2).astype('timedelta64[ms]'), ['IBM'] * 2, [1.0, 2.0], [1.5, 2.5], [b'B'] * 2])
+        with pytest.raises(TypeError):
+            publisher.publish_columns('trade', [numpy.arange(2).astype('timedelta64[ms]'), ['IBM', None], [1.0, 2.0], [1, 2], [b'B'] * 2])
+        assert publisher.stats().buffered == 5 and publisher.stats().published == 15
+        publisher.publish_columns('trade', [numpy.arange(15, 19).astype('timedelta64[ms]'), ['IBM'] * 4, numpy.arange(15, 19) + 0.5, numpy.arange(15, 19), [b'B'] * 4])
+        assert publisher.stats().buffered == 9
+        publisher.publish_columns('trade', [[], [], [], [], []])
+
+        publisher.flush(barrier = True)
+        assert received[-1] == b'::'
+        updates = received[:-1]
+        assert [len(update[2][0]) for update in updates] == [10, 9]
+        for update in updates:
+            assert update[0] == b'.u.upd' and update[1] == b'trade'
+
+        times, sym, price, size = [numpy.concatenate([update[2][i] for update in updates]) for i in range(4)]
+        cond = b''.join(update[2][4] for update in updates)
+        assert (times == numpy.arange(19) * 1000000).all()
+        assert list(sym) == [b'AAPL' if i % 2 else b'MSFT' for i in range(15)] + [b'IBM'] * 4
+        assert (price == numpy.arange(19) + 0.5).all() and (size == numpy.arange(19)).all()
+        assert cond == b'A' * 15 + b'B' * 4
+
+        stats = publisher.stats()
+        assert stats.published == stats.flushed == 19 and stats.messages == 2 and stats.buffered == 0
+        assert stats.bytes == 19 * (8 + 8 + 8 + 1) + 15 * 5 + 4 * 4
+
+        # size and latency thresholds
+        del received[:]
+        with QPublisher(q, max_rows = None, max_bytes = 80, max_latency = 0.05) as publisher:
+            publisher.register('quote', ['sym', 'bid'], [QSYMBOL_LIST, QFLOAT_LIST])
+            for i in range(12):
+                publisher.publish('quote', ('ABC', i))
+            assert publisher.stats().messages >= 1
+            for _ in range(100):
+                if publisher.stats().buffered == 0:
+                    break
+                time.sleep(0.01)
+            assert publisher.stats().messages == 2
+            publisher.publish('quote', ('XYZ', 12))
+
+        assert q.sendSync('::') == b'::'
+        assert [len(update[2][0]) for update in received[:-1]] == [10, 2, 1]
+        assert list(numpy.concatenate([update[2][1] for update in received[:-1]])) == list(range(13))
+
+        # data is retained when sending fails
+        class Failing(object):
+            def sendAsync(self, *parameters, **options):
+                raise socket.error('connection reset')
+
+        publisher = QPublisher(Failing(), max_rows = None, max_latency = None)
+        publisher.register('quote', ['sym', 'bid'], [QSYMBOL_LIST, QFLOAT_LIST])
+        publisher.publish('quote', ('ABC', 1))
+        with pytest.raises(socket.error):
+            publisher.flush()
+        assert publisher.stats().buffered == 1 and publisher.stats().flushed == 0
+
+        # failure of threshold flush is reported by the next call, the row
+        # causing the flush is accepted
+        publisher.max_rows = 2
+        publisher.publish('quote', ('DEF', 2))
+        assert publisher.stats().buffered == 2 and publisher.stats().published == 2
+        with pytest.raises(socket.error):
+            publisher.publish('quote', ('GHI', 3))
+        assert publisher.stats().buffered == 2 and publisher.stats().published == 2
+
+        del received[:]
+        publisher._connection = q
+        publisher.flush(barrier = True)
+        assert received[0][2][0] == [b'ABC', b'DEF'] and publisher.stats().buffered == 0
+
+        # guid and general columns
+        del received[:]
+        guids = [uuid.uuid4() for _ in range(3)]
+        publisher = QPublisher(q, max_rows = None, max_latency = None)
+        publisher.register('order', ['id', 'text', 'flag'], [QGUID_LIST, QGENERAL_LIST, QBOOL_LIST])
+        publisher.publish('order', (guids[0], b'new', True))
+        publisher.publish_columns('order', [guids[1:], [b'fill', (b'a', 1)], numpy.array([0, 1])])
+        for row in [(str(guids[0]), b'new', True), (guids[0], object(), True), (guids[0], b'new', 2)]:
+            with pytest.raises(TypeError):
+                publisher.publish('order', row)
+        publisher.flush(barrier = True)
+        update = received[0][2]
+        assert list(update[0]) == guids and update[1] == [b'new', b'fill', [b'a', 1]] and list(update[2]) == [True, False, True]
+    finally:
+        server.close()
+
+
+
+def test_connection_pool():
+    server = QServer()
+
+    try:
+        pool = qpool.QConnectionPool('127.0.0.1', server.port, min_size = 2, max_size = 3, checkout_timeout = 0.2, health_check_interval = 0)
+        pool.open()
+        assert server.connections == 2
+        assert pool.stats().size == 2 and pool.stats().idle == 2
+
+        with pool.connection() as q:
+            assert q.sendSync('til 10') == b'til 10'
+            assert pool.stats().in_use == 1
+
+        # q errors don't invalidate connection
+        with pytest.raises(QException):
+            with pool.connection() as q:
+                q.sendSync('error')
+        assert pool.stats().discarded == 0
+
+        # pool is exhausted
+        connections = [pool.checkout() for _ in range(3)]
+        assert server.connections == 3
+        with pytest.raises(QConnectionException):
+            pool.checkout()
+        assert pool.stats().timeouts == 1
+
+        # waiting thread receives checked in connection
+        def release():
+            time.sleep(0.05)
+            pool.checkin(connections[0])
+        thread = threading.Thread(target = release)
+        thread.start()
+        assert pool.checkout(timeout = 5) is connections[0]
+        thread.join()
+
+        # broken connection is discarded
+        pool.checkin(connections.pop())
+        with pytest.raises(socket.error):
+            with pool.connection() as q:
+                raise socket.error('connection reset')
+
+        for connection in connections:
+            pool.checkin(connection)
+        stats = pool.stats()
+        assert stats.discarded == 1 and stats.size == 2 and stats.idle == 2
+        assert stats.checkouts == 7
+        assert stats.wait_time >= 0.05 and stats.max_wait_time >= 0.05
+        assert 0 < stats.utilization <= 1
+
+        # connections closed by the remote side are replaced on checkout
+        server.close()
+        server = QServer()
+        pool.port = server.port
+        time.sleep(0.05)
+        with pool.connection() as q:
+            assert q.sendSync('til 10') == b'til 10'
+        assert pool.stats().discarded == 3 and server.connections == 1
+
+        pool.close()
+        with pytest.raises(QConnectionException):
+            pool.checkout()
+    finally:
+        server.close()
+
+
+def test_unix_socket():
+    if not hasattr(socket, 'AF_UNIX'):
+        return
+
+    # explicit path of the socket
+    path = os.path.join(tempfile.mkdtemp(), 'q.sock')
+    server = QServer(path = path)
+    try:
+        with qconnection.QConnection('unix://' + path, None) as q:
+            assert str(q) == ':unix://' + path
+            assert q.sendSync('til 10') == b'til 10'
+    finally:
+        server.close()
+        os.rmdir(os.path.dirname(path))
+
+    with pytest.raises(socket.error):
+        qconnection.QConnection('unix://' + path, None).open()
+
+    # kdb+ listens on /tmp/kx.<port>, on Linux in the abstract namespace
+    port = 40000 + os.getpid() % 20000
+    path = '/tmp/kx.%s' % port
+    if os.path.exists(path):
+        # never touch a socket which may belong to a running kdb+ process
+        return
+
+    if sys.platform.startswith('linux'):
+        try:
+            server = QServer(path = '\0' + path)
+        except socket.error:
+            # abstract socket is used by a running kdb+ process
+            return
+
+        try:
+            with qconnection.QConnection('unix://', port) as q:
+                assert q._connection.getpeername() in ('\0' + path, b'\0' + path.encode())
+                assert q.sendSync('til 10') == b'til 10'
+            assert server.connections == 1 and not os.path.exists(path)
+        finally:
+            server.close()
+
+    # socket file is used if abstract socket cannot be connected
+    server = QServer(path = path)
+    try:
+        for host in ('unix://', 'unix://%s' % port):
+            with qconnection.QConnection(host, port, username = 'user') as q:
+                assert q._connection.family == socket.AF_UNIX
+                assert q.protocol_version == 3
+                assert str(q) == 'user@:unix://%s' % port
+                assert q.sendSync('til 10') == b'til 10'
+                assert q.sendSync('{x}', numpy.arange(1000))[1].tolist() == list(range(1000))
+                with pytest.raises(QException):
+                    q.sendSync('error')
+
+        pool = qpool.QConnectionPool('unix://', port, min_size = 1, max_size = 2)
+        with pool:
+            with pool.connection() as q:
+                assert q.sendSync('til 3') == b'til 3'
+        assert str(pool).startswith('QConnectionPool: :unix://%s' % port)
+        assert server.connections == 3
+    finally:
+        server.close()
+
+
+
+test_connection_pool()
+test_send_sync_many()
+test_subscriber()
+test_publisher()
+test_unix_socket()
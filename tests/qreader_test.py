@@ -15,6 +15,8 @@
 #
 
 import binascii
+import pytest
+import socket
 import struct
 import sys
 try:
@@ -26,9 +28,10 @@ if sys.version > '3':
     long = int
 
 from collections import OrderedDict
-from qpython import qreader
+from qpython import qreader, qprotocol, utils
+from qpython.qconnection import QConnectionException, QAuthenticationException
 from qpython.qtype import *  # @UnusedWildImport
-from qpython.qcollection import qlist, QList, QTemporalList, QDictionary, qtable, QKeyedTable
+from qpython.qcollection import qlist, QList, QTemporalList, QDictionary, qtable, QTable, QLazyTable, QKeyedTable, QCompactSymbolList
 from qpython.qtemporal import qtemporal, QTemporal
 
 
@@ -414,6 +417,11 @@ def test_reading_compressed():
             stream_reader = qreader.QReader(buffer_)
             result = stream_reader.read().data
             assert compare(value, result), 'deserialization failed: %s' % (query)
+
+            frame = qreader.QReader(BytesIO(buffer_.getvalue())).read_frame()
+            assert frame == buffer_.getvalue()
+            result = buffer_reader.read(frame).data
+            assert compare(value, result), 'deserialization failed: %s' % (query)
             print('.')
         except QException as e:
             assert isinstance(value, QException)
@@ -422,6 +430,470 @@ def test_reading_compressed():
 
 
 
+def test_reading_zero_copy():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    print('Zero-copy deserialization')
+    buffer_reader = qreader.QReader(None)
+    for query in (b'1 2 3', b'3.23 6.46', b'2001.01.01 2000.05.01 0Nd'):
+        binary = binascii.unhexlify(BINARY[query])
+        source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary
+
+        sys.stdout.write( '  %-75s' % query )
+        result = buffer_reader.read(source = source).data
+
+        base = result
+        while not isinstance(base, memoryview):
+            base = base.base
+        assert base.obj is source, 'vector is not backed by message buffer: %s' % (query)
+        print('.')
+
+
+
+def test_reading_source_unmodified():
+    print('Deserialization (caller buffer is not modified)')
+    buffer_reader = qreader.QReader(None)
+
+    # big-endian int vector
+    body = struct.pack('>bbi3i', QINT_LIST, 0, 3, 1, 2, 3)
+    source = bytearray(b'\0\1\0\0' + struct.pack('>i', len(body) + 8) + body)
+    original = bytes(source)
+    for _ in range(2):
+        assert buffer_reader.read(source).data.tolist() == [1, 2, 3]
+    assert bytes(source) == original
+
+    # timestamp vector converted to numpy representation
+    body = struct.pack('<bbi2q', QTIMESTAMP_LIST, 0, 2, 10 * 86400 * 10 ** 9, qnull(QTIMESTAMP))
+    source = bytearray(b'\1\1\0\0' + struct.pack('<i', len(body) + 8) + body)
+    original = bytes(source)
+    for _ in range(2):
+        result = buffer_reader.read(source, numpy_temporals = True).data
+        assert str(result[0]) == '2000-01-11T00:00:00.000000000' and numpy.isnat(result[1])
+    assert bytes(source) == original
+
+    # buffers owned by the reader are converted in place
+    result = buffer_reader.read(source, owned = True, numpy_temporals = True).data
+    assert str(result[0]) == '2000-01-11T00:00:00.000000000'
+    assert bytes(source) != original
+    print('.')
+
+
+
+def test_reading_socket():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    print('Deserialization (socket)')
+    sender, receiver = socket.socketpair()
+    try:
+        socket_reader = qreader.QReader(receiver)
+        for query, value in iter(EXPRESSIONS.items()):
+            binary = binascii.unhexlify(BINARY[query])
+            sender.sendall(b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary)
+
+            sys.stdout.write( '  %-75s' % query )
+            try:
+                result = socket_reader.read().data
+                assert compare(value, result), 'deserialization failed: %s, expected: %s actual: %s' % (query, value, result)
+                print('.')
+            except QException as e:
+                assert isinstance(value, QException)
+                assert e.args == value.args
+                print('.')
+    finally:
+        sender.close()
+        receiver.close()
+
+
+
+def test_uncompress():
+    try:
+        from qpython import fastutils
+    except ImportError:
+        fastutils = None
+
+    with open('tests/QCompressedExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            binary = binascii.unhexlify(binary)
+            uncompressed_size = struct.unpack('i', binary[:4])[0] - 8
+            compressed = binary[4:]
+
+            result = utils.uncompress(compressed, uncompressed_size)
+            assert isinstance(result, bytearray)
+            assert len(result) == uncompressed_size
+
+            reader = qreader.QReader(None)
+            expected = reader.read(source = b'\1\0\0\0' + struct.pack('i', uncompressed_size + 8) + bytes(result)).data
+            assert compare(COMPRESSED_EXPRESSIONS[query], expected), 'uncompress failed: %s' % (query)
+
+            if fastutils:
+                assert fastutils.uncompress(compressed, uncompressed_size) == result, 'uncompress failed: %s' % (query)
+
+            for uncompress in filter(None, [utils.uncompress, getattr(fastutils, 'uncompress', None)]):
+                try:
+                    uncompress(compressed[:len(compressed) // 2], uncompressed_size)
+                    assert False, 'ValueError expected: %s' % (query)
+                except ValueError:
+                    pass
+
+
+
+def test_find_strings():
+    try:
+        from qpython import fastutils
+    except ImportError:
+        fastutils = None
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            if query not in EXPRESSIONS:
+                continue
+
+            value = EXPRESSIONS[query]
+            binary = binascii.unhexlify(binary)
+            # general list, skip type, attributes and length
+            data = binary[6:]
+
+            for find_strings in filter(None, [utils.find_strings, getattr(fastutils, 'find_strings', None)]):
+                strings = find_strings(data, len(value), True) if binary[0:1] == b'\0' else None
+
+                if isinstance(value, list) and value and all(isinstance(element, bytes) for element in value):
+                    assert strings is not None, 'find_strings failed: %s' % (query)
+                    starts, lengths, size = strings
+                    assert size == len(data)
+                    assert [data[start : start + length] for start, length in zip(starts, lengths)] == value, 'find_strings failed: %s' % (query)
+                    assert find_strings(data[:-1], len(value), True) is None
+                elif binary[0:1] == b'\0' and len(value):
+                    assert strings is None, 'find_strings failed: %s' % (query)
+
+    data = struct.pack('>bbi5sbc', QSTRING, 0, 5, b'quick', QCHAR, b' ')
+    for find_strings in filter(None, [utils.find_strings, getattr(fastutils, 'find_strings', None)]):
+        starts, lengths, size = find_strings(data, 2, False)
+        assert list(starts) == [6, 12] and list(lengths) == [5, 1] and size == len(data)
+        assert find_strings(data, 2, True) is None
+        assert find_strings(data, 0, True)[2] == 0
+
+
+
+def test_protocol_parser():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    stream = BytesIO()
+    queries = [query for query in EXPRESSIONS if query in BINARY]
+    for query in queries:
+        binary = binascii.unhexlify(BINARY[query])
+        stream.write(b'\1\2\0\0')
+        stream.write(struct.pack('i', len(binary) + 8))
+        stream.write(binary)
+    stream = stream.getvalue()
+
+    parser = qprotocol.QProtocolParser(reader_class = qreader.QReader)
+    assert parser.handshake() == b':\3\0'
+    assert parser.connection_lost() == b':\0'
+    assert parser.state == qprotocol.ProtocolState.HANDSHAKE_FALLBACK
+
+    with pytest.raises(QAuthenticationException):
+        parser.connection_lost()
+    with pytest.raises(QConnectionException):
+        parser.feed(b'\1')
+
+    for chunk_size in (1, 7, 4096, len(stream)):
+        parser = qprotocol.QProtocolParser(username = 'user', password = 'pwd', reader_class = qreader.QReader)
+        assert parser.handshake() == b'user:pwd\3\0'
+        assert parser.next_message() is None
+
+        # handshake response followed by messages
+        data = b'\3' + stream
+        for i in range(0, len(data), chunk_size):
+            parser.feed(data[i : i + chunk_size])
+        assert parser.state == qprotocol.ProtocolState.CONNECTED
+        assert parser.protocol_version == 3
+
+        for query in queries:
+            value = EXPRESSIONS[query]
+            try:
+                message = parser.next_message()
+                assert message.type == 2
+                assert compare(value, message.data), 'deserialization failed: %s' % query
+            except QException as e:
+                assert isinstance(value, QException)
+                assert e.args == value.args
+
+        assert parser.next_message() is None
+
+    assert qreader.QReader(None).read(parser.query(0, '{x}', 1)).data == [b'{x}', 1]
+    assert len(list(parser.messages())) == 0
+    parser.connection_lost()
+    assert parser.state == qprotocol.ProtocolState.CLOSED
+
+
+
+def test_skip_object():
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            binary = binascii.unhexlify(binary)
+            reader = qreader.QReader(None)
+            reader._buffer.wrap(binary)
+            reader._skip_object()
+            assert reader._buffer.tell() == len(binary), 'skip failed: %s' % (query)
+
+
+
+def test_reading_lazy_tables():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    print('Deserialization (lazy tables)')
+    buffer_reader = qreader.QReader(None)
+    for query, value in iter(EXPRESSIONS.items()):
+        if not isinstance(value, (QTable, QKeyedTable)):
+            continue
+
+        binary = binascii.unhexlify(BINARY[query])
+        sys.stdout.write( '  %-75s' % query )
+        result = buffer_reader.read(source = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary, lazy_tables = True).data
+
+        table = result if isinstance(value, QTable) else result.values
+        assert isinstance(table, QLazyTable)
+        assert not any(table.is_loaded(column) for column in table._columns)
+        assert table.meta.as_dict() == (value if isinstance(value, QTable) else value.values).meta.as_dict()
+
+        column = table._columns[-1]
+        table.column(column)
+        assert table.is_loaded(column)
+        assert not any(table.is_loaded(column) for column in table._columns[:-1])
+
+        assert compare(value, result), 'deserialization failed: %s, expected: %s actual: %s' % (query, value, result)
+        print('.')
+
+
+
+def test_reading_columns():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    def project(table, columns):
+        if not columns:
+            projection = QTable([], [], len(table))
+            projection._meta_init(qtype = QTABLE)
+            return projection
+        return qtable(columns, [table.column(column) for column in columns], qtype = QTABLE)
+
+    print('Deserialization (column projection)')
+    buffer_reader = qreader.QReader(None)
+    for query, value in iter(EXPRESSIONS.items()):
+        if not isinstance(value, (QTable, QKeyedTable)):
+            continue
+
+        binary = binascii.unhexlify(BINARY[query])
+        message = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary
+        sys.stdout.write( '  %-75s' % query )
+
+        table = value if isinstance(value, QTable) else value.values
+        for columns in (table.dtype.names[1::2], table.dtype.names[-1:], ()):
+            expected = project(table, columns)
+            if isinstance(value, QKeyedTable):
+                expected = QKeyedTable(value.keys, expected)
+
+            for lazy_tables in (False, True):
+                result = buffer_reader.read(source = message, columns = list(columns) + ['unknown'], lazy_tables = lazy_tables).data
+                assert isinstance(result, type(value))
+                assert len(result) == len(value)
+
+                if lazy_tables:
+                    # reading the projection must not decode the selected columns
+                    projection = result if isinstance(value, QTable) else result.values
+                    assert not any(projection.is_loaded(column) for column in projection._columns)
+
+                assert compare(expected, result), 'deserialization failed: %s, expected: %s actual: %s' % (query, expected, result)
+
+        print('.')
+
+
+
+def test_reading_compact_symbols():
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    def to_fixed(data):
+        if isinstance(data, QCompactSymbolList):
+            return data.to_fixed()
+        elif isinstance(data, QTable):
+            return QTable(data.dtype.names, [to_fixed(data.column(column)) for column in data.dtype.names])
+        elif isinstance(data, QKeyedTable):
+            return QKeyedTable(to_fixed(data.keys), to_fixed(data.values))
+        return data
+
+    print('Deserialization (compact symbols)')
+    buffer_reader = qreader.QReader(None)
+    for query, value in iter(EXPRESSIONS.items()):
+        if not ((isinstance(value, QList) and value.meta.qtype == QSYMBOL) or isinstance(value, (QTable, QKeyedTable))):
+            continue
+
+        binary = binascii.unhexlify(BINARY[query])
+        message = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary
+        sys.stdout.write( '  %-75s' % query )
+
+        result = buffer_reader.read(source = message, compact_symbols = True).data
+        if isinstance(value, QList):
+            assert isinstance(result, QCompactSymbolList) and result.meta.qtype == QSYMBOL
+            assert len(result) == len(value) and list(result) == list(value)
+            assert result.block.tostring() == binary[6:]
+
+        assert compare(value, to_fixed(result)), 'deserialization failed: %s, expected: %s actual: %s' % (query, value, result)
+        print('.')
+
+
+
+def test_symbol_cache():
+    cache = qreader.QSymbolCache(capacity = 3)
+
+    assert cache.intern(b'a') is cache.intern(b'a')
+    assert isinstance(cache.intern(b'a'), numpy.string_)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+    assert [cache.code(b'a'), cache.code(b'b'), cache.code(b'c'), cache.code(b'a')] == [0, 1, 2, 0]
+    assert cache.symbol(1) == b'b'
+
+    # least recently used symbol is evicted, its code is not reused
+    assert cache.code(b'd') == 3
+    assert b'b' not in cache and b'a' in cache and len(cache) == 3
+    with pytest.raises(KeyError):
+        cache.symbol(1)
+    assert cache.code(b'b') == 4 and b'c' not in cache
+
+    assert list(cache.codes([b'd', b'b', b'd', b'a'])) == [3, 4, 3, 0]
+    interned = cache.intern_all(numpy.array([b'a', b'b', b'a']))
+    assert interned.dtype == numpy.object_ and interned[0] is interned[2] is cache.intern(b'a')
+    assert len(cache.intern_all([])) == 0
+
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+    with pytest.raises(ValueError):
+        qreader.QSymbolCache(capacity = 0)
+
+    BINARY = OrderedDict()
+
+    with open('tests/QExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            BINARY[query] = binary
+
+    print('Deserialization (symbol cache)')
+    cache = qreader.QSymbolCache()
+    buffer_reader = qreader.QReader(None, symbol_cache = cache)
+    for query in (b'`quickbrownfoxjumpsoveralazydog', b'``quick``fox', b'flip `name`iq!(`Dent`Beeblebrox`Prefect;98 42 126)'):
+        binary = binascii.unhexlify(BINARY[query])
+        message = b'\1\0\0\0' + struct.pack('i', len(binary) + 8) + binary
+        sys.stdout.write( '  %-75s' % query )
+
+        first = buffer_reader.read(source = message).data
+        misses = cache.misses
+        second = buffer_reader.read(source = message).data
+        assert first == EXPRESSIONS[query], 'deserialization failed: %s, expected: %s actual: %s' % (query, EXPRESSIONS[query], first)
+        assert cache.misses == misses and cache.hits > 0
+
+        if isinstance(first, QTable):
+            first, second = first.column('name'), second.column('name')
+        if isinstance(first, QList):
+            assert first.dtype == numpy.object_ and first.meta.qtype == QSYMBOL
+            assert all(left is right for left, right in zip(first, second))
+        else:
+            assert first is second
+        print('.')
+
+
+
 test_reading()
+test_reading_socket()
 test_reading_numpy_temporals()
 test_reading_compressed()
+test_reading_zero_copy()
+test_reading_source_unmodified()
+test_uncompress()
+test_find_strings()
+test_protocol_parser()
+test_skip_object()
+test_reading_lazy_tables()
+test_reading_columns()
+test_reading_compact_symbols()
+test_symbol_cache()
@@ -20,6 +20,7 @@ import sys
 if sys.version > '3':
     long = int
 
+from qpython import utils
 from qpython.qtype import *  # @UnusedWildImport
 from qpython.qcollection import *  # @UnusedWildImport
 from qpython.qtemporal import * # @UnusedWildImport
@@ -91,6 +92,39 @@ def test_qdict():
         assert v == d.values[i]
         i += 1
 
+    assert d.lookup(numpy.array([2, 3, 1])).tolist() == [1, -1, 0]
+    d[2] = b'xyz'
+    assert d[2] == b'xyz'
+
+    d.keys = qlist(numpy.array([5, 6], dtype=numpy.int64), qtype=QLONG_LIST)
+    assert 5 in d and not 1 in d
+    with pytest.raises(KeyError):
+        d[1]
+
+    # index follows in place modifications of the keys
+    d.keys[1] = 7
+    assert d[7] == b'xyz' and d.lookup([7, 6]).tolist() == [1, -1]
+    with pytest.raises(KeyError):
+        d[6]
+    d.keys[:1][0] = 8
+    assert 8 in d and not 5 in d
+    numpy.asarray(d.keys)[0] = 100
+    assert d[100] == b'abc' and not 8 in d
+    numpy.asarray(d.keys)[1] = 101
+    assert d.lookup([101, 100, 7]).tolist() == [1, 0, -1]
+
+    d = QDictionary([numpy.int64(1), numpy.int16(2), numpy.float64(3.234), '4', [5]], [1, 2, 3, 4, 5])
+    assert d[2] == 2 and d['4'] == 4 and d[[5]] == 5
+    assert d.lookup([2, '4', 'x']).tolist() == [1, 3, -1]
+    d.keys[1] = 20
+    assert d[20] == 2 and not 2 in d
+    d.keys[1] = [20]
+    assert d[[20]] == 2 and d['4'] == 4 and d.lookup([[20], 'x']).tolist() == [1, -1]
+
+    d = QDictionary(qlist(numpy.array(['abc', 'cdefgh', 'abc']), qtype=QSYMBOL_LIST), qlist(numpy.array([1, 2, 3]), qtype=QLONG_LIST))
+    assert d[b'abc'] == 1
+    assert d.lookup([b'cdefgh', b'abc', b'ij']).tolist() == [1, 0, -1]
+
 
 def test_qtable():
     with pytest.raises(ValueError):
@@ -112,6 +146,53 @@ def test_qtable():
     assert t[t['name'] == b'Dent']['name'] == b'Dent'
     assert t[t['name'] == b'Dent']['iq'] == long(98)
 
+    names = qlist(['Dent', 'Beeblebrox', 'Prefect'], qtype=QSYMBOL_LIST)
+    iqs = qlist([98, 42, 126], qtype=QLONG_LIST)
+    t = qtable(['name', 'iq'], [names, iqs])
+
+    assert t.column('name') is names
+    assert t.column('iq') is iqs
+    assert numpy.shares_memory(t['iq'], iqs)
+    assert numpy.shares_memory(t.iq, iqs)
+    assert t.dtype == numpy.dtype([('name', names.dtype), ('iq', iqs.dtype)])
+    assert t.meta.qtype == QTABLE and t.meta.name == QSYMBOL and t.meta.iq == QLONG
+
+    assert isinstance(t[0], numpy.record)
+    assert t[0]['name'] == b'Dent' and t[0]['iq'] == 98
+    assert t[-1]['name'] == b'Prefect'
+    assert [row['iq'] for row in t] == [98, 42, 126]
+
+    with pytest.raises(IndexError):
+        t[3]
+
+    with pytest.raises(KeyError):
+        t['fullname']
+
+    s = t[1:]
+    assert isinstance(s, QTable) and len(s) == 2
+    assert s.meta.iq == QLONG and s.column('iq').meta.qtype == QLONG
+    assert numpy.shares_memory(s['iq'], iqs)
+    assert t[t['iq'] > 50] == qtable(['name', 'iq'], [qlist(['Dent', 'Prefect'], qtype=QSYMBOL_LIST), qlist([98, 126], qtype=QLONG_LIST)])
+    assert t[[2, 0]]['iq'].tolist() == [126, 98]
+
+    array = numpy.asarray(t)
+    assert array.dtype == t.dtype and array['name'].tolist() == [b'Dent', b'Beeblebrox', b'Prefect']
+    assert t == array
+
+    assert not isinstance(t, numpy.ndarray)
+    assert t.shape == (3, ) and t.ndim == 1 and t.size == 3
+    records = t.to_recarray()
+    assert isinstance(records, numpy.recarray) and records.dtype == t.dtype
+    assert records.iq.tolist() == [98, 42, 126] and records[0].name == b'Dent'
+    assert not numpy.shares_memory(records.iq, iqs)
+    assert numpy.add(t.iq, 1).tolist() == [99, 43, 127]
+    assert numpy.sort(t, order = 'iq')['name'].tolist() == [b'Beeblebrox', b'Dent', b'Prefect']
+
+    dates = qlist(numpy.array([366, 121, qnull(QDATE)]), qtype=QDATE_LIST)
+    t = qtable(['dates'], [dates])
+    assert isinstance(t[:2].column('dates'), QTemporalList)
+    assert t[0]['dates'] == 366
+
 
 
 def test_qkeyedtable():
@@ -163,6 +244,34 @@ def test_qkeyedtable():
         assert v == t.values[i]
         i += 1
 
+    assert t[1002]['pos'] == b'd2' and t[(1003, )]['dates'] == 255
+    assert 1001 in t and not 1004 in t and t.keys[0] in t
+    with pytest.raises(KeyError):
+        t[1004]
+    assert t.lookup([1003, 1004, 1001]).tolist() == [2, -1, 0]
+
+    t.keys.column('eid')[1] = 1005
+    assert t[1005]['pos'] == b'd2' and not 1002 in t
+    t.keys['eid'] = [1, 2, 3]
+    assert t.lookup([3, 1001]).tolist() == [2, -1]
+    t.keys['eid'][1] = 5
+    assert t[5]['pos'] == b'd2' and not 2 in t
+    t.keys['eid'][2] = 6
+    assert t.lookup([6, 3]).tolist() == [2, -1]
+
+    t = QKeyedTable(qtable(['sym', 'date'],
+                           [qlist(numpy.array(['a', 'b', 'a', 'b']), qtype=QSYMBOL_LIST),
+                            qlist(numpy.array([366, 366, 121, 121]), qtype=QDATE_LIST)]),
+                    qtable(['px'], [qlist(numpy.array([1., 2., 3., 4.]), qtype=QFLOAT_LIST)]))
+
+    assert t[(b'a', 121)]['px'] == 3.
+    assert t[(b'b', numpy.datetime64('2001-01-01', 'D'))]['px'] == 2.
+    assert (b'b', qtemporal(numpy.datetime64('2000-05-01', 'D'), qtype=QDATE)) in t
+    assert not (b'c', 121) in t and not b'a' in t
+    assert t.lookup([numpy.array([b'b', b'a', b'c']), numpy.array(['2000-05-01', '2001-01-01', '2001-01-01'], dtype='datetime64[D]')]).tolist() == [3, 0, -1]
+    assert t.lookup(t.keys[::-1]).tolist() == [3, 2, 1, 0]
+    assert t.lookup(numpy.asarray(t.keys)).tolist() == [0, 1, 2, 3]
+
 
 
 def test_qtemporallist():
@@ -177,6 +286,95 @@ def test_qtemporallist():
         assert t[x].raw == na_dt[x]
         x += 1
 
+    assert numpy.array_equal(t.to_numpy(), na_dt)
+    assert list(t.iter_raw()) == list(range(-365, len(na) - 365))
+    assert [dt.raw for dt in t] == list(na_dt)
+    assert all(isinstance(dt, QTemporal) and dt.meta.qtype == QDATE for dt in t[:3])
+
+    s = t[10:20]
+    assert isinstance(s, QTemporalList) and s.meta.qtype == QDATE
+    assert numpy.shares_memory(s, t)
+    assert numpy.array_equal(s.to_numpy(), na_dt[10:20])
+
+    t[0] = numpy.datetime64('2001-01-01', 'D')
+    assert t.raw(0) == 366
+    t[1] = qtemporal(numpy.datetime64('2000-05-01', 'D'), qtype=QDATE)
+    assert t.raw(1) == 121
+    t[2:4] = numpy.array(['2000-01-01', 'NaT'], dtype='datetime64[D]')
+    assert list(t[:4].iter_raw()) == [366, 121, 0, qnull(QDATE)]
+
+    with pytest.raises(AttributeError):
+        t[0].value = 1
+
+
+def test_qguidlist():
+    guids = [uuid.UUID('8c680a01-5a49-5aab-5a65-d4bfddb6a661'), qnull(QGUID), uuid.UUID(int = 1)]
+    raw = numpy.frombuffer(b''.join(guid.bytes for guid in guids), dtype = GUID_DTYPE)
+
+    for source in (guids, numpy.array(guids), raw, raw.view(numpy.uint64).reshape(-1, 2)):
+        g = qlist(source, qtype = QGUID_LIST)
+
+        assert isinstance(g, QGUIDList)
+        assert g.meta.qtype == QGUID
+        assert g.dtype == GUID_DTYPE
+        assert numpy.array_equal(g.view(numpy.ndarray), raw)
+        assert list(g) == guids
+        assert g[0] == guids[0] and g[-1] == guids[-1]
+        assert g.raw(1).tostring() == b'\0' * 16
+        assert isinstance(g[1:], QGUIDList) and list(g[1:]) == guids[1:]
+        assert g.as_uuid().dtype == numpy.object_ and list(g.as_uuid()) == guids
+        assert g == numpy.array(guids)
+
+    g = qlist(raw)
+    assert isinstance(g, QGUIDList) and g.meta.qtype == QGUID
+    assert numpy.shares_memory(g, raw)
+
+    g = qlist(numpy.array(guids))
+    assert isinstance(g, QGUIDList) and list(g) == guids
+
+    g[1] = guids[0]
+    assert g[1] == guids[0]
+
+    assert len(qlist([], qtype = QGUID_LIST)) == 0
+
+
+def test_qcompactsymbollist():
+    symbols = [b'Dent', b'', b'Beeblebrox', b'Prefect']
+    s = QCompactSymbolList.from_symbols(symbols)
+
+    assert len(s) == 4 and s.meta.qtype == QSYMBOL
+    assert list(s) == symbols
+    assert s[0] == b'Dent' and s[-1] == b'Prefect' and isinstance(s[2], numpy.string_)
+    assert s.block.tostring() == b'Dent\0\0Beeblebrox\0Prefect\0'
+    assert list(s.offsets) == [0, 5, 6, 17, 25]
+    assert s.dtype == numpy.dtype('S10')
+
+    fixed = s.to_fixed()
+    assert isinstance(fixed, QList) and fixed.meta.qtype == QSYMBOL
+    assert fixed == qlist(symbols, qtype = QSYMBOL_LIST)
+    assert s.to_object().dtype == numpy.object_ and list(s.to_object()) == symbols
+    assert s == symbols and s == QCompactSymbolList.from_symbols(symbols) and s != symbols[::-1]
+
+    assert list(s[1:3]) == symbols[1:3] and s[1:3].block.tostring() == b'\0Beeblebrox\0'
+    assert list(s[::-1]) == symbols[::-1]
+    assert list(s[[3, 0, 3]]) == [b'Prefect', b'Dent', b'Prefect']
+    assert list(s[numpy.array([True, False, False, True])]) == [b'Dent', b'Prefect']
+    assert len(s[2:1]) == 0
+
+    with pytest.raises(IndexError):
+        s[4]
+
+    with pytest.raises(ValueError):
+        QCompactSymbolList.from_block(s.block, 3)
+
+    empty = QCompactSymbolList.from_symbols([])
+    assert len(empty) == 0 and len(empty.to_fixed()) == 0 and len(empty.to_object()) == 0
+
+    t = qtable(['name', 'iq'], [s, qlist([98, 42, 126, 0], qtype = QLONG_LIST)])
+    assert t.meta.name == QSYMBOL and t.column('name') is s
+    assert t[2]['name'] == b'Beeblebrox' and list(t['name']) == symbols
+    assert list(t[1:3].column('name')) == symbols[1:3]
+
 
 def test_array_to_raw_qtemporal():
     na_dt = numpy.arange('1999-01', '2005-12', dtype='datetime64[M]')
@@ -314,6 +512,25 @@ def test_array_from_raw_qtemporal():
         else:
             assert raw[x] == qnull(QTIMESTAMP)
 
+    raw = numpy.array([279417600000000, qnull(QTIMESTAMP)])
+    na_dt = array_from_raw_qtemporal(raw, qtype=QTIMESTAMP, inplace=True)
+    assert numpy.shares_memory(na_dt, raw)
+    assert na_dt[0] == numpy.datetime64('2000-01-04T05:36:57.600', 'ns') and numpy.isnat(na_dt[1])
+
+    raw = numpy.array([20217600000000, qnull(QTIMESPAN)])
+    assert numpy.shares_memory(array_from_raw_qtemporal(raw, qtype=QTIMESPAN, inplace=True), raw)
+
+    try:
+        from qpython import fastutils
+    except ImportError:
+        fastutils = None
+
+    raw = numpy.array([366, 121, qnull(QDATE)], dtype=numpy.int32)
+    for from_raw_temporals in filter(None, [utils.from_raw_temporals, getattr(fastutils, 'from_raw_temporals', None)]):
+        array = numpy.empty(len(raw), dtype=numpy.int64)
+        from_raw_temporals(raw, array, 10957, qnull(QDATE))
+        assert list(array.view('datetime64[D]')) == list(array_from_raw_qtemporal(raw, qtype=QDATE))
+        assert list(array[:2]) == [366 + 10957, 121 + 10957] and numpy.isnat(array.view('datetime64[D]')[2])
 
     raw = numpy.array([3.234, qnull(QDATETIME)])
     na_dt = array_from_raw_qtemporal(raw, qtype=QDATETIME)
@@ -329,5 +546,7 @@ test_qdict()
 test_qtable()
 test_qkeyedtable()
 test_qtemporallist()
+test_qguidlist()
+test_qcompactsymbollist()
 test_array_to_raw_qtemporal()
 test_array_from_raw_qtemporal()
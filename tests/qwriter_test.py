@@ -15,17 +15,25 @@
 #
 
 import binascii
+import socket
+import struct
 import sys
+import threading
+try:
+    from cStringIO import BytesIO
+except ImportError:
+    from io import BytesIO
 if sys.version > '3':
     long = int
 
 from collections import OrderedDict
-from qpython import qwriter
+from qpython import qreader, qwriter
 from qpython.qtype import *  # @UnusedWildImport
-from qpython.qcollection import qlist, QDictionary, qtable, QKeyedTable
+from qpython.qcollection import qlist, QDictionary, qtable, QKeyedTable, QCompactSymbolList
 from qpython.qtemporal import qtemporal, to_raw_qtemporal, array_to_raw_qtemporal
 
 BINARY = OrderedDict()
+COMPRESSED_BINARY = OrderedDict()
 
 EXPRESSIONS = OrderedDict((
                    (b'("G"$"8c680a01-5a49-5aab-5a65-d4bfddb6a661"; 0Ng)',
@@ -193,10 +201,14 @@ EXPRESSIONS = OrderedDict((
 
                    (b'`jumps`over`a`lazy`dog',                        (numpy.array(['jumps', 'over', 'a', 'lazy', 'dog'], dtype=numpy.string_),
                                                                       qlist(numpy.array(['jumps', 'over', 'a', 'lazy', 'dog']), qtype = QSYMBOL_LIST),
-                                                                      qlist(['jumps', 'over', 'a', 'lazy', 'dog'], qtype = QSYMBOL_LIST))),
+                                                                      qlist(['jumps', 'over', 'a', 'lazy', 'dog'], qtype = QSYMBOL_LIST),
+                                                                      QCompactSymbolList.from_symbols(['jumps', 'over', 'a', 'lazy', 'dog']),
+                                                                      numpy.array([u'jumps', u'over', u'a', u'lazy', u'dog']),
+                                                                      numpy.array([u'jumps', 'over', b'a', numpy.string_('lazy'), u'dog'], dtype=numpy.object))),
                    (b'`the`quick`brown`fox',                          numpy.array([numpy.string_('the'), numpy.string_('quick'), numpy.string_('brown'), numpy.string_('fox')], dtype=numpy.object)),
                    (b'``quick``fox',                                  qlist(numpy.array([qnull(QSYMBOL), numpy.string_('quick'), qnull(QSYMBOL), numpy.string_('fox')], dtype=numpy.object), qtype=QSYMBOL_LIST)),
-                   (b'``',                                            qlist(numpy.array([qnull(QSYMBOL), qnull(QSYMBOL)], dtype=numpy.object), qtype=QSYMBOL_LIST)),
+                   (b'``',                                            (qlist(numpy.array([qnull(QSYMBOL), qnull(QSYMBOL)], dtype=numpy.object), qtype=QSYMBOL_LIST),
+                                                                      QCompactSymbolList.from_symbols([qnull(QSYMBOL), qnull(QSYMBOL)]))),
                    (b'("quick"; "brown"; "fox"; "jumps"; "over"; "a lazy"; "dog")',
                                                                      (['quick', 'brown', 'fox', 'jumps', 'over', 'a lazy', 'dog'],
                                                                       qlist(numpy.array(['quick', 'brown', 'fox', 'jumps', 'over', 'a lazy', 'dog']), qtype = QSTRING_LIST),
@@ -249,6 +261,9 @@ EXPRESSIONS = OrderedDict((
                                                                       qtable(qlist(['name', 'iq'], qtype = QSYMBOL_LIST),
                                                                              [qlist(['Dent', 'Beeblebrox', 'Prefect'], qtype = QSYMBOL_LIST),
                                                                               qlist([98, 42, 126], qtype = QLONG_LIST)]),
+                                                                      qtable(QCompactSymbolList.from_symbols(['name', 'iq']),
+                                                                             [QCompactSymbolList.from_symbols(['Dent', 'Beeblebrox', 'Prefect']),
+                                                                              qlist([98, 42, 126], qtype = QLONG_LIST)]),
                                                                       qtable(qlist(['name', 'iq'], qtype = QSYMBOL_LIST),
                                                                              [qlist(['Dent', 'Beeblebrox', 'Prefect']),
                                                                               qlist([98, 42, 126])],
@@ -386,6 +401,131 @@ def test_write_single_char_string():
             single_char_strings = not single_char_strings
 
 
+def test_write_compressed():
+    with open('tests/QCompressedExpressions3.out', 'rb') as f:
+        while True:
+            query = f.readline().strip()
+            binary = f.readline().strip()
+
+            if not binary:
+                break
+
+            COMPRESSED_BINARY[query] = binary
+
+    COMPRESSED_EXPRESSIONS = OrderedDict((
+                    (b'1000#`q',                                        qlist(numpy.array(['q'] * 1000), qtype=QSYMBOL_LIST)),
+                    (b'([] q:1000#`q)',                                 qtable(qlist(numpy.array(['q']), qtype = QSYMBOL_LIST),
+                                                                             [qlist(numpy.array(['q'] * 1000), qtype=QSYMBOL_LIST)])),
+                    (b'([] a:til 200;b:25+til 200;c:200#`a)',           qtable(qlist(numpy.array(['a', 'b', 'c']), qtype = QSYMBOL_LIST),
+                                                                             [qlist(numpy.arange(200, dtype = numpy.int64), qtype=QLONG_LIST),
+                                                                              qlist(numpy.arange(200, dtype = numpy.int64) + 25, qtype=QLONG_LIST),
+                                                                              qlist(numpy.array(['a'] * 200), qtype=QSYMBOL_LIST)])),
+                   ))
+
+    w = qwriter.QWriter(None, 3)
+    r = qreader.QReader(None)
+
+    for query, value in iter(COMPRESSED_EXPRESSIONS.items()):
+        sys.stdout.write( '%-75s' % query )
+        uncompressed = w.write(value, 1)
+        compressed = w.write(value, 1, compress = True)
+
+        assert compressed[2:3] == b'\1', 'compression failed: %s' % query
+        assert struct.unpack('i', compressed[4:8])[0] == len(compressed)
+        serialized = binascii.hexlify(compressed)[16:].lower()
+        assert serialized == COMPRESSED_BINARY[query].lower(), 'serialization failed: %s, expected: %s actual: %s' % (query,  COMPRESSED_BINARY[query].lower(), serialized)
+        assert r.read(source = compressed).data == r.read(source = uncompressed).data
+
+        assert w.write(value, 1, compress = True, compress_threshold = len(uncompressed)) == uncompressed
+        assert qwriter.QWriter(None, 0).write(value, 1, compress = True) == uncompressed
+        print('.')
+
+    # incompressible data is sent as is
+    data = qlist(numpy.random.RandomState(42).randint(0, 1 << 62, 1000), qtype = QLONG_LIST)
+    assert w.write(data, 1, compress = True) == w.write(data, 1)
+
+
+
+def test_write_scatter_gather():
+    w = qwriter.QWriter(None, 3)
+
+    for query, value in iter(EXPRESSIONS.items()):
+        for obj in (value if isinstance(value, tuple) else (value, )):
+            obj, options = (obj['data'], obj) if isinstance(obj, dict) else (obj, {})
+            single_char_strings = options['single_char_strings'] if 'single_char_strings' in options else False
+            assert w.write(obj, 1, single_char_strings = single_char_strings, scatter_gather = True) == w.write(obj, 1, single_char_strings = single_char_strings), 'serialization failed: %s' % query
+
+    data = qtable(['sym', 'price', 'size'],
+                  [QCompactSymbolList.from_symbols([b'abc', b'quick', b'fox'] * 100000),
+                   qlist(numpy.arange(300000) * 0.5, qtype = QFLOAT_LIST),
+                   qlist(numpy.arange(300000), qtype = QLONG_LIST)])
+    expected = w.write(data, 1)
+
+    # large vectors are referenced, not copied
+    buffer_ = qwriter.QWriter.GatherBuffer()
+    buffer_.write(b'\0' * 16)
+    buffer_.write(qwriter._raw_buffer(data.column('size')))
+    chunks = buffer_.chunks()
+    assert buffer_.tell() == 16 + 8 * 300000 and len(chunks) == 2
+    assert numpy.shares_memory(numpy.frombuffer(chunks[1], dtype = numpy.int64), data.column('size'))
+
+    class Stream(object):
+        def __init__(self):
+            self.data = BytesIO()
+
+        def sendall(self, data):
+            self.data.write(data)
+
+    stream = Stream()
+    qwriter.QWriter(stream, 3).write(data, 1, scatter_gather = True)
+    assert stream.data.getvalue() == expected
+
+    sender, receiver = socket.socketpair()
+    try:
+        thread = threading.Thread(target = qwriter.QWriter(sender, 3).write, args = (data, 1), kwargs = {'scatter_gather': True})
+        thread.start()
+        received = BytesIO()
+        while received.tell() < len(expected):
+            received.write(receiver.recv(1 << 20))
+        thread.join()
+        assert received.getvalue() == expected
+    finally:
+        sender.close()
+        receiver.close()
+
+
+
+def test_write_symbols():
+    w = qwriter.QWriter(None, 3)
+    expected = w.write(qlist([b'abc', b'', b'\xe9t\xe9', b'd'], qtype = QSYMBOL_LIST), 1)
+
+    for data in (numpy.array([b'abc', b'', b'\xe9t\xe9', b'd']),
+                 numpy.array([u'abc', u'', u'\xe9t\xe9', u'd']),
+                 numpy.array([u'abc', None, u'\xe9t\xe9', b'd'], dtype = numpy.object)):
+        assert w.write(data, 1) == expected, 'serialization failed: %s' % data
+
+    w = qwriter.QWriter(None, 3, encoding = 'utf-8')
+    expected = w.write(qlist([b'abc', b'\xc3\xa9t\xc3\xa9'], qtype = QSYMBOL_LIST), 1)
+
+    for data in (numpy.array([u'abc', u'\xe9t\xe9']), numpy.array([u'abc', u'\xe9t\xe9'], dtype = numpy.object)):
+        assert w.write(data, 1) == expected, 'serialization failed: %s' % data
+
+    # symbols are terminated at first NUL, regardless of the container
+    expected = w.write(qlist([b'a', b'c'], qtype = QSYMBOL_LIST), 1)
+    for data in (numpy.array([b'a\0b', b'c']), numpy.array([u'a\0b', u'c']),
+                 numpy.array([b'a\0b', b'c'], dtype = numpy.object), numpy.array([u'a\0b', u'c'], dtype = numpy.object)):
+        assert w.write(data, 1) == expected, 'serialization failed: %s' % data
+
+    # long symbol vectors are encoded in chunks
+    data = numpy.array([b'sym%d' % i for i in range(50000)] + [b'x' * 100])
+    assert w.write(data, 1) == w.write(data.astype(numpy.object), 1)
+    assert w.write(qlist([], qtype = QSYMBOL_LIST), 1)[8:] == b'\x0b\0\0\0\0\0'
+
+
+
 init()
 test_writing()
 test_write_single_char_string()
+test_write_compressed()
+test_write_symbols()
+test_write_scatter_gather()